@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+
+"""
+    AsyncRobot runs in the event loop of the caller, with no helper thread.
+
+    The receiver, observers and controllers are attached to the running loop when
+    the robot is started, so several robots can share one application loop and
+    every ``*_async`` method is awaited directly.
+
+    Example:
+
+    .. code-block:: python
+
+      import asyncio
+      from awtube.async_robot import AsyncRobot
+      from awtube.types import MachineTarget
+
+      async def main():
+          robot = AsyncRobot('192.168.0.0', port='9001')
+          await robot.start()
+          await robot.set_machine_target_async(MachineTarget.SIMULATION)
+          await robot.enable_async()
+          await robot.move_joints_async([0, 0, 0, 0, 0, 0])
+          await robot.close()
+
+      asyncio.run(main())
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+import typing as tp
+import numpy as np
+
+from . import command_receiver, controllers, observers, commands, types, cia402, config, validation, poses, simplification, jogging, superimposed, trajectories, program, templates, watchdog, errors
+
+
+class AsyncRobot:
+    """Robot arm driven from the running event loop."""
+
+    # seconds without telemetry, stream or status update reported by the watchdog
+    telemetry_timeout: float = 1.0
+
+    def __init__(self,
+                 robot_ip: str = "0.0.0.0",
+                 port: str = "9001",
+                 config_path: str = None,
+                 name: str = "AWTube",
+                 log_level: int | str = logging.INFO,
+                 logger: logging.Logger | None = None):
+
+        self._log_level = log_level
+        self._logger = logging.getLogger(
+            self.__class__.__name__) if logger is None else logger
+        self.killed: bool = False
+        self._name = name
+        self._robot_ip = robot_ip
+        self._port = port
+        # limits used to retime and validate trajectories before sending them
+        self.joint_limits: types.JointLimits | None = config.load_joint_limits(
+            config_path) if config_path else None
+        self.receiver = command_receiver.WebsocketThread(
+            f"ws://{self._robot_ip}:{self._port}/ws")
+        self.receiver.on_exception = self._on_exception
+        self.stream_observer = observers.StreamObserver()
+        self.telemetry_observer = observers.TelemetryObserver()
+        self.status_observer = observers.StatusObserver()
+        self.stream_controller = controllers.StreamController(
+            self.stream_observer)
+        self.machine_controller = controllers.MachineController(
+            self.status_observer)
+        self.machine_controller.on_exception = self._on_exception
+        self.receiver.attach_observer(self.telemetry_observer)
+        self.receiver.attach_observer(self.stream_observer)
+        self.receiver.attach_observer(self.status_observer)
+        # reports the observers not updated within telemetry_timeout once started
+        self.watchdog = watchdog.Watchdog(on_exception=self._on_exception)
+        # tasks of the receiver and controllers, see start()
+        self._tasks: tp.List[asyncio.Task] = []
+        # loop the robot was started on
+        self._loop: asyncio.AbstractEventLoop = None
+        # task listening to the receiver, see start()
+        self._listen_task: asyncio.Task = None
+        # watches of the observers, see start()
+        self._watches: tp.List[watchdog.Watch] = []
+
+    def _on_exception(self, exc: BaseException):
+        self._logger.error('%s: %s', type(exc), exc)
+
+    def _spawn(self, coro) -> tp.Any:
+        """ Run coro in the background, on the loop of the robot. """
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.append(task)
+        return task
+
+    async def start(self):
+        """ Start communication with robot, on the running loop. """
+        self.killed = False
+        self._loop = asyncio.get_running_loop()
+        self._listen_task = self._spawn(self.receiver.listen())
+        self._spawn(self.stream_controller.start())
+        self._spawn(self.machine_controller.start())
+        self._watches = [self.watchdog.watch(observer, self.telemetry_timeout)
+                         for observer in (self.telemetry_observer, self.stream_observer)]
+        # the heartbeat of GBC comes with the status
+        self._watches.append(self.watchdog.watch(self.status_observer, self.telemetry_timeout,
+                                                 exception=errors.HeartbeatFailure))
+        self._spawn(self.watchdog.run())
+
+    async def close(self):
+        """ Stop communication with robot, cancel the tasks of the robot and wait for them. """
+        self._logger.debug('Closing robot.')
+        self.killed = True
+        self.stream_controller.stop()
+        self.machine_controller.stop()
+        for watch in self._watches:
+            self.watchdog.unwatch(watch)
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def enable_async(self):
+        """ Enable machine by setting it's state to OPERATION_ENABLED coroutine. """
+        self.machine_controller.schedule_first(
+            commands.HeartbeatCommad(self.receiver, frequency=2))
+        operational = self.machine_controller.schedule_last(
+            commands.MachineStateCommad(self.receiver,
+                                        desired_state=cia402.CIA402MachineState.OPERATION_ENABLED))
+        return await operational
+
+    async def disable_async(self):
+        """ Disable robot. """
+        disabled = self.machine_controller.schedule_last(
+            commands.MachineStateCommad(self.receiver,
+                                        desired_state=cia402.CIA402MachineState.SWITCH_ON_DISABLED))
+        return await disabled
+
+    async def set_dout_async(self, position: int, value: int, override: bool):
+        """ Send set digital out command. """
+        task = self.machine_controller.schedule_last(
+            commands.DoutCommad(self.receiver,
+                                position=position,
+                                value=value,
+                                override=override))
+        return await task
+
+    async def stream_dout_async(self, position: int, value: bool):
+        """ Set a digital out from the stream, after the moves sent before it
+            and with no round trip to this side. """
+        task = self.stream_controller.schedule_last(
+            commands.DoutActivityCommand(self.receiver,
+                                         position=position,
+                                         value=value))
+        return await task
+
+    async def stream_aout_async(self, position: int, value: float):
+        """ Set an analog out from the stream, after the moves sent before it. """
+        task = self.stream_controller.schedule_last(
+            commands.AoutActivityCommand(self.receiver,
+                                         position=position,
+                                         value=value))
+        return await task
+
+    async def stream_iout_async(self, position: int, value: int):
+        """ Set an integer out from the stream, after the moves sent before it. """
+        task = self.stream_controller.schedule_last(
+            commands.IoutActivityCommand(self.receiver,
+                                         position=position,
+                                         value=value))
+        return await task
+
+    async def dwell_async(self, ms: int):
+        """ Wait `ms` milliseconds in the stream, between the moves sent before and after. """
+        task = self.stream_controller.schedule_last(
+            commands.DwellCommand(self.receiver, ms=ms))
+        return await task
+
+    async def send_serial_async(self, position: int, hex_string: int):
+        """ Send serial command. """
+        task = self.machine_controller.schedule_last(
+            commands.SerialCommad(self.receiver,
+                                  data=hex_string))
+        return await task
+
+    async def set_machine_target_async(self, target: types.MachineTarget):
+        return await self.machine_controller.schedule_last(
+            commands.MachineTargetCommad(self.receiver, target=target))
+
+    async def set_speed_async(self, value: float):
+        task = self.machine_controller.schedule_last(
+            commands.KinematicsConfigurationCommad(
+                self.receiver, target_feed_rate=value)
+        )
+        return await task
+
+    async def stream_speed_async(self, value: float, at_tag: int = None):
+        """ Set the feed rate (0.0-2.0) from the stream, when the item of tag `at_tag` starts
+            executing, by default the next item scheduled. The items sent before it keep
+            streaming, unlike :meth:`set_speed_async` which waits its turn in the machine queue. """
+        task = self.stream_controller.schedule_last(
+            commands.StreamFeedRateCommand(self.receiver, value, at_tag=at_tag))
+        return await task
+
+    async def set_safe_limits_async(self, value: bool):
+        task = self.machine_controller.schedule_first(
+            commands.KinematicsConfigurationCommad(
+                self.receiver, safe_limits=value)
+        )
+        return await task
+
+    def _call_soon(self, callback: tp.Callable[[], None]):
+        """ Call callback on the loop of the robot, right away if already on it. """
+        loop = self._loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is None or running is loop:
+            callback()
+        else:
+            loop.call_soon_threadsafe(callback)
+
+    def _stream_cmd(self, command: types.StreamCommandType):
+        """ Send a stream command ahead of everything queued, bypassing the controllers.
+            On STOP the items not written yet, scheduled or waiting in the outgoing queue
+            of the receiver, are dropped and their tasks cancelled in the same step of the
+            loop, so none of them can be written after it. """
+        since = time.perf_counter()
+        message = templates.stream_command().render(command)
+
+        def send():
+            if command is types.StreamCommandType.STOP:
+                self.stream_controller.abort(self.receiver)
+            self.receiver.send_urgent(message, since)
+        self._call_soon(send)
+
+    def stop_stream(self):
+        """ Stop stream, the items not sent yet are dropped. Sets velocity to zero, to restart increase velocity and call run() """
+        self._stream_cmd(types.StreamCommandType.STOP)
+
+    def pause_stream(self):
+        """ Pause stream. Sets velocity to zero, to restart increase velocity and call run() """
+        self._stream_cmd(types.StreamCommandType.PAUSE)
+
+    def run_stream(self):
+        """ Run stream. Used after stopping or pausing."""
+        self._stream_cmd(types.StreamCommandType.RUN)
+
+    def stream_command_latency(self) -> types.LatencyStats:
+        """ Time from :meth:`stop_stream`, :meth:`pause_stream` or :meth:`run_stream` to the message
+            written on the socket, heartbeats, stream feed rates and jog velocities included since they are sent ahead of the queues too. """
+        return self.receiver.urgent_latency()
+
+    def jog(self,
+            rate: float = 250,
+            timeout: float = 0.1,
+            move_params: types.MoveParametersConfig = None) -> jogging.JogHandle:
+        """ Start jogging, returns a handle to push joint velocities into,
+            see :class:`~awtube.jogging.JogHandle`. Close it to stop. """
+        handle = jogging.JogHandle(self.receiver,
+                                   rate=rate,
+                                   timeout=timeout,
+                                   move_params=move_params)
+        self._spawn(handle.run())
+        return handle
+
+    def superimpose(self,
+                    rate: float = 250,
+                    stream_index: int = 1,
+                    max_offset: float = None,
+                    move_params: types.MoveParametersConfig = None) -> superimposed.OffsetStream:
+        """ Start streaming Cartesian offsets superimposed on the motion, returns the
+            stream to give corrections to, see :class:`~awtube.superimposed.OffsetStream`.
+            Close it to stop. """
+        offsets = superimposed.OffsetStream(self.receiver,
+                                            rate=rate,
+                                            stream_index=stream_index,
+                                            max_offset=max_offset,
+                                            move_params=move_params)
+        self._spawn(offsets.run())
+        return offsets
+
+    def set_default_move_params(self, move_params: types.MoveParametersConfig | None):
+        """ Set the move parameters used by the moves of the stream sent without their own,
+            e.g. an overlapped blend between consecutive moves. None to use the GBC defaults. """
+        self.stream_controller.default_move_params = move_params
+
+    def validate_trajectory(self, points, duration: float = 0.1) -> validation.ValidationResult:
+        """ Check a trajectory, a list of JointStates, against the configured joint limits
+            without sending it, see :func:`~awtube.validation.validate`. """
+        positions = [pt.positions for pt in points]
+        velocities = [pt.velocities for pt in points]
+        return validation.validate(positions,
+                                   self.joint_limits,
+                                   period=duration,
+                                   velocities=None if any(v is None for v in velocities) else velocities)
+
+    async def move_joints_interpolated_async(self,
+                                             points,
+                                             duration: float = 0.1,
+                                             move_params: types.MoveParametersConfig = None):
+        """ Send a trajectory, a list of JointStates or a :class:`~awtube.trajectories.Trajectory`,
+            reached one after the other every `duration` seconds, see
+            :func:`~awtube.trajectories.resample`. A Trajectory with `durations` is sent
+            with them instead, its last point may be reached sooner. The points are
+            queued as the rows of a :class:`~awtube.commands.TrajectoryBatch`. """
+        if isinstance(points, trajectories.Trajectory):
+            positions, velocities = points.positions, points.velocities
+            if points.durations is not None:
+                duration = points.durations
+        elif len(points):
+            positions = [pt.positions for pt in points]
+            velocities = [pt.velocities for pt in points]
+        else:
+            return await self.stream_controller.schedule_last([])
+        batch = commands.TrajectoryBatch(self.receiver, positions, velocities, duration=duration)
+        return await self.stream_controller.schedule_last(batch.commands(move_params))
+
+    async def move_line_async(self,
+                              translation: tp.Dict[str, float],
+                              rotation: tp.Dict[str, float],
+                              move_params: types.MoveParametersConfig = None):
+        """ Send a moveLine command.
+            translation dict with keys {'x', 'y', 'z'}
+            rotation dict with keys {'x', 'y', 'z', 'w'}
+            move_params to override the default move parameters of the stream
+        """
+        cmd = commands.MoveLineCommand(
+            self.receiver, translation, rotation, move_params=move_params)
+        task = self.stream_controller.schedule_last(cmd)
+        return await task
+
+    async def move_joints_async(self, joints: list, move_params: types.MoveParametersConfig = None):
+        """ Send a moveJoints command. Joint position values are in radians."""
+        cmd = commands.MoveJointsCommand(
+            self.receiver, joint_positions=joints, move_params=move_params)
+        task = self.stream_controller.schedule_last(cmd)
+        return await task
+
+    async def move_to_position_async(self,
+                                     translation: tp.Dict[str, float],
+                                     rotation: tp.Dict[str, float],
+                                     move_params: types.MoveParametersConfig = None):
+        cmd = commands.MoveToPositionCommand(self.receiver, translation,rotation,
+                                             move_params=move_params)
+        task = self.stream_controller.schedule_last(cmd)
+        return await task
+
+    async def move_arc_async(self,
+                             translation: tp.Dict[str, float],
+                             rotation: tp.Dict[str, float],
+                             centre: tp.Dict[str, float],
+                             direction: types.ArcDirection = types.ArcDirection.CCW,
+                             plane: tp.Dict[str, float] = None,
+                             move_params: types.MoveParametersConfig = None):
+        """ Send a moveArc command.
+
+        Args:
+            translation (tp.Dict[str, float]): destination x, y, z
+            rotation (tp.Dict[str, float]): destination quaternion x, y, z, w
+            centre (tp.Dict[str, float]): centre of the arc x, y, z
+            direction (types.ArcDirection): clockwise or counterclockwise
+            plane (tp.Dict[str, float], optional): quaternion rotating the XY plane
+                on the plane of the arc. Defaults to the XY plane.
+            move_params (types.MoveParametersConfig, optional): overrides the default
+                move parameters of the stream. Defaults to None.
+        """
+        cmd = commands.MoveArcCommand(self.receiver,
+                                      translation,
+                                      rotation,
+                                      centre,
+                                      direction=direction,
+                                      plane=plane,
+                                      move_params=move_params)
+        task = self.stream_controller.schedule_last(cmd)
+        return await task
+
+    async def move_path_async(self,
+                              translations,
+                              rotations,
+                              activity: types.ActivityType = types.ActivityType.MOVELINE,
+                              tolerance: float = None,
+                              angle_tolerance: float = None,
+                              fit_arcs: bool = False,
+                              move_params: types.MoveParametersConfig = None):
+        """ Stream a dense Cartesian path in bulk, see :mod:`~awtube.poses`.
+
+        Args:
+            translations: array of shape (N, 3), x, y, z of each pose.
+            rotations: array of shape (N, 4), quaternion x, y, z, w of each pose.
+            activity: MOVELINE or MOVETOPOSITION, the item streamed for each pose.
+            tolerance: if given the path is simplified first, see
+                :func:`~awtube.simplification.simplify`.
+            angle_tolerance: rotation tolerance of the simplification, in radians.
+            fit_arcs: also replace runs of points on a circle by moveArc items
+                within tolerance, see :func:`~awtube.simplification.fit_arcs`.
+            move_params: move parameters of every item, e.g. to blend them,
+                defaults to the ones of the stream.
+        """
+        if activity == types.ActivityType.MOVELINE:
+            command = commands.MoveLineCommand
+        elif activity == types.ActivityType.MOVETOPOSITION:
+            command = commands.MoveToPositionCommand
+        else:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'Path activity should be MOVELINE or MOVETOPOSITION.')
+        path = poses.CartesianPath(translations=np.asarray(translations, dtype=float),
+                                   rotations=np.asarray(rotations, dtype=float))
+        if fit_arcs:
+            if tolerance is None:
+                raise errors.AWTubeErrorException(
+                    errors.AwtubeError.BAD_ARGUMENT, 'A tolerance is needed to fit arcs.')
+            fitted = simplification.fit_arcs(path.translations,
+                                             path.rotations,
+                                             tolerance=tolerance,
+                                             angle_tolerance=angle_tolerance)
+            self._logger.debug('Path fitted from %d to %d items, max deviation %.3f.',
+                               len(path), len(fitted.segments) + 1, fitted.max_deviation)
+            items = list(path.items())
+            cmds = [command(self.receiver, *items[0], move_params=move_params)]
+            for segment in fitted.segments:
+                translation, rotation = items[segment.index]
+                if segment.activity == types.ActivityType.MOVEARC:
+                    cmds.append(commands.MoveArcCommand(
+                        self.receiver,
+                        translation,
+                        rotation,
+                        centre=dict(zip('xyz', segment.centre.tolist())),
+                        direction=segment.direction,
+                        plane=None if segment.plane is None else dict(
+                            zip('xyzw', segment.plane.tolist())),
+                        move_params=move_params))
+                else:
+                    cmds.append(command(self.receiver, translation, rotation,
+                                        move_params=move_params))
+            return await self.stream_controller.schedule_last(cmds)
+        if tolerance is not None:
+            simplified = simplification.simplify(path.translations,
+                                                 path.rotations,
+                                                 tolerance=tolerance,
+                                                 angle_tolerance=angle_tolerance)
+            self._logger.debug('Path simplified from %d to %d items, max deviation %.3f.',
+                               len(path), len(simplified.path), simplified.max_deviation)
+            path = simplified.path
+        cmds = [command(self.receiver, translation, rotation, move_params=move_params)
+                for translation, rotation in path.items()]
+        return await self.stream_controller.schedule_last(cmds)
+
+    async def run_program_async(self,
+                                prog: program.Program | program.CompiledProgram,
+                                repeat: int = 1,
+                                cache_dir: str | None = program.DEFAULT_CACHE_DIR):
+        """ Replay a program `repeat` times, see :mod:`~awtube.program`.
+
+        Args:
+            prog: program, compiled first if needed.
+            repeat: number of runs, streamed back to back.
+            cache_dir: directory of the compiled programs, None for no disk cache.
+        """
+        compiled = prog if isinstance(prog, program.CompiledProgram) else prog.compile(cache_dir)
+        return await self.stream_controller.schedule_last(compiled.commands(self.receiver, repeat))
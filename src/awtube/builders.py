@@ -5,29 +5,38 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 import typing
-from pydantic import BaseModel
 
-from awtube.types import ActivityType, PositionReference, Pose, MachineTarget, StreamCommandType
+from awtube.templates import dumps
+from awtube.types import ActivityType, ArcDirection, ArcType, PositionReference, Pose, MachineTarget, StreamCommandType
 
 
-class Builder(ABC, BaseModel):
+class Builder(ABC):
     """
     The Builder interface specifies methods for creating the different parts of
-    the Message objects, which also is a pydantic BaseModel.
+    the Message objects. A builder only holds the state of the message being
+    built, so builders are cheap to create: use one per message or per thread,
+    never one shared by threads.
     """
+    __slots__ = ('_build_warnings',)
 
-    _build_warnings = False
+    def __init__(self):
+        self._build_warnings = False
+        self.reset()
 
     @property
     def build_warnings(self) -> bool:
-        """ Flag to activate warnings during build of json. """
+        """ Flag to activate warnings during build of json, kept for compatibility. """
         return self._build_warnings
 
     @build_warnings.setter
     def build_warnings(self, val: bool):
-        """ Flag to activate warnings during build of json. """
+        """ Flag to activate warnings during build of json, kept for compatibility. """
         self._build_warnings = val
 
+    @abstractmethod
+    def reset(self) -> Builder:
+        raise NotImplementedError
+
     @abstractmethod
     def build(self):
         raise NotImplementedError
@@ -37,13 +46,7 @@ class StreamCommandBuilder(Builder):
     """
     Builder for Stream Activity
     """
-    # protected auto non-serialized
-    _kc: int = 0
-    _machine: int = 0
-    _machine_target: int = int(MachineTarget.SIMULATION)
-    _fro: float = 1.0
-
-    command: dict = None
+    __slots__ = ('_kc', '_machine', '_machine_target', '_fro', 'command')
 
     def machine(self, val: int) -> StreamCommandBuilder:
         self._machine = val
@@ -54,15 +57,13 @@ class StreamCommandBuilder(Builder):
         self.command = None
         self._kc = 0
         self._machine = 0
-        self._machine_target: int = int(MachineTarget.SIMULATION)
-        self._fro: float = 1.0
+        self._machine_target = int(MachineTarget.SIMULATION)
+        self._fro = 1.0
         return self
 
     def build(self) -> str:
         """ Return Stream model serialized in json. """
-        return self.model_dump_json(
-            warnings=self._build_warnings
-        )
+        return dumps({"command": self.command})
 
     def kinematics_configuration(self, value: int) -> StreamCommandBuilder:
         self._kc = value
@@ -171,35 +172,11 @@ class StreamCommandBuilder(Builder):
         return self
 
 
-# TODO: study and implement move_params features
-# class MoveParametersConfig(BaseModel):
-#     """ Configuration parameters for move parameters. """
-#     amax_percentage: float = Field(None, alias='amaxPercentage')
-#     blend_time_percentage: float = Field(None, alias='blendTimePercentage')
-#     blend_tolerance: float = Field(None, alias='blendTolerance')
-#     blend_type: BlendType = Field(None, alias='blendType')
-#     jmax_percentage: float = Field(None, alias='jmaxPercentage')
-#     # Linear and angular limit profile to use for mov
-#     limit_configuration_index: float = Field(
-#         None, alias='limitConfigurationIndex')
-#     name: str = Field(None)
-#     sync_type: SyncType = Field(None, alias='syncType')
-#     sync_value: float = Field(None, alias='syncValue')
-#     tool_index: int = Field(None, alias='toolIndex')
-#     vmax: float = Field(None)
-#     vmax_percentage: float = Field(None, alias='vmaxPercentage')
-
-
 class StreamActivityBuilder(Builder):
     """
     Builder for Stream Activity
     """
-    # protected auto non-serialized
-    _stream_index: int = 0
-    _items: list = []
-    _enable_end_program: bool = False
-
-    stream: dict = None
+    __slots__ = ('_stream_index', '_items', '_enable_end_program', 'stream')
 
     @property
     def items(self) -> list:
@@ -224,9 +201,7 @@ class StreamActivityBuilder(Builder):
             "name": "default",
             "enableEndProgram": False
         }
-        return self.model_dump_json(
-            warnings=self._build_warnings
-        )
+        return dumps({"stream": self.stream})
 
     def enable_end_program(self, enable: bool) -> StreamActivityBuilder:
         """ Set enableEndProgram flag. """
@@ -263,7 +238,7 @@ class StreamActivityBuilder(Builder):
         self._items.append({
             "activityType": int(ActivityType.MOVEJOINTSATVELOCITY),
             "tag": tag,
-            "moveJoints": {
+            "moveJointsAtVelocity": {
                 "moveParams": move_params,
                 "kinematicsConfigurationIndex": kc,
                 "jointVelocityArray": joint_velocity_array}
@@ -275,15 +250,17 @@ class StreamActivityBuilder(Builder):
                                  joint_velocity_array: list,
                                  tag: int,
                                  kc: int,
-                                 move_params: dict) -> StreamActivityBuilder:
-        """ Add a moveJointsInterpolated item to the stream activity. """
+                                 move_params: dict,
+                                 duration: float = 0.1) -> StreamActivityBuilder:
+        """ Add a moveJointsInterpolated item to the stream activity,
+            reaching the point in `duration` seconds. """
         self._items.append({
             "activityType": int(ActivityType.MOVEJOINTSINTERPOLATED),
             "tag": tag,
             "moveJointsInterpolated": {
                 "moveParams": move_params,
                 "kinematicsConfigurationIndex": kc,
-                "duration": 0.1,
+                "duration": duration,
                 "jointPositionArray": list(joint_position_array),
                 "jointVelocityArray": list(joint_velocity_array)}
         })
@@ -350,36 +327,156 @@ class StreamActivityBuilder(Builder):
                 }}})
         return self
 
+    def set_dout(self,
+                 position: int,
+                 value: bool,
+                 tag: int) -> StreamActivityBuilder:
+        """ Add a setDout item, set in order with the moves of the stream. """
+        self._items.append({
+            "activityType": int(ActivityType.SETDOUT),
+            "tag": tag,
+            "setDout": {
+                "doutToSet": position,
+                "valueToSet": bool(value)}
+        })
+        return self
+
+    def set_aout(self,
+                 position: int,
+                 value: float,
+                 tag: int) -> StreamActivityBuilder:
+        """ Add a setAout item, set in order with the moves of the stream. """
+        self._items.append({
+            "activityType": int(ActivityType.SETAOUT),
+            "tag": tag,
+            "setAout": {
+                "aoutToSet": position,
+                "valueToSet": float(value)}
+        })
+        return self
+
+    def set_iout(self,
+                 position: int,
+                 value: int,
+                 tag: int) -> StreamActivityBuilder:
+        """ Add a setIout item, set in order with the moves of the stream. """
+        self._items.append({
+            "activityType": int(ActivityType.SETIOUT),
+            "tag": tag,
+            "setIout": {
+                "ioutToSet": position,
+                "valueToSet": int(value)}
+        })
+        return self
+
+    def dwell(self,
+              ms: int,
+              tag: int) -> StreamActivityBuilder:
+        """ Add a dwell item, the stream waits `ms` milliseconds before the next item. """
+        self._items.append({
+            "activityType": int(ActivityType.DWELL),
+            "tag": tag,
+            "dwell": {
+                "msToDwell": int(ms)}
+        })
+        return self
+
+    def move_arc(self,
+                 translation: dict,
+                 rotation: dict,
+                 centre: dict,
+                 direction: ArcDirection,
+                 tag: int,
+                 kc: int,
+                 move_params: dict,
+                 plane: dict = None) -> StreamActivityBuilder:
+        """ Add a moveArc item, defined by its centre, to the stream activity.
+            The arc lies in the XY plane, rotated by the `plane` quaternion if given. """
+        move_arc = {
+            "moveParams": move_params,
+            "kinematicsConfigurationIndex": kc,
+            "arcType": int(ArcType.CENTRE),
+            "arcDirection": int(direction),
+            "destination": {
+                "position": {
+                    "translation": {
+                        "x": float(translation["x"]),
+                        "y": float(translation["y"]),
+                        "z": float(translation["z"])
+                    },
+                    "rotation": {
+                        "x": float(rotation["x"]),
+                        "y": float(rotation["y"]),
+                        "z": float(rotation["z"]),
+                        "w": float(rotation["w"])
+                    },
+                    "positionReference": int(PositionReference.ABSOLUTE)},
+                "configuration": 0
+            },
+            "centre": {
+                "translation": {
+                    "x": float(centre["x"]),
+                    "y": float(centre["y"]),
+                    "z": float(centre["z"])
+                },
+                "positionReference": int(PositionReference.ABSOLUTE)}}
+        if plane is not None:
+            move_arc["plane"] = {
+                "x": float(plane["x"]),
+                "y": float(plane["y"]),
+                "z": float(plane["z"]),
+                "w": float(plane["w"])
+            }
+        self._items.append({
+            "activityType": int(ActivityType.MOVEARC),
+            "tag": tag,
+            "moveArc": move_arc})
+        return self
+
 
-# TODO:
 class ActivityBuilder(Builder):
     """
-    Builder for Stream Activity
+    Builder for solo activities, a new solo activity replaces the running one.
     """
-    # protected auto non-serialized
-
-# def solo_activity_move_joints_cmd(
-#         joints: JointStates,
-#         stream_index: int = 0,
-#         tag: int = 0,
-#         kinematics_configuration_index: int = 0,
-#         debug: bool = False) -> str:
-#     """ Create activityMoveJoints json command """
-#     return json.dumps({
-#         "command": {
-#             "soloActivity": {
-#                 "0": {
-#                     "command": {
-#                         "tag": tag,
-#                         "activityType": 3,
-#                         "moveJoints": {
-#                             "jointPositionArray": list(joints.positions)
-#                         }
-#                     }
-#                 }
-#             }
-#         }
-#     })
+    __slots__ = ('_index', 'command')
+
+    def reset(self) -> ActivityBuilder:
+        """ Reset all fields of model to default values. """
+        self.command = None
+        self._index = 0
+        return self
+
+    def build(self) -> str:
+        """ Return solo activity model serialized in json. """
+        return dumps({"command": self.command})
+
+    def index(self, val: int) -> ActivityBuilder:
+        """ Set index of the solo activity. """
+        self._index = val
+        return self
+
+    def _activity(self, activity: dict) -> ActivityBuilder:
+        self.command = {
+            "soloActivity": {
+                f"{self._index}": {
+                    "command": activity
+                }}}
+        return self
+
+    def move_joints_at_velocity(self,
+                                joint_velocity_array: list,
+                                tag: int,
+                                kc: int,
+                                move_params: dict) -> ActivityBuilder:
+        """ Move joints at velocity until replaced by another activity. """
+        return self._activity({
+            "activityType": int(ActivityType.MOVEJOINTSATVELOCITY),
+            "tag": tag,
+            "moveJointsAtVelocity": {
+                "moveParams": move_params,
+                "kinematicsConfigurationIndex": kc,
+                "jointVelocityArray": list(joint_velocity_array)}
+        })
 
 
 # def get_stream_pause_program(stream_index: int = 0, debug: bool = False) -> str:
@@ -4,14 +4,17 @@
 
 from abc import ABC, abstractmethod
 import websockets
-from typing import Dict
+from typing import Callable, Dict
+import collections
 import logging
 import queue
 import asyncio
+import time
 
 from .threadloop import threadloop
 
 from .observers import Observer
+from . import types
 
 
 class CommandReceiver(ABC):
@@ -32,6 +35,31 @@ class CommandReceiver(ABC):
         """
         raise NotImplementedError
 
+    async def send(self, message: str):
+        """ Send message bypassing the queue where possible, by default put it in the queue.
+
+        Args:
+            message : json str
+        """
+        self.put(message)
+
+    def discard_queued(self, predicate: Callable[[str], bool]) -> int:
+        """ Remove the queued messages matching predicate, not written yet. By default nothing is queued.
+
+        Returns:
+            number of messages removed
+        """
+        return 0
+
+    def send_urgent(self, message: str, since: float = None):
+        """ Send message ahead of every queued one, callable from any thread. By default put it in the queue.
+
+        Args:
+            message : json str
+            since : perf_counter time of the request, now if None
+        """
+        self.put(message)
+
 
 # disable websockets logging
 # TODO: improve, don't just disable
@@ -64,10 +92,26 @@ class WebsocketThread(CommandReceiver):
 
         self.killed: bool = False
         self.outgoing = queue.Queue()
+        # connected socket, for messages sent without going through the queue
+        self._socket = None
+        # loop of the socket, set by listen()
+        self._loop: asyncio.AbstractEventLoop = None
+        # (message, perf_counter time of the request) sent before the outgoing queue
+        self._urgent = collections.deque()
+        # seconds from send_urgent() to the message written on the socket
+        self._urgent_latencies = collections.deque(maxlen=1000)
+        # messages written on the socket
+        self.sent_count = 0
+        # called with the exceptions ending listen()
+        self.on_exception: Callable[[BaseException], None] = threadloop.register_exception
         # coroutines to be run asynchronously later they get the websocket as argument
         self._tasks = [self.listen_queue, self.listen_socket]
         self._observers = []
 
+    @property
+    def connected(self) -> bool:
+        return self._socket is not None
+
     def attach_observer(self, sub: Observer):
         """ Attach Observer. """
         if sub not in self._observers:
@@ -90,14 +134,20 @@ class WebsocketThread(CommandReceiver):
 
     async def listen(self):
         """ Listen to the websocket and local outgoing queue """
+        self._loop = asyncio.get_running_loop()
         try:
             async with websockets.connect(self.url, extra_headers=self.headers) as socket:
+                self._socket = socket
                 await asyncio.gather(*(task(socket) for task in self._tasks), return_exceptions=False)
                 # await asyncio.gather(*(task(socket) for task in self._tasks))
         except Exception as e:
-            threadloop.register_exception(e)
+            self.on_exception(e)
         except websockets.exceptions.WebSocketException as e:
-            threadloop.register_exception(e)
+            self.on_exception(e)
+        finally:
+            self._socket = None
+            # not written before the disconnection, stale by the next connection
+            self._urgent.clear()
 
     async def listen_socket(self, socket):
         """ Listen for messages on the socket, schedule tasks to handle """
@@ -113,9 +163,75 @@ class WebsocketThread(CommandReceiver):
                 try:
                     msg = self.outgoing.get(block=False)
                     asyncio.create_task(socket.send(msg))
+                    self.sent_count += 1
                 except queue.Empty:
                     continue
 
     def put(self, message: str):
         """ Put message in the receivers queue. """
         self.outgoing.put(message)
+
+    async def send(self, message: str):
+        """ Write message on the socket right away, skipping the polled queue.
+            Must be awaited on the loop of the socket. """
+        if self._socket is None:
+            self.put(message)
+            return
+        await self._socket.send(message)
+        self.sent_count += 1
+
+    def discard_queued(self, predicate: Callable[[str], bool]) -> int:
+        """ Remove the messages of the outgoing queue matching predicate, e.g. the stream
+            items dropped by a STOP, returns how many. """
+        with self.outgoing.mutex:
+            waiting = self.outgoing.queue
+            kept = [message for message in waiting if not predicate(message)]
+            discarded = len(waiting) - len(kept)
+            if discarded:
+                waiting.clear()
+                waiting.extend(kept)
+        return discarded
+
+    def send_urgent(self, message: str, since: float = None):
+        """ Write message on the socket before anything queued, from any thread. From the
+            loop of the socket it is written on the next iteration of the loop, without waiting
+            for the queue to be polled. Dropped if the socket is not connected, a heartbeat or
+            a stream command written late on reconnection would be stale, a late RUN could
+            even start motion. """
+        loop = self._loop
+        if loop is None or self._socket is None:
+            self._logger.debug('Not connected, urgent message dropped: %s', message)
+            return
+        self._urgent.append((message, time.perf_counter() if since is None else since))
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._drain_urgent()
+        else:
+            loop.call_soon_threadsafe(self._drain_urgent)
+
+    def _drain_urgent(self):
+        socket = self._socket
+        if socket is None:
+            # disconnected after send_urgent()
+            self._urgent.clear()
+            return
+        while self._urgent:
+            message, since = self._urgent.popleft()
+            # tasks start in order, their frames are written in order
+            self._loop.create_task(self._write_urgent(socket, message, since))
+
+    async def _write_urgent(self, socket, message: str, since: float):
+        try:
+            await socket.send(message)
+        except Exception as e:
+            self.on_exception(e)
+            return
+        self._urgent_latencies.append(time.perf_counter() - since)
+        self.sent_count += 1
+
+    def urgent_latency(self) -> types.LatencyStats:
+        """ Time from :meth:`send_urgent` to the message written on the socket, over the last 1000. """
+        return types.LatencyStats.from_samples(self._urgent_latencies)
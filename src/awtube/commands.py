@@ -5,20 +5,28 @@
 from __future__ import annotations
 from abc import ABC, abstractmethod
 import typing as tp
+import numpy as np
 
-from . import command_receiver,  cia402,  types,  builders, errors
+from . import command_receiver,  cia402,  types,  templates, errors
 
-# builder
-stream_activity_builder = builders.StreamActivityBuilder()
-stream_command_builder = builders.StreamCommandBuilder()
 
 # TODO: there's confusion between command and stream which also is a command
 
 
+def _move_params(params: types.MoveParametersConfig | None) -> dict:
+    """ Return the moveParams dict of a move, empty to use the GBC defaults. """
+    return params.to_dict() if params is not None else {}
+
+
 class Command(ABC):
     """ The Command interface. """
+    __slots__ = ()
     tag = 0
     receiver = None
+    # moves only, None to use the default move parameters of the stream
+    move_params = None
+    # stream items only, set once sent to GBC
+    sent = False
 
     @abstractmethod
     def execute(self):
@@ -36,9 +44,9 @@ class HeartbeatCommad(Command):
         self._frequency = frequency
 
     def execute(self):
-        msg = stream_command_builder.reset().machine(
-            self._machine).heartbeat(self._heartbeat).build()
-        self._receiver.put(msg)
+        msg = templates.heartbeat(self._machine).render(self._heartbeat)
+        # late heartbeats disable the machine, not queued behind other messages
+        self._receiver.send_urgent(msg)
 
 
 class IoutCommad(Command):
@@ -55,9 +63,7 @@ class IoutCommad(Command):
         self._override = override
 
     def execute(self):
-        msg = stream_command_builder.reset().iout(self._position,
-                                                  self._value,
-                                                  override=self._override).build()
+        msg = templates.output('iout', self._position).render(self._value, self._override)
         self._receiver.put(msg)
 
 
@@ -75,9 +81,7 @@ class DoutCommad(Command):
         self._override = override
 
     def execute(self):
-        msg = stream_command_builder.reset().dout(self._position,
-                                                  self._value,
-                                                  override=self._override).build()
+        msg = templates.output('dout', self._position).render(self._value, self._override)
         self._receiver.put(msg)
 
 
@@ -95,9 +99,7 @@ class SerialCommad(Command):
     def execute(self):
         data_l = self._data.replace(' ', '')
         data_l = [int(data_l[i:i+2], 16) for i in range(0, len(data_l), 2)]
-        msg = stream_command_builder.reset().serial(self._position,
-                                                    data_l,
-                                                    control_word=1).build()
+        msg = templates.serial(self._position).render(1, len(data_l), data_l)
         self._receiver.put(msg)
 
 
@@ -115,9 +117,7 @@ class AoutCommad(Command):
         self._override = override
 
     def execute(self):
-        msg = stream_command_builder.reset().aout(self._position,
-                                                  self._value,
-                                                  override=self._override).build()
+        msg = templates.output('aout', self._position).render(self._value, self._override)
         self._receiver.put(msg)
 
 
@@ -158,12 +158,11 @@ class KinematicsConfigurationCommad(Command):
         msg = None
 
         if self._target_feed_rate:
-            msg = stream_command_builder.reset().desired_feedrate(
-                self._target_feed_rate).build()
+            msg = templates.desired_feedrate().render(self._target_feed_rate)
             self._receiver.put(msg)
             return
         else:
-            msg = stream_command_builder.reset().safe_limits(self._safe_limits).build()
+            msg = templates.disable_limits().render(not self._safe_limits)
             self._receiver.put(msg)
             return
 
@@ -203,8 +202,7 @@ class MachineStateCommad(Command):
         return self.machine
 
     def execute(self):
-        msg = stream_command_builder.reset().machine(self._machine).control_word(
-            self._control_word).build()
+        msg = templates.control_word(self._machine).render(self._control_word)
         self._receiver.put(msg)
 
 
@@ -226,51 +224,142 @@ class MachineTargetCommad(Command):
         self._target = value
 
     def execute(self):
-        msg = stream_command_builder.reset().machine(
-            self._machine).machine_target(self._target).build()
+        msg = templates.machine_target(self._machine).render(self._target)
         self._receiver.put(msg)
 
 
 class MoveJointsInterpolatedCommand(Command):
+    __slots__ = ('joints', '_receiver', 'tag', 'kc', 'move_params', 'duration', 'sent')
+
     def __init__(self,
                  receiver: command_receiver.AWTubeErrorException,
                  joint_positions: tp.List[float],
                  joint_velocities: tp.List[float],
                  tag: int = 0,
-                 kc: int = 0):
+                 kc: int = 0,
+                 duration: float = 0.1,
+                 move_params: types.MoveParametersConfig = None):
         self.joints = types.JointStates(positions=joint_positions,
                                         velocities=joint_velocities)
         self._receiver = receiver
         self.tag = tag
         self.kc = kc
+        self.move_params = move_params
+        self.duration = duration
+        self.sent = False
 
     def execute(self):
-        msg = stream_activity_builder.reset().move_joints_interpolated(joint_position_array=self.joints.positions,
-                                                                       joint_velocity_array=self.joints.velocities,
-                                                                       tag=self.tag,
-                                                                       kc=self.kc,
-                                                                       move_params={}
-                                                                       ).build()
+        msg = templates.move_joints_interpolated(kc=self.kc).render(self.tag,
+                                                                    _move_params(self.move_params),
+                                                                    self.duration,
+                                                                    self.joints.positions,
+                                                                    self.joints.velocities)
         self._receiver.put(msg)
 
 
+class TrajectoryBatch:
+    """
+    Joint trajectory stored as a structure of arrays, one row of positions and
+    velocities per point, instead of lists of floats owned by each command.
+    Its commands only hold the row they send, see :meth:`commands`.
+    """
+    __slots__ = ('positions', 'velocities', 'duration', 'kc', '_receiver')
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 positions,
+                 velocities,
+                 duration: float = 0.1,
+                 kc: int = 0):
+        """
+        Args:
+            receiver: where the moves are sent.
+            positions: array of shape (N, joints), in radians.
+            velocities: array of shape (N, joints), in radians per second.
+            duration: time to reach every point from the previous one, in seconds,
+                or an array of shape (N,) with the time of each point.
+            kc: kinematics configuration index.
+        """
+        self.positions = np.ascontiguousarray(positions, dtype=float)
+        self.velocities = np.ascontiguousarray(velocities, dtype=float)
+        if self.positions.ndim != 2 or self.positions.shape != self.velocities.shape:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT,
+                f'Positions and velocities should be two arrays of the same shape (N, joints), '
+                f'got {self.positions.shape} and {self.velocities.shape}.')
+        if np.ndim(duration):
+            duration = np.ascontiguousarray(duration, dtype=float)
+            if duration.shape != (len(self.positions),):
+                raise errors.AWTubeErrorException(
+                    errors.AwtubeError.BAD_ARGUMENT,
+                    f'Durations should have shape ({len(self.positions)},), got {duration.shape}.')
+        self.duration = duration
+        self.kc = kc
+        self._receiver = receiver
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    @property
+    def nbytes(self) -> int:
+        """ Size of the arrays of the trajectory. """
+        return self.positions.nbytes + self.velocities.nbytes
+
+    def commands(self, move_params: types.MoveParametersConfig = None) -> tp.List[TrajectoryRowCommand]:
+        """ Return one moveJointsInterpolated command per point, to be streamed in order. """
+        return [TrajectoryRowCommand(self, row, move_params=move_params) for row in range(len(self))]
+
+    def execute_row(self, row: int, tag: int, move_params: types.MoveParametersConfig = None):
+        duration = self.duration if np.ndim(self.duration) == 0 else self.duration[row]
+        msg = templates.move_joints_interpolated(kc=self.kc).render(tag,
+                                                                    _move_params(move_params),
+                                                                    duration,
+                                                                    self.positions[row],
+                                                                    self.velocities[row])
+        self._receiver.put(msg)
+
+
+class TrajectoryRowCommand(Command):
+    """ moveJointsInterpolated to one point of a :class:`TrajectoryBatch`. """
+    __slots__ = ('batch', 'row', 'tag', 'move_params', 'sent')
+
+    def __init__(self,
+                 batch: TrajectoryBatch,
+                 row: int,
+                 tag: int = 0,
+                 move_params: types.MoveParametersConfig = None):
+        self.batch = batch
+        self.row = row
+        self.tag = tag
+        self.move_params = move_params
+        self.sent = False
+
+    @property
+    def joints(self) -> types.JointStates:
+        return types.JointStates(positions=self.batch.positions[self.row].tolist(),
+                                 velocities=self.batch.velocities[self.row].tolist())
+
+    def execute(self):
+        self.batch.execute_row(self.row, self.tag, self.move_params)
+
+
 class MoveJointsCommand(Command):
     def __init__(self,
                  receiver: command_receiver.AWTubeErrorException,
                  joint_positions: tp.List[float],
                  tag: int = 0,
-                 kc: int = 0):
+                 kc: int = 0,
+                 move_params: types.MoveParametersConfig = None):
         self.joints = joint_positions
         self._receiver = receiver
         self.tag = tag
         self.kc = kc
+        self.move_params = move_params
 
     def execute(self):
-        msg = stream_activity_builder.reset().move_joints(joint_position_array=self.joints,
-                                                          tag=self.tag,
-                                                          kc=self.kc,
-                                                          move_params={}
-                                                          ).build()
+        msg = templates.move_joints(kc=self.kc).render(self.tag,
+                                                       _move_params(self.move_params),
+                                                       self.joints)
         self._receiver.put(msg)
 
 
@@ -280,7 +369,8 @@ class MoveLineCommand(Command):
                  translation: tp.Dict[str, float],
                  rotation: tp.Dict[str, float],
                  tag: int = 0,
-                 kc: int = 0):
+                 kc: int = 0,
+                 move_params: types.MoveParametersConfig = None):
         self.pose = types.Pose(position=types.Position(**translation),
                                orientation=types.Quaternion(**rotation))
         self._translation = translation
@@ -288,14 +378,14 @@ class MoveLineCommand(Command):
         self._receiver = receiver
         self.tag = tag
         self.kc = kc
+        self.move_params = move_params
 
     def execute(self):
-        msg = stream_activity_builder.reset().move_line(translation=self._translation,
-                                                        rotation=self._rotation,
-                                                        tag=self.tag,
-                                                        kc=self.kc,
-                                                        move_params={}
-                                                        ).build()
+        t, r = self._translation, self._rotation
+        msg = templates.move_line(kc=self.kc).render(self.tag,
+                                                     _move_params(self.move_params),
+                                                     t['x'], t['y'], t['z'],
+                                                     r['x'], r['y'], r['z'], r['w'])
         self._receiver.put(msg)
 
 
@@ -306,24 +396,183 @@ class MoveToPositionCommand(Command):
                  rotation: dict,
                  tag: int = 0,
                  kc: int = 0,
-                 position_reference: types.PositionReference = types.PositionReference.ABSOLUTE):
+                 position_reference: types.PositionReference = types.PositionReference.ABSOLUTE,
+                 move_params: types.MoveParametersConfig = None):
         self._receiver = receiver
         self._translation = translation
         self._rotation=rotation
         self.tag = tag
         self.kc = kc
+        self.move_params = move_params
         self.position_reference = position_reference
 
     def execute(self):
-        msg = stream_activity_builder.reset().move_to_position(translation=self._translation,
-                                                               rotation=self._rotation,
-                                                               tag=self.tag,
-                                                               kc=self.kc,
-                                                               move_params={},
-                                                               position_reference=self.position_reference).build()
+        t, r = self._translation, self._rotation
+        msg = templates.move_to_position(kc=self.kc,
+                                         position_reference=self.position_reference).render(
+            self.tag,
+            _move_params(self.move_params),
+            t['x'], t['y'], t['z'],
+            r['x'], r['y'], r['z'], r['w'])
+        self._receiver.put(msg)
+
+
+class MoveArcCommand(Command):
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 translation: tp.Dict[str, float],
+                 rotation: tp.Dict[str, float],
+                 centre: tp.Dict[str, float],
+                 direction: types.ArcDirection = types.ArcDirection.CCW,
+                 plane: tp.Dict[str, float] = None,
+                 tag: int = 0,
+                 kc: int = 0,
+                 move_params: types.MoveParametersConfig = None):
+        self._receiver = receiver
+        self._translation = translation
+        self._rotation = rotation
+        self._centre = centre
+        self.direction = direction
+        self.plane = plane
+        self.tag = tag
+        self.kc = kc
+        self.move_params = move_params
+
+    def execute(self):
+        t, r, c = self._translation, self._rotation, self._centre
+        values = [self.tag, _move_params(self.move_params), self.direction,
+                  t['x'], t['y'], t['z'],
+                  r['x'], r['y'], r['z'], r['w'],
+                  c['x'], c['y'], c['z']]
+        if self.plane is not None:
+            p = self.plane
+            values += [p['x'], p['y'], p['z'], p['w']]
+        msg = templates.move_arc(kc=self.kc, plane=self.plane is not None).render(*values)
         self._receiver.put(msg)
 
 
+class MoveJointsAtVelocityCommand(Command):
+    """ Move joints at velocity as a solo activity, replacing the running one. """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 joint_velocities: tp.List[float],
+                 tag: int = 0,
+                 kc: int = 0,
+                 move_params: types.MoveParametersConfig = None):
+        self.velocities = joint_velocities
+        self._receiver = receiver
+        self.tag = tag
+        self.kc = kc
+        self.move_params = move_params
+
+    def execute(self):
+        msg = templates.solo_move_joints_at_velocity(kc=self.kc).render(self.tag,
+                                                                        _move_params(self.move_params),
+                                                                        self.velocities)
+        # not queued behind the stream items, a stop of the joints must not wait for them
+        self._receiver.send_urgent(msg)
+
+
+class DoutActivityCommand(Command):
+    """ Set a digital out from the stream, in order with the moves. """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 position: int,
+                 value: bool = True,
+                 tag: int = 0):
+        self._receiver = receiver
+        self._position = position
+        self._value = value
+        self.tag = tag
+
+    def execute(self):
+        msg = templates.set_dout().render(self.tag, self._position, self._value)
+        self._receiver.put(msg)
+
+
+class AoutActivityCommand(Command):
+    """ Set an analog out from the stream, in order with the moves. """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 position: int,
+                 value: float = 0.0,
+                 tag: int = 0):
+        self._receiver = receiver
+        self._position = position
+        self._value = value
+        self.tag = tag
+
+    def execute(self):
+        msg = templates.set_aout().render(self.tag, self._position, self._value)
+        self._receiver.put(msg)
+
+
+class IoutActivityCommand(Command):
+    """ Set an integer out from the stream, in order with the moves. """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 position: int,
+                 value: int = 0,
+                 tag: int = 0):
+        self._receiver = receiver
+        self._position = position
+        self._value = value
+        self.tag = tag
+
+    def execute(self):
+        msg = templates.set_iout().render(self.tag, self._position, self._value)
+        self._receiver.put(msg)
+
+
+class DwellCommand(Command):
+    """ Wait in the stream, between two moves. """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 ms: int,
+                 tag: int = 0):
+        self._receiver = receiver
+        self.ms = ms
+        self.tag = tag
+
+    def execute(self):
+        msg = templates.dwell().render(self.tag, self.ms)
+        self._receiver.put(msg)
+
+
+class StreamFeedRateCommand(Command):
+    """ Feed rate change in order with the stream. It is not a stream item: the stream
+        controller applies it when the item of its tag starts executing. """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 value: float,
+                 at_tag: int = None,
+                 kc: int = 0):
+        """
+        Args:
+            receiver: where the feed rate is sent.
+            value: feed rate override, 1 for the programmed speed.
+            at_tag: tag of the item starting at the new feed rate, None for the next
+                item scheduled after this command.
+            kc: kinematics configuration index.
+        """
+        self._receiver = receiver
+        self.value = value
+        self.at_tag = at_tag
+        self.kc = kc
+        self.applied = False
+
+    def execute(self):
+        msg = templates.desired_feedrate(self.kc).render(self.value)
+        # applied when its item starts, not behind the items queued meanwhile
+        self._receiver.send_urgent(msg)
+
+
 class StreamCommand(Command):
     def __init__(self,
                  receiver: command_receiver.CommandReceiver,
@@ -340,5 +589,5 @@ class StreamCommand(Command):
         self._cmd = value
 
     def execute(self):
-        msg = stream_command_builder.reset().stream_command(self._cmd).build()
+        msg = templates.stream_command().render(self._cmd)
         self._receiver.put(msg)
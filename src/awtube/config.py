@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+"""
+    Loading of the per robot configuration file.
+
+    Joint limits are read from the "joint_limits" field, every limit is a list
+    with one value per joint, missing limits are left as None:
+
+    .. code-block:: json
+
+      {
+        "joint_limits": {
+          "positions_min": [-3.14, -2.0, -2.5, -3.14, -2.0, -3.14],
+          "positions_max": [3.14, 2.0, 2.5, 3.14, 2.0, 3.14],
+          "velocities": [1.5, 1.5, 1.5, 2.0, 2.0, 2.0],
+          "accelerations": [5.0, 5.0, 5.0, 8.0, 8.0, 8.0],
+          "jerks": [50.0, 50.0, 50.0, 80.0, 80.0, 80.0],
+          "steps": [0.2, 0.2, 0.2, 0.3, 0.3, 0.3]
+        }
+      }
+"""
+
+from __future__ import annotations
+import json
+import typing as tp
+
+from awtube.types import JointLimits
+import awtube.errors as errors
+
+
+def load_config(path: str) -> tp.Dict[str, tp.Any]:
+    """ Read the robot configuration file. """
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_joint_limits(path: str) -> JointLimits | None:
+    """ Read the joint limits of the robot configuration file, None if not configured. """
+    js = load_config(path).get('joint_limits')
+    if js is None:
+        return None
+    unknown = set(js) - set(JointLimits._fields)
+    if unknown:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT,
+            f'Unknown joint limits: {", ".join(sorted(unknown))}.')
+    return JointLimits(**js)
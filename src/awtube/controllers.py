@@ -6,10 +6,15 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 import time
 import asyncio
+import collections
+import heapq
+import itertools
 import queue
 import logging
+import typing as tp
+import weakref
 
-from . import command_receiver, observers, cia402, task_wrappers, types, commands, observers
+from . import command_receiver, observers, cia402, task_wrappers, types, commands, observers, heartbeat, templates
 
 # TODO: maybe need lock for clear() appendleft() non-threadsafe operations in command queues
 
@@ -20,7 +25,7 @@ class Controller(ABC):
         Trigger: A mechanism used to define how and when a command is executed
     """
     _logger: logging.Logger = None
-    _command_queue: queue.Queue = queue.Queue()
+    _command_queue: queue.Queue = None
     _observer: observers.Observer = None
     _reciever: command_receiver.CommandReceiver = None
     _paused_execution: bool = False
@@ -53,6 +58,11 @@ class Controller(ABC):
                 'Could not stop main loop of %s', self.__class__.__name__)
             raise
 
+    @property
+    def queued(self) -> int:
+        """ Number of commands waiting to be started. """
+        return self._command_queue.qsize()
+
     def clear_queue(self):
         """ Clear current queue. """
         self._command_queue.queue.clear()
@@ -84,35 +94,141 @@ class Controller(ABC):
                 await asyncio.sleep(1)
                 continue
 
-            # TODO: how many times should it try
+            # waiting for the first update, reported by the watchdog of the robot if it does not come
             if self._observer.payload is None:
-                self._logger.error('%s is not updated!',
-                                   type(self._observer).__name__)
-                await asyncio.sleep(1)
+                await asyncio.sleep(0.01)
                 continue
 
             if self._command_queue.empty():
                 await asyncio.sleep(0.5)
             else:
-                _, task = self._command_queue.get(block=False)
+                with self._command_queue.mutex:
+                    self._optimize(self._command_queue.queue)
+                command, task = self._command_queue.get(block=False)
+                if task is None or task.done():
+                    continue
+                if self._elide(command):
+                    task.complete(task_wrappers.TWrapperResult.SUCCESS)
+                    continue
                 await task.start()
 
+    def _optimize(self, waiting: collections.deque):
+        """ Rewrite the (command, task) items waiting in the queue, called with the queue locked.
+            The tasks of the commands removed must complete with the ones replacing them. """
+
+    def _elide(self, command) -> bool:
+        """ Return True if the command about to start would have no effect,
+            its task then completes right away without running. """
+        return False
+
 
 class MachineController(Controller):
     def __init__(self, status_observer: observers.StatusObserver):
         self._logger = logging.getLogger(self.__class__.__name__)
         self._observer = status_observer
-        self.heartbeat_cmd = None
-        self.last_heartbeat_time = None
+        self._command_queue = queue.Queue()
+        # task of the last heartbeat command, with its send statistics
+        self.heartbeat: heartbeat.HeartbeatTask = None
+        # called with the failures found by the controller, e.g. a heartbeat deadline missed
+        self.on_exception: tp.Callable[[BaseException], None] = self._log_exception
         self._current_cia402_cmd = None
         self._current_cw = 128
+        # (value, override) of the outputs, target and state last started from the queue, a
+        # command is only elided if both they and the status already have its value
+        self._written: tp.Dict[tp.Tuple[str, int], tp.Tuple[int, bool]] = {}
+        self._last_target: types.MachineTarget = None
+        self._last_state: cia402.CIA402MachineState = None
+        # commands merged into a later one, and elided because they had no effect
+        self.merged = 0
+        self.elided = 0
+
+    def _log_exception(self, exc: BaseException):
+        self._logger.error('%s: %s', type(exc).__name__, exc)
+
+    def stop(self):
+        """ Stop the main loop of controller and the heartbeat. """
+        super().stop()
+        if self.heartbeat is not None and self.heartbeat._task is not None:
+            self.heartbeat._task.cancel()
+
+    @staticmethod
+    def _is_feed_rate(command) -> bool:
+        return isinstance(command, commands.KinematicsConfigurationCommad) and bool(command.target_feed_rate)
+
+    @staticmethod
+    def _output_key(command) -> tp.Tuple[str, int] | None:
+        if isinstance(command, commands.DoutCommad):
+            return 'dout', command._position
+        if isinstance(command, commands.IoutCommad):
+            return 'iout', command._position
+        return None
+
+    def _optimize(self, waiting: collections.deque):
+        """ Merge consecutive feed rate changes into the last one, and drop the output
+            writes and target changes repeating the one right before them. A repeat with
+            other commands in between is kept, the output or target may have changed
+            meanwhile, it is elided when it starts if the status already has its value. """
+        kept = []
+        for command, task in waiting:
+            if task is None or task.done():
+                continue
+            previous, previous_task = kept[-1] if kept else (None, None)
+            if self._is_feed_rate(command) and self._is_feed_rate(previous):
+                kept.pop()
+                previous_task.follow(task)
+                self.merged += 1
+            elif self._repeats(command, previous):
+                task.follow(previous_task)
+                self.merged += 1
+                continue
+            kept.append((command, task))
+        if len(kept) != len(waiting):
+            waiting.clear()
+            waiting.extend(kept)
+
+    def _repeats(self, command, previous) -> bool:
+        """ True if command writes the same output or target as previous, with the same value. """
+        key = self._output_key(command)
+        if key is not None:
+            return key == self._output_key(previous) and \
+                (previous._value, previous._override) == (command._value, command._override)
+        return isinstance(command, commands.MachineTargetCommad) and \
+            isinstance(previous, commands.MachineTargetCommad) and previous.target == command.target
+
+    def _elide(self, command) -> bool:
+        """ Elide output writes, target and state changes already done according to the status. """
+        status = self._observer.payload
+        elided = False
+        key = self._output_key(command)
+        if key is not None:
+            value = (command._value, command._override)
+            elements = getattr(status, key[0], None) or []
+            current = elements[key[1]] if 0 <= key[1] < len(elements) else None
+            elided = current is not None and \
+                (current.setValue, current.override) == value and \
+                self._written.get(key, value) == value
+            self._written[key] = value
+        elif isinstance(command, commands.MachineTargetCommad):
+            elided = status.machine is not None and \
+                status.machine.target == command.target and \
+                self._last_target in (None, command.target)
+            self._last_target = command.target
+        elif isinstance(command, commands.MachineStateCommad):
+            elided = status.machine is not None and \
+                status.machine.status_word is not None and \
+                cia402.device_state(status.machine.status_word) == command.desired_state and \
+                self._last_state in (None, command.desired_state)
+            self._last_state = command.desired_state
+        if elided:
+            self.elided += 1
+            self._logger.debug('Elided %s, already done.', type(command).__name__)
+        return elided
 
     def _get_task(self, command) -> task_wrappers.TWrapper:
         if isinstance(command, commands.HeartbeatCommad):
-            return task_wrappers.PeriodicTask(
-                coro_callback=self._heartbeat_callback,
-                args=(command),
-                sleep_time=1/command._frequency)
+            self.heartbeat = heartbeat.HeartbeatTask(
+                command, self._observer, on_failure=lambda exc: self.on_exception(exc))
+            return self.heartbeat
 
         elif isinstance(command, (
                 commands.KinematicsConfigurationCommad,
@@ -140,25 +256,6 @@ class MachineController(Controller):
             self._logger.error(
                 'This controller cannot handle commands of type: %s', type(command))
 
-    async def _heartbeat_callback(self, cmd):
-        if not self.heartbeat_cmd:
-            self.heartbeat_cmd = cmd
-        if not self._observer.payload:
-            self._logger.debug('Observer not yet updated!')
-            return task_wrappers.TWrapperResult.RUNNING
-
-        if not self.last_heartbeat_time:
-            self.last_heartbeat_time = time.time()
-
-        self.heartbeat_cmd._heartbeat = self._observer.payload.machine.heartbeat
-        self.heartbeat_cmd.execute()
-        delay = time.time()-self.last_heartbeat_time
-        self._logger.debug(
-            'Heartbeat: %s in %.1f secs', self.heartbeat_cmd._heartbeat, delay)
-        self.last_heartbeat_time = time.time()
-
-        return task_wrappers.TWrapperResult.RUNNING
-
     async def _set_check_callback(self, cmd):
         if self._observer.payload.machine.target == cmd.target:
             self._logger.error('Finished %s', type(cmd).__name__)
@@ -200,25 +297,48 @@ class MachineController(Controller):
 
 
 class StreamController(Controller):
+    """
+    Streams moves and activities to GBC in the order they are scheduled.
+    Items are sent as soon as GBC has room for them, so many can be in flight,
+    and each task completes once the stream has gone past its tag.
+    """
+
     def __init__(self, stream_observer: observers.StreamObserver):
         self._logger = logging.getLogger(self.__class__.__name__)
         self._buffer_cushion = 35
         self._observer = stream_observer
         self._command_queue: queue.Queue[commands.Command] = queue.Queue()
         self._current_tag = 0
-        self._single_cmd_running = False
+        # (command, task) items scheduled but not sent yet, in order
+        self._pending: collections.deque[tp.Tuple[commands.Command, task_wrappers.TWrapper]] = \
+            collections.deque()
+        # status the items sent are counted against
+        self._flushed_payload = None
+        self._sent_since_status = 0
+        # move parameters of the moves sent without their own
+        self.default_move_params: types.MoveParametersConfig = None
+        # feed rate changes waiting for the item of their tag to start, heap of
+        # (tag, order of scheduling, command, task)
+        self._feed_rates: tp.List[tp.Tuple[int, int, commands.StreamFeedRateCommand, task_wrappers.TWrapper]] = []
+        self._feed_rate_order = itertools.count()
+        stream_observer.add_listener(self._apply_feed_rates)
+        # tasks of the stream items, sent or not, see abort()
+        self._item_tasks: weakref.WeakSet[task_wrappers.TWrapper] = weakref.WeakSet()
 
     def _get_task(self, command) -> task_wrappers.TWrapper:
         if isinstance(command,
                       (
                           commands.MoveLineCommand,
                           commands.MoveJointsCommand,
-                          commands.MoveToPositionCommand
+                          commands.MoveToPositionCommand,
+                          commands.MoveArcCommand,
+                          commands.DoutActivityCommand,
+                          commands.AoutActivityCommand,
+                          commands.IoutActivityCommand,
+                          commands.DwellCommand,
+                          commands.StreamFeedRateCommand
                       )):
-            return task_wrappers.PeriodicUntilDoneTask(
-                coro_callback=self._single_move_cmd_callback,
-                args=(command),
-                sleep_time=0.5)
+            cmds = [command]
         elif isinstance(command,
                         (commands.StreamCommand)):
             return task_wrappers.OneTimeTask(
@@ -226,17 +346,65 @@ class StreamController(Controller):
                 args=(command))
         elif isinstance(command,
                         list):
-            return task_wrappers.OneTimeTask(
-                coro_callback=self._multi_move_interpolated_cmd_callback,
-                args=(command)
-            )
+            cmds = command
         else:
             self._logger.error(
                 'This controller cannot handle commands of type: %s', type(command))
+            return None
+        task = task_wrappers.PeriodicUntilDoneTask(
+            coro_callback=self._stream_items_callback,
+            args=(cmds),
+            sleep_time=0.2)
+        # order of sending is the order of scheduling, not of the tasks running
+        self._pending.extend((cmd, task) for cmd in cmds)
+        self._item_tasks.add(task)
+        return task
+
+    @property
+    def pending(self) -> int:
+        """ Number of stream items scheduled and not sent yet. """
+        return len(self._pending)
+
+    @property
+    def buffer_full(self) -> bool:
+        """ True if GBC has no room left above the cushion, as of the last status. """
+        payload = self._observer.payload
+        sent = self._sent_since_status if payload is self._flushed_payload else 0
+        return payload is not None and payload.capacity - sent <= self._buffer_cushion
+
+    @property
+    def current_tag(self) -> int:
+        """ Tag of the last stream item sent. """
+        return self._current_tag
+
+    def clear_queue(self):
+        """ Clear current queue and the items not sent yet, their tasks are cancelled. """
+        while self._feed_rates:
+            _, _, _, task = heapq.heappop(self._feed_rates)
+            task._future.cancel()
+        while self._pending:
+            _, task = self._pending.popleft()
+            task._future.cancel()
+        while not self._command_queue.empty():
+            _, task = self._command_queue.get(block=False)
+            if task is not None:
+                task._future.cancel()
+
+    def abort(self, receiver: command_receiver.CommandReceiver = None):
+        """ Clear the queue and cancel the tasks of the items already sent too, a STOP
+            drops them so they would never complete. The items still queued in `receiver`
+            are removed, so none is written after the STOP. """
+        self.clear_queue()
+        for task in list(self._item_tasks):
+            task._future.cancel()
+        if receiver is not None:
+            discarded = receiver.discard_queued(templates.is_stream_item)
+            if discarded:
+                self._logger.debug('Discarded %d stream items not written yet.', discarded)
 
     async def _stream_cmd_callback(self, cmd: None | commands.Command) -> task_wrappers.TWrapperResult:
         if cmd.command_type is types.StreamCommandType.STOP:
-            self.clear_queue()
+            self.abort(cmd._receiver)
             cmd.execute()
         if cmd.command_type is types.StreamCommandType.PAUSE:
             cmd.execute()
@@ -245,49 +413,66 @@ class StreamController(Controller):
 
     def _execute_cmd(self, cmd):
         cmd.tag = self._current_tag + 1
+        if cmd.move_params is None:
+            cmd.move_params = self.default_move_params
         cmd.execute()
         self._current_tag = cmd.tag
 
-    async def _single_move_cmd_callback(self, cmd: commands.Command) -> task_wrappers.TWrapperResult:
-        if not self._single_cmd_running:
-            self._logger.debug('Sending single cmd: %s with tag: %d', type(
-                cmd).__name__, cmd.tag)
-
-            if self._observer.payload.capacity >= self._buffer_cushion:
-                self._execute_cmd(cmd)
-                self._single_cmd_running = True
-                return task_wrappers.TWrapperResult.RUNNING
-            else:
-                return task_wrappers.TWrapperResult.RUNNING
+    def _flush(self):
+        """ Send pending items while GBC has room for them above the cushion. """
+        payload = self._observer.payload
+        if payload is not self._flushed_payload:
+            self._flushed_payload = payload
+            self._sent_since_status = 0
+        while self._pending and payload.capacity - self._sent_since_status > self._buffer_cushion:
+            cmd, task = self._pending.popleft()
+            # cancelled before being sent
+            if task.done():
+                continue
+            if isinstance(cmd, commands.StreamFeedRateCommand):
+                # takes no room in GBC, attached to the tag of the next item sent
+                cmd.tag = cmd.at_tag if cmd.at_tag is not None else self._current_tag + 1
+                cmd.sent = True
+                heapq.heappush(self._feed_rates, (cmd.tag, next(self._feed_rate_order), cmd, task))
+                continue
+            self._execute_cmd(cmd)
+            cmd.sent = True
+            self._sent_since_status += 1
+        self._apply_feed_rates(self._observer.payload)
+
+    def _apply_feed_rates(self, payload: types.StreamStatus):
+        """ Apply the feed rate changes whose item started executing, or that no item
+            follows once the stream is idle. Called on every stream status. """
+        while self._feed_rates:
+            tag, _, cmd, task = self._feed_rates[0]
+            if task.done():
+                # cancelled
+                heapq.heappop(self._feed_rates)
+                continue
+            started = payload.tag >= tag or \
+                (tag > self._current_tag and payload.state == types.StreamState.IDLE and payload.tag >= tag - 1)
+            if not started:
+                return
+            heapq.heappop(self._feed_rates)
+            cmd.execute()
+            cmd.applied = True
+            self._logger.debug('Feed rate %s applied at tag %d.', cmd.value, tag)
 
-        else:
-            if self._observer.payload.tag == cmd.tag and self._observer.payload.state == types.StreamState.IDLE:
-                self._single_cmd_running = False
+    async def _stream_items_callback(self, cmds: list[commands.Command]) -> task_wrappers.TWrapperResult:
+        """ Send what fits in the GBC buffer, done once the stream is past the last item. """
+        self._flush()
+        if not cmds:
+            return task_wrappers.TWrapperResult.SUCCESS
+        last = cmds[-1]
+        if not last.sent:
+            return task_wrappers.TWrapperResult.RUNNING
+        payload = self._observer.payload
+        if isinstance(last, commands.StreamFeedRateCommand):
+            if last.applied:
                 return task_wrappers.TWrapperResult.SUCCESS
-            else:
-                return task_wrappers.TWrapperResult.RUNNING
-
-    async def _multi_move_interpolated_cmd_callback(self, cmd_list: list[commands.Command]) -> task_wrappers.TWrapperResult:
-
-        sent_all = False
-        for e in cmd_list:
-            self._command_queue.put(e)
-
-        # TODO: Maybe write it using PeriodicUntilDone task wrapperto remove sleep and while loop
-        while True:
-            if not sent_all and self._observer.payload.capacity >= self._buffer_cushion:
-                how_many = self._observer.payload.capacity - self._buffer_cushion
-                for _ in range(how_many):
-                    try:
-                        cmd = self._command_queue.get(block=False)
-                        self._execute_cmd(cmd)
-                    except queue.Empty:
-                        sent_all = True
-                        break
-            else:
-                if self._observer.payload.tag == cmd_list[-1].tag and self._observer.payload.state == types.StreamState.IDLE:
-                    return task_wrappers.TWrapperResult.SUCCESS
-                if self._observer.payload.state == types.StreamState.STOPPED:
-                    return task_wrappers.TWrapperResult.FAILURE
-
-            await asyncio.sleep(0.2)
+        elif payload.tag > last.tag or \
+                (payload.tag == last.tag and payload.state == types.StreamState.IDLE):
+            return task_wrappers.TWrapperResult.SUCCESS
+        if payload.state == types.StreamState.STOPPED:
+            return task_wrappers.TWrapperResult.FAILURE
+        return task_wrappers.TWrapperResult.RUNNING
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+
+"""
+    Fleet of robots hosted on a small pool of event loops.
+
+    Every robot is an :class:`~awtube.async_robot.AsyncRobot` with its own receiver,
+    observers, controllers and tags, placed on the least loaded loop of the pool.
+    Robots are started, stopped and reconnected one by one, and the fleet keeps
+    running when one of them fails.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube.fleet import Fleet
+
+      with Fleet(loops=2) as fleet:
+          fleet.add('left', '192.168.0.10')
+          fleet.add('right', '192.168.0.11')
+          fleet.start()
+          fleet.run('left', fleet['left'].move_joints_async([0, 0, 0, 0, 0, 0]))
+          fleet.run('right', fleet['right'].move_joints_async([0, 0, 0, 0, 0, 0])).result()
+          print(fleet.metrics())
+
+          # both arms start their trajectories together
+          report = fleet.coordinated_start({'left': left_moves, 'right': right_moves})
+          print(report.dispatch_skew, report.start_skew)
+          for done in report.done.values():
+              done.result()
+"""
+
+from __future__ import annotations
+import asyncio
+import collections
+import concurrent.futures
+import functools
+import logging
+import threading
+import time
+import typing as tp
+
+from . import commands, errors, observers, task_wrappers, templates, threadloop, types
+from .async_robot import AsyncRobot
+
+
+class RobotMetrics(tp.NamedTuple):
+    """ State of one robot of the fleet. """
+    connected: bool = False
+    # messages written on the socket
+    sent: int = 0
+    # tag of the last stream item sent and of the one GBC is at
+    sent_tag: int = 0
+    stream_tag: int = None
+    # commands waiting in the controllers and stream items not sent yet
+    queued: int = 0
+    pending: int = 0
+    # exceptions reported by the receiver
+    errors: int = 0
+    # seconds since the last stream status, None if never received
+    status_age: float = None
+
+
+class FleetMetrics(tp.NamedTuple):
+    """ Metrics of every robot, and their totals. """
+    robots: tp.Dict[str, RobotMetrics] = None
+    connected: int = 0
+    sent: int = 0
+    queued: int = 0
+    pending: int = 0
+    errors: int = 0
+
+
+class StartReport(tp.NamedTuple):
+    """ Timing of a coordinated start, times in seconds. """
+    # when each RUN was written on its socket, from the first one
+    dispatch: tp.Dict[str, float] = None
+    dispatch_skew: float = 0.0
+    # when the first ACTIVE stream status of each robot arrived, from the first one
+    started: tp.Dict[str, float] = None
+    start_skew: float = 0.0
+    # time field of those statuses, comparable only between controllers with synchronized clocks
+    gbc_times: tp.Dict[str, int] = None
+    gbc_skew: int = 0
+    # futures done when each robot has run all its items
+    done: tp.Dict[str, concurrent.futures.Future] = None
+
+
+async def _until(predicate: tp.Callable[[], bool], timeout: float, what: str, period: float = 0.001):
+    """ Poll predicate until true, raise TimeoutError after timeout. """
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise TimeoutError(f'Timed out waiting for {what}.')
+        await asyncio.sleep(period)
+
+
+class Fleet:
+    """ Robots sharing a pool of threadloops, isolated from each other. """
+
+    def __init__(self, loops: int = 1, timeout: float = 10):
+        """
+        Args:
+            loops: number of event loops, each one in its own thread.
+            timeout: seconds to wait for a robot to start or stop.
+        """
+        if loops < 1:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'At least one loop is needed.')
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._timeout = timeout
+        self._loops = [threadloop.ThreadLoop() for _ in range(loops)]
+        for loop in self._loops:
+            loop.start()
+        self._robots: tp.Dict[str, AsyncRobot] = {}
+        self._loop_of: tp.Dict[str, threadloop.ThreadLoop] = {}
+        self._errors: tp.Counter[str] = collections.Counter()
+
+    def __enter__(self) -> Fleet:
+        return self
+
+    def __exit__(self, exc_t, exc_v, trace):
+        self.close()
+
+    def __getitem__(self, name: str) -> AsyncRobot:
+        return self._robot(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._robots
+
+    def __len__(self) -> int:
+        return len(self._robots)
+
+    @property
+    def names(self) -> tp.List[str]:
+        return list(self._robots)
+
+    def _robot(self, name: str) -> AsyncRobot:
+        try:
+            return self._robots[name]
+        except KeyError:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, f'No robot named {name} in the fleet.') from None
+
+    def _on_exception(self, name: str, exc: BaseException):
+        self._errors[name] += 1
+        self._logger.error('%s: %s: %s', name, type(exc), exc)
+
+    def add(self,
+            name: str,
+            robot_ip: str,
+            port: str = "9001",
+            config_path: str = None) -> AsyncRobot:
+        """ Add a robot on the least loaded loop, it is not started. """
+        if name in self._robots:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, f'Robot {name} is already in the fleet.')
+        load = collections.Counter(self._loop_of.values())
+        loop = min(self._loops, key=lambda tl: load[tl])
+        robot = AsyncRobot(robot_ip, port=port, config_path=config_path, name=name)
+        robot.receiver.on_exception = functools.partial(self._on_exception, name)
+        self._robots[name] = robot
+        self._loop_of[name] = loop
+        return robot
+
+    def remove(self, name: str):
+        """ Stop a robot and remove it from the fleet. """
+        self.stop(name)
+        del self._robots[name]
+        del self._loop_of[name]
+
+    def run(self, name: str, coro: tp.Coroutine) -> concurrent.futures.Future:
+        """ Run coro on the loop of the robot, e.g. one of its ``*_async`` methods. """
+        self._robot(name)
+        return self._loop_of[name].post(coro)
+
+    def _each(self, name: str | None, coro_of: tp.Callable[[AsyncRobot], tp.Coroutine]):
+        """ Run coro_of(robot) for the robot, or all robots at once, and wait for them. """
+        names = self.names if name is None else [name]
+        futures = [self.run(n, coro_of(self._robot(n))) for n in names]
+        for f in futures:
+            f.result(self._timeout)
+
+    def start(self, name: str = None):
+        """ Start a robot, all robots if name is None. """
+        self._each(name, lambda robot: robot.start())
+
+    def stop(self, name: str = None):
+        """ Stop a robot, all robots if name is None. Their commands not started are dropped. """
+        self._each(name, self._stop)
+
+    def reconnect(self, name: str = None):
+        """ Stop and start again a robot, all robots if name is None. """
+        self._each(name, self._reconnect)
+
+    @staticmethod
+    async def _stop(robot: AsyncRobot):
+        await robot.close()
+        robot.stream_controller.clear_queue()
+        robot.machine_controller.clear_queue()
+        # messages put while disconnected would be sent late on reconnection
+        robot.receiver.outgoing.queue.clear()
+        robot.receiver._urgent.clear()
+
+    async def _reconnect(self, robot: AsyncRobot):
+        await self._stop(robot)
+        await robot.start()
+
+    @staticmethod
+    async def _preload(robot: AsyncRobot,
+                       cmds: tp.List[commands.Command],
+                       timeout: float) -> task_wrappers.TWrapper:
+        """ Pause the stream and send the items GBC has room for. """
+        # sent right away, a PAUSE scheduled would wait for the controller loop
+        commands.StreamCommand(robot.receiver, types.StreamCommandType.PAUSE).execute()
+        observer = robot.stream_observer
+        await _until(lambda: observer.payload is not None
+                     and observer.payload.state == types.StreamState.PAUSED,
+                     timeout, f'{robot._name} to pause')
+        controller = robot.stream_controller
+        task = controller.schedule_last(cmds)
+        await _until(lambda: cmds[0].sent and (cmds[-1].sent or controller.buffer_full),
+                     timeout, f'{robot._name} to preload')
+        await _until(lambda: observer.payload.queued, timeout, f'{robot._name} to queue items')
+        return task
+
+    @staticmethod
+    async def _release(robots: tp.Dict[str, AsyncRobot],
+                       barrier: threading.Barrier,
+                       timeout: float) -> tp.Dict[str, float]:
+        """ Send RUN to robots of one loop once every loop reached the barrier. """
+        # built beforehand, only the socket writes are left after the barrier
+        message = templates.stream_command().render(types.StreamCommandType.RUN)
+        # blocks the loop on purpose, until the other loops are ready too
+        barrier.wait(timeout)
+        sent = {}
+        for name, robot in robots.items():
+            await robot.receiver.send(message)
+            sent[name] = time.perf_counter()
+        return sent
+
+    @staticmethod
+    async def _wait(task: task_wrappers.TWrapper) -> task_wrappers.TWrapperResult:
+        return await task
+
+    def coordinated_start(self,
+                          plans: tp.Dict[str, tp.List[commands.Command]],
+                          timeout: float = 10) -> StartReport:
+        """
+        Start the streams of several robots together.
+
+        Each stream is paused and preloaded with its items, as many as GBC has room for,
+        then RUN is written on every socket at once, the robots of each loop released
+        by a barrier shared by the loops.
+
+        Args:
+            plans: stream items of each robot, e.g. MoveJointsInterpolatedCommand.
+            timeout: seconds to wait for each step.
+        """
+        if not plans or any(not cmds for cmds in plans.values()):
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'Every robot needs at least one item.')
+        preloads = {name: self.run(name, self._preload(self._robot(name), cmds, timeout))
+                    for name, cmds in plans.items()}
+        tasks = {name: f.result(timeout * 3) for name, f in preloads.items()}
+
+        starts = {name: observers.StreamStartObserver() for name in plans}
+        for name, observer in starts.items():
+            self._robot(name).receiver.attach_observer(observer)
+        try:
+            groups: tp.Dict[threadloop.ThreadLoop, tp.Dict[str, AsyncRobot]] = collections.defaultdict(dict)
+            for name in plans:
+                groups[self._loop_of[name]][name] = self._robot(name)
+            barrier = threading.Barrier(len(groups))
+            releases = [loop.post(self._release(robots, barrier, timeout))
+                        for loop, robots in groups.items()]
+            dispatch = {}
+            for f in releases:
+                dispatch.update(f.result(timeout * 2))
+
+            deadline = time.monotonic() + timeout
+            while not all(o.payload is not None for o in starts.values()):
+                if time.monotonic() > deadline:
+                    raise TimeoutError('Timed out waiting for the streams to start.')
+                time.sleep(0.001)
+        finally:
+            for name, observer in starts.items():
+                self._robot(name).receiver.detach_observer(observer)
+
+        first_dispatch = min(dispatch.values())
+        first_start = min(o.timestamp for o in starts.values())
+        gbc_times = {name: o.payload.time for name, o in starts.items()}
+        return StartReport(
+            dispatch={name: t - first_dispatch for name, t in dispatch.items()},
+            dispatch_skew=max(dispatch.values()) - first_dispatch,
+            started={name: o.timestamp - first_start for name, o in starts.items()},
+            start_skew=max(o.timestamp for o in starts.values()) - first_start,
+            gbc_times=gbc_times,
+            gbc_skew=max(gbc_times.values()) - min(gbc_times.values())
+            if None not in gbc_times.values() else None,
+            done={name: self.run(name, self._wait(task)) for name, task in tasks.items()})
+
+    def metrics(self, name: str = None) -> FleetMetrics:
+        """ Metrics of a robot, all robots if name is None. """
+        names = self.names if name is None else [name]
+        robots = {}
+        # clock of the observer timestamps
+        now = time.monotonic()
+        for n in names:
+            robot = self._robot(n)
+            stream = robot.stream_observer
+            robots[n] = RobotMetrics(
+                connected=robot.receiver.connected,
+                sent=robot.receiver.sent_count,
+                sent_tag=robot.stream_controller.current_tag,
+                stream_tag=None if stream.payload is None else stream.payload.tag,
+                queued=robot.stream_controller.queued + robot.machine_controller.queued,
+                pending=robot.stream_controller.pending,
+                errors=self._errors[n],
+                status_age=None if stream.timestamp is None else now - stream.timestamp)
+        return FleetMetrics(robots=robots,
+                            connected=sum(m.connected for m in robots.values()),
+                            sent=sum(m.sent for m in robots.values()),
+                            queued=sum(m.queued for m in robots.values()),
+                            pending=sum(m.pending for m in robots.values()),
+                            errors=sum(m.errors for m in robots.values()))
+
+    def close(self):
+        """ Stop every robot and the loops. """
+        try:
+            self.stop()
+        except Exception as e:
+            self._logger.error('Could not stop every robot: %s', e)
+        for loop in self._loops:
+            if loop.is_alive():
+                loop.stop()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+    Handles on the commands given to the robot without waiting for them.
+
+    Example:
+
+    .. code-block:: python
+
+      handles = [robot.move_line(t, r, wait=False) for t, r in path.items()]
+      robot.stream_dout(0, True, wait=False)
+      handles[0].wait(timeout=5)
+      robot.wait_all()
+
+      # many calls submitted to the threadloop at once
+      with robot.batch() as batch:
+          robot.set_speed(0.5)
+          for t, r in path.items():
+              robot.move_line(t, r)
+          robot.stream_dout(0, True)
+      print(batch.results())
+"""
+
+from __future__ import annotations
+import asyncio
+import concurrent.futures
+import typing as tp
+
+from .threadloop import ThreadLoop
+
+
+class CommandHandle:
+    """
+    Lightweight handle on a command running in the threadloop, usable from any thread.
+    """
+    __slots__ = ('_future',)
+
+    def __init__(self, future: concurrent.futures.Future):
+        self._future = future
+
+    @property
+    def future(self) -> concurrent.futures.Future:
+        return self._future
+
+    def done(self) -> bool:
+        """ True if the command finished, failed or was cancelled. """
+        return self._future.done()
+
+    def cancelled(self) -> bool:
+        return self._future.cancelled()
+
+    def wait(self, timeout: float = None) -> bool:
+        """ Block until the command is done or timeout, return True if done. """
+        done, _ = concurrent.futures.wait((self._future,), timeout=timeout)
+        return bool(done)
+
+    def result(self, timeout: float = None) -> tp.Any:
+        """ Block until the command is done and return its result, raise its exception.
+            Raises concurrent.futures.TimeoutError on timeout and CancelledError if cancelled. """
+        return self._future.result(timeout)
+
+    def cancel(self) -> bool:
+        """ Cancel the command. Stream items not sent yet are dropped,
+            the ones already sent keep running. Return False if already done. """
+        return self._future.cancel()
+
+
+def wait_all(handles: tp.Iterable[CommandHandle], timeout: float = None) -> bool:
+    """ Block until all commands are done or timeout, return True if all are done. """
+    _, not_done = concurrent.futures.wait([h.future for h in handles], timeout=timeout)
+    return not not_done
+
+
+def _chain(task: asyncio.Task, future: concurrent.futures.Future, loop: asyncio.AbstractEventLoop):
+    """ Copy the outcome of task on future, and cancel task if future is cancelled. """
+    def copy(task: asyncio.Task):
+        if future.done():
+            return
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result())
+
+    def cancel(future: concurrent.futures.Future):
+        if future.cancelled():
+            loop.call_soon_threadsafe(task.cancel)
+
+    task.add_done_callback(copy)
+    future.add_done_callback(cancel)
+
+
+class Batch:
+    """
+    Calls recorded to be submitted to the threadloop in one hop, in the order given.
+    Consecutive calls on the same controller are pipelined, a call on another
+    controller starts once the calls before it are done, as if they were waited for.
+    """
+
+    def __init__(self, tloop: ThreadLoop):
+        self._tloop = tloop
+        # (coroutine, future, controller) of each call
+        self._calls: tp.List[tp.Tuple[tp.Coroutine, concurrent.futures.Future, tp.Any]] = []
+        self.handles: tp.List[CommandHandle] = []
+        self.submitted = False
+
+    def __len__(self) -> int:
+        return len(self.handles)
+
+    def add(self, coro: tp.Coroutine, controller: tp.Any = None) -> CommandHandle:
+        """ Record a call, returns its handle, done once the batch is submitted and the call done. """
+        future = concurrent.futures.Future()
+        self._calls.append((coro, future, controller))
+        handle = CommandHandle(future)
+        self.handles.append(handle)
+        return handle
+
+    def submit(self) -> concurrent.futures.Future:
+        """ Submit every call recorded to the threadloop. """
+        calls, self._calls = self._calls, []
+        self.submitted = True
+        return self._tloop.post(self._start(calls))
+
+    def discard(self):
+        """ Drop the calls recorded, their handles are cancelled. """
+        for coro, future, _ in self._calls:
+            coro.close()
+            future.cancel()
+        self._calls = []
+
+    def results(self, timeout: float = None) -> tp.List[tp.Any]:
+        """ Block until every call is done, return their results in order,
+            the exception raised in place of the result of failed calls. """
+        wait_all(self.handles, timeout=timeout)
+        results = []
+        for handle in self.handles:
+            if handle.cancelled():
+                results.append(concurrent.futures.CancelledError())
+            elif handle.future.exception(0) is not None:
+                results.append(handle.future.exception(0))
+            else:
+                results.append(handle.future.result(0))
+        return results
+
+    @staticmethod
+    async def _start(calls):
+        loop = asyncio.get_running_loop()
+        group = None
+        running = []
+        for coro, future, controller in calls:
+            if future.cancelled():
+                coro.close()
+                continue
+            if controller is not group and running:
+                await asyncio.wait(running)
+                running = []
+            group = controller
+            task = loop.create_task(coro)
+            _chain(task, future, loop)
+            running.append(task)
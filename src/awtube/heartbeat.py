@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+    Heartbeat of the machine, echoed back to GBC.
+
+    The heartbeat of GBC is echoed as soon as each status carrying a new value
+    arrives. Deadlines on the loop clock, one per period, make sure a heartbeat is
+    sent every period even when statuses stall. They are absolute, so the period
+    does not drift with the time taken by the loop. How late the loop woke up for
+    each deadline is kept in a histogram, and a deadline missed by more than the
+    tolerance is reported as :class:`~awtube.errors.HeartbeatFailure` right away,
+    before GBC reports the heartbeat lost.
+
+    Example:
+
+    .. code-block:: python
+
+      await robot.enable_async()
+      beat = robot.machine_controller.heartbeat
+      print(beat.sent, beat.missed, beat.jitter.percentile(99))
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import typing as tp
+
+from . import commands, errors, observers, task_wrappers, types
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+async def sleep_until(deadline: float):
+    """ Sleep until `deadline`, an absolute time of the clock of the running loop. """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    handle = loop.call_at(deadline, _wake, future)
+    try:
+        await future
+    finally:
+        handle.cancel()
+
+
+class JitterHistogram:
+    """ Histogram of delays in bins of `width` seconds, the last bin counts the longer ones. """
+    __slots__ = ('width', 'counts', 'max')
+
+    def __init__(self, width: float = 0.0005, bins: int = 40):
+        self.width = width
+        self.counts = [0] * bins
+        self.max = 0.0
+
+    def add(self, delay: float):
+        delay = max(delay, 0.0)
+        self.counts[min(int(delay / self.width), len(self.counts) - 1)] += 1
+        if delay > self.max:
+            self.max = delay
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, q: float) -> float:
+        """ Upper edge of the bin holding the `q` percentile, `q` in [0, 100], max for the last bin. """
+        total = self.count
+        if not total:
+            return 0.0
+        rank = q / 100 * total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return self.max if i == len(self.counts) - 1 else (i + 1) * self.width
+        return self.max
+
+    def bins(self) -> tp.List[tp.Tuple[float, int]]:
+        """ (upper edge in seconds, count) of the bins not empty. """
+        last = len(self.counts) - 1
+        return [(self.max if i == last else (i + 1) * self.width, count)
+                for i, count in enumerate(self.counts) if count]
+
+
+class HeartbeatTask(task_wrappers.TWrapper):
+    """ Echoes the heartbeat of GBC on every status, and at least once per period of `command`. """
+
+    def __init__(self,
+                 command: commands.HeartbeatCommad,
+                 observer: observers.StatusObserver,
+                 on_failure: tp.Callable[[BaseException], None] = None,
+                 tolerance: float = None):
+        """
+        Args:
+            command: heartbeat command, sent with the heartbeat of the last status.
+            observer: status observer, the heartbeat is echoed on every new value.
+            on_failure: called with :class:`~awtube.errors.HeartbeatFailure` when a deadline is missed.
+            tolerance: seconds a deadline may be missed by, one period if None.
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.command = command
+        self.period = 1 / command._frequency
+        self.tolerance = self.period if tolerance is None else tolerance
+        self.on_failure = on_failure
+        self.is_started = False
+        # how late the loop woke up for each deadline
+        self.jitter = JitterHistogram()
+        # heartbeats sent, sent on status arrival, and deadlines missed
+        self.sent = 0
+        self.echoed = 0
+        self.missed = 0
+        self._observer = observer
+        self._value = None
+        self._sent_in_period = False
+
+    def _on_status(self, status: types.Status):
+        machine = status.machine
+        if machine is None or machine.heartbeat is None or machine.heartbeat == self._value:
+            return
+        self._send(machine.heartbeat)
+        self.echoed += 1
+
+    def _send(self, value: int):
+        self.command._heartbeat = value
+        self.command.execute()
+        self._value = value
+        self._sent_in_period = True
+        self.sent += 1
+
+    def _fail(self, late: float):
+        self.missed += 1
+        failure = errors.HeartbeatFailure(f'Heartbeat deadline missed by {late * 1000:.1f} ms.')
+        if self.on_failure is None:
+            self._logger.error(failure)
+        else:
+            self.on_failure(failure)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        self._observer.add_listener(self._on_status)
+        try:
+            deadline = loop.time()
+            while True:
+                await sleep_until(deadline)
+                late = loop.time() - deadline
+                self.jitter.add(late)
+                status = self._observer.payload
+                # nothing echoed since the last deadline, GBC has to hear from us anyway
+                if not self._sent_in_period and status is not None and \
+                        status.machine is not None and status.machine.heartbeat is not None:
+                    self._send(status.machine.heartbeat)
+                self._sent_in_period = False
+                if late > self.tolerance:
+                    self._fail(late)
+                # next deadline on the grid, the ones already missed are skipped
+                deadline += self.period * (1 + int(late // self.period))
+        finally:
+            self._observer.remove_listener(self._on_status)
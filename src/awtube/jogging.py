@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+"""
+    Real time joint velocity jogging.
+
+    Velocities are sent as moveJointsAtVelocity solo activities, each one replacing
+    the running one on GBC, so nothing is ever queued. They are written through the
+    urgent lane of the receiver, ahead of the stream items waiting in its outgoing
+    queue, so the stop on timeout or close is not delayed by them.
+
+    Example:
+
+    .. code-block:: python
+
+      with robot.jog(rate=100, timeout=0.1) as jog:
+          while teleoperating:
+              jog.push(read_joystick())
+              time.sleep(0.01)
+      # joints are stopped on exit, or as soon as pushes stop for timeout seconds
+"""
+
+from __future__ import annotations
+import asyncio
+import logging
+import time
+import typing as tp
+
+from . import command_receiver, commands, errors, types
+
+
+class JogHandle:
+    """
+    Handle to push joint velocities from any thread, at 50 to 250 Hz.
+    The latest velocities win: the ones pushed faster than the rate are
+    replaced before being sent, and stale setpoints are never queued.
+    If no velocities are pushed for `timeout` seconds, the joints are stopped.
+    """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 rate: float = 250,
+                 timeout: float = 0.1,
+                 kc: int = 0,
+                 move_params: types.MoveParametersConfig = None):
+        if rate <= 0 or timeout <= 0:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'Rate and timeout should be positive.')
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._receiver = receiver
+        self._period = 1 / rate
+        self._timeout = timeout
+        self._kc = kc
+        self._move_params = move_params
+        # (velocities, monotonic time of push), replaced as a whole so no lock is needed
+        self._setpoint: tp.Tuple[tp.List[float], float] | None = None
+        self._sent = None
+        self._tag = 0
+        self._joints = 0
+        self._moving = False
+        self._closed = False
+        # setpoints replaced by a newer one before being sent
+        self.dropped = 0
+        # times the joints were stopped because pushes stopped
+        self.timeouts = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def moving(self) -> bool:
+        """ True if the last velocities sent are not all zero. """
+        return self._moving
+
+    def push(self, velocities: tp.Sequence[float]):
+        """ Set the joint velocities, in rad/s, thread safe. """
+        if self._closed:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'Jog handle is closed.')
+        if self._setpoint is not None and self._setpoint is not self._sent:
+            self.dropped += 1
+        self._setpoint = (list(velocities), time.monotonic())
+
+    def close(self):
+        """ Stop the joints and the jogging loop. """
+        self._closed = True
+
+    def __enter__(self) -> JogHandle:
+        return self
+
+    def __exit__(self, exc_t, exc_v, trace):
+        self.close()
+
+    def _send(self, velocities: tp.List[float]):
+        self._tag += 1
+        commands.MoveJointsAtVelocityCommand(self._receiver,
+                                             joint_velocities=velocities,
+                                             tag=self._tag,
+                                             kc=self._kc,
+                                             move_params=self._move_params).execute()
+        self._joints = len(velocities)
+        self._moving = any(velocities)
+
+    def _stop(self):
+        if self._moving:
+            self._send([0.0] * self._joints)
+
+    async def run(self):
+        """ Send the latest velocities once per period, stop the joints on timeout and close. """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time()
+        try:
+            while not self._closed:
+                setpoint = self._setpoint
+                if setpoint is not None and setpoint is not self._sent:
+                    self._sent = setpoint
+                    self._send(setpoint[0])
+                if self._moving and time.monotonic() - setpoint[1] > self._timeout:
+                    self.timeouts += 1
+                    self._logger.warning('No jog velocities for %.3f s, stopping.', self._timeout)
+                    self._stop()
+                # absolute deadlines, ticks missed are skipped not accumulated
+                deadline += self._period
+                delay = deadline - loop.time()
+                if delay < 0:
+                    deadline = loop.time()
+                await asyncio.sleep(max(delay, 0))
+        finally:
+            self._closed = True
+            self._stop()
@@ -8,8 +8,9 @@ import json
 from abc import ABC, abstractmethod
 from typing import Any
 import logging
+import typing as tp
 
-from awtube.types import JointStates, StreamStatus, Status
+from awtube.types import JointStates, StreamStatus, StreamState, Status
 import awtube.errors as errors
 
 
@@ -22,6 +23,8 @@ class Observer(ABC):
     _payload = None
     _timestamp = None
     _updated = False
+    # called with every new payload, replaced rather than changed so listeners may remove themselves
+    _listeners: tp.Sequence[tp.Callable[[tp.Any], None]] = ()
 
     @property
     def payload(self):
@@ -30,9 +33,24 @@ class Observer(ABC):
 
     @property
     def timestamp(self):
-        """ Return timestamp of when payload was last updated. """
+        """ Return when payload was last updated, None before the first update.
+
+        The time is from time.monotonic(), it was time.time() before the watchdog was
+        added: compare it with time.monotonic(), e.g. ``time.monotonic() - observer.timestamp``
+        for the age of the payload, never with the wall clock.
+        """
         return self._timestamp
 
+    def add_listener(self, listener: tp.Callable[[tp.Any], None]):
+        """ Call `listener` with every new payload, as soon as it arrives. """
+        if listener not in self._listeners:
+            self._listeners = [*self._listeners, listener]
+
+    def remove_listener(self, listener: tp.Callable[[tp.Any], None]):
+        listeners = list(self._listeners)
+        listeners.remove(listener)
+        self._listeners = listeners
+
     @abstractmethod
     def update(self, message: object):
         """ Receive update from subject and update payload. """
@@ -51,7 +69,9 @@ class StatusObserver(Observer):
         try:
             js = json.loads(message)
             self._payload = Status(**js['status'])
-            self._timestamp = time.time()
+            self._timestamp = time.monotonic()
+            for listener in self._listeners:
+                listener(self._payload)
 
             # check reported errors and log
 
@@ -78,7 +98,9 @@ class StreamObserver(Observer):
             js = json.loads(message)
             # TODO: stream array id ??????
             self._payload = StreamStatus(**js['stream'][0])
-            self._timestamp = time.time()
+            self._timestamp = time.monotonic()
+            for listener in self._listeners:
+                listener(self._payload)
         except KeyError:
             # this means message doesn't contain stream
             pass
@@ -86,6 +108,32 @@ class StreamObserver(Observer):
         except Exception as e:
             self._logger.error(e)
             
+class StreamStartObserver(Observer):
+    """
+    Keeps the first stream status in the given state, and when it arrived,
+    e.g. the status of a stream starting to run.
+    """
+
+    def __init__(self, state: StreamState = StreamState.ACTIVE):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._state = state
+
+    def update(self, message: str):
+        if self._payload is not None:
+            return
+        try:
+            js = json.loads(message)
+            status = StreamStatus(**js['stream'][0])
+        except KeyError:
+            return
+        except Exception as e:
+            self._logger.error(e)
+            return
+        if status.state == self._state:
+            self._timestamp = time.monotonic()
+            self._payload = status
+
+
 class IOObserver(Observer):
     """
     Observes the 'stream' field  in the ws stream and keeps a StreamStatus object as payload
@@ -99,7 +147,7 @@ class IOObserver(Observer):
             js = json.loads(message)
             # TODO: stream array id ??????
             self._payload = StreamStatus(**js['stream'][0])
-            self._timestamp = time.time()
+            self._timestamp = time.monotonic()
         except KeyError:
             # this means message doesn't contain stream
             pass
@@ -140,7 +188,7 @@ class TelemetryObserver(Observer):
                         torques=[joint_i['t'] for joint_i in js['telemetry'][-1]['act']])
                 }
 
-                self._timestamp = time.time()
+                self._timestamp = time.monotonic()
 
         except KeyError:
             # this means message doesn't contain telemetry
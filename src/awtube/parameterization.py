@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+    Time parameterization of joint paths under velocity, acceleration and jerk limits.
+
+    The path is retimed by iterative scaling: every segment starts at the shortest
+    duration allowed by the velocity limits, then the spline through the path is
+    sampled and every segment exceeding a limit is stretched by the ratio needed
+    to bring it back (v ~ 1/T, a ~ 1/T^2, j ~ 1/T^3), until no limit is exceeded.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube import parameterization
+
+      timing = parameterization.retime(path, robot.joint_limits)
+      print(f'Cycle time: {timing.cycle_time:.3f} s')
+      traj = timing.trajectory(period=0.02)
+      robot.move_joints_interpolated(traj.joint_states(), duration=traj.period)
+"""
+
+from __future__ import annotations
+import logging
+import typing as tp
+import numpy as np
+
+from awtube.types import JointLimits
+from awtube import trajectories
+import awtube.errors as errors
+
+_logger = logging.getLogger(__name__)
+
+
+class Timing(tp.NamedTuple):
+    """ Result of the time parameterization of a path. """
+    timestamps: np.ndarray = None
+    cycle_time: float = 0.0
+    iterations: int = 0
+    spline: trajectories.Spline = None
+
+    def trajectory(self, period: float = 0.1) -> trajectories.Trajectory:
+        """ Sample the retimed path, to be sent with move_joints_interpolated. """
+        return trajectories.sample(self.spline, period=period)
+
+
+def _limit(values, joints: int) -> np.ndarray:
+    """ Return limits as an array, infinite when not configured. """
+    if values is None:
+        return np.full(joints, np.inf)
+    values = np.asarray(values, dtype=float)
+    if values.shape != (joints,) or np.any(values <= 0):
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT,
+            f'Limits should be {joints} positive values.')
+    return values
+
+
+def _peak_ratios(spline: trajectories.Spline,
+                 fractions: np.ndarray,
+                 limits: tp.Tuple[np.ndarray, np.ndarray, np.ndarray]) -> tp.Tuple[np.ndarray, float]:
+    """
+    Return, for every segment, the time scaling needed to respect all limits,
+    and the largest ratio between a value and its limit.
+    """
+    scale = np.ones(len(spline.timestamps) - 1)
+    excess = 0.0
+    for derivative, limit in enumerate(limits, start=1):
+        if np.all(np.isinf(limit)):
+            continue
+        values = np.abs(spline.evaluate_segments(fractions, derivative=derivative))
+        ratio = (values / limit).max(axis=(1, 2))
+        excess = max(excess, float(ratio.max()))
+        np.maximum(scale, ratio ** (1 / derivative), out=scale)
+    return scale, excess
+
+
+def retime(positions,
+           limits: JointLimits,
+           order: int = 3,
+           samples_per_segment: int = 8,
+           max_iterations: int = 50,
+           min_segment_time: float = 1e-3,
+           tolerance: float = 1e-3) -> Timing:
+    """
+    Compute the fastest timing of a path respecting the joint limits.
+
+    Args:
+        positions: path, shape (waypoints, joints), in radians.
+        limits: velocity limits are required, acceleration and jerk limits are optional.
+        order: order of the spline fitted through the path, 3 or 5.
+        samples_per_segment: points checked inside every segment.
+        max_iterations: after this many local iterations the whole path
+            is scaled at once, which is guaranteed to respect the limits.
+        min_segment_time: shortest duration of a segment, used for still joints.
+        tolerance: relative excess over the limits accepted.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if positions.ndim != 2 or len(positions) < 2:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT,
+            'Path should have shape (waypoints, joints) with at least two waypoints.')
+    if limits is None or limits.velocities is None:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'Velocity limits are required to retime a path.')
+    joints = positions.shape[1]
+    bounds = (_limit(limits.velocities, joints),
+              _limit(limits.accelerations, joints),
+              _limit(limits.jerks, joints))
+    fractions = np.linspace(0.0, 1.0, samples_per_segment + 1)
+
+    # lower bound: every joint moving at its maximum velocity
+    h = np.abs(np.diff(positions, axis=0) / bounds[0]).max(axis=1)
+    np.maximum(h, min_segment_time, out=h)
+
+    iterations = 0
+    while True:
+        timestamps = np.concatenate(([0.0], np.cumsum(h)))
+        spline = trajectories.fit(positions, timestamps, order=order)
+        scale, excess = _peak_ratios(spline, fractions, bounds)
+        if excess <= 1 + tolerance:
+            break
+        iterations += 1
+        if iterations >= max_iterations:
+            # time scaling of the whole spline keeps its shape, this always succeeds
+            h = h * scale.max()
+            timestamps = np.concatenate(([0.0], np.cumsum(h)))
+            spline = trajectories.fit(positions, timestamps, order=order)
+            break
+        h = np.where(scale > 1, h * scale, h)
+
+    cycle_time = float(timestamps[-1])
+    _logger.debug('Retimed %d waypoints in %d iterations, cycle time %.3f s',
+                  len(positions), iterations, cycle_time)
+    return Timing(timestamps=timestamps,
+                  cycle_time=cycle_time,
+                  iterations=iterations,
+                  spline=spline)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+"""
+    Pose math and Cartesian path generation backed by NumPy.
+
+    Quaternions are arrays ordered as x, y, z, w like the ones sent to GBC,
+    translations are arrays of x, y, z. Every function works on batches,
+    the last axis holding the components.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube import poses
+      from awtube.types import Pose, Position, Quaternion
+
+      start = Pose(Position(400, -50, 650), Quaternion(0.866, 0, 0.5, 0))
+      end = Pose(Position(550, 50, 650), Quaternion(1, 0, 0, 0))
+      path = poses.line(start, end, step=1.0)
+      robot.move_path(path.translations, path.rotations)
+"""
+
+from __future__ import annotations
+import typing as tp
+import numpy as np
+
+from awtube.types import Pose, Position, Quaternion
+import awtube.errors as errors
+
+# below this angle between two quaternions slerp falls back to normalized lerp
+_SLERP_THRESHOLD = 1e-6
+
+
+class CartesianPath(tp.NamedTuple):
+    """ Dense Cartesian path, translations of shape (N, 3) and rotations of shape (N, 4). """
+    translations: np.ndarray = None
+    rotations: np.ndarray = None
+
+    def __len__(self) -> int:
+        return len(self.translations)
+
+    def items(self) -> tp.Iterator[tp.Tuple[tp.Dict[str, float], tp.Dict[str, float]]]:
+        """ Yield translation and rotation dicts, as taken by move_line and move_to_position. """
+        for t, r in zip(self.translations.tolist(), self.rotations.tolist()):
+            yield (dict(zip('xyz', t)), dict(zip('xyzw', r)))
+
+    def poses(self) -> tp.List[Pose]:
+        """ Return the path as a list of Pose. """
+        return [Pose(position=Position(*t), orientation=Quaternion(*r))
+                for t, r in zip(self.translations.tolist(), self.rotations.tolist())]
+
+
+def to_arrays(pose: Pose) -> tp.Tuple[np.ndarray, np.ndarray]:
+    """ Return translation and rotation arrays of a Pose. """
+    return (np.array(pose.position, dtype=float),
+            np.array(pose.orientation, dtype=float))
+
+
+def normalize(q) -> np.ndarray:
+    """ Return unit quaternions. """
+    q = np.asarray(q, dtype=float)
+    return q / np.linalg.norm(q, axis=-1, keepdims=True)
+
+
+def conjugate(q) -> np.ndarray:
+    """ Return the conjugate, the inverse of unit quaternions. """
+    q = np.asarray(q, dtype=float)
+    return q * np.array([-1.0, -1.0, -1.0, 1.0])
+
+
+def multiply(a, b) -> np.ndarray:
+    """ Return the Hamilton product a * b. """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    ax, ay, az, aw = np.moveaxis(a, -1, 0)
+    bx, by, bz, bw = np.moveaxis(b, -1, 0)
+    return np.stack([aw * bx + ax * bw + ay * bz - az * by,
+                     aw * by - ax * bz + ay * bw + az * bx,
+                     aw * bz + ax * by - ay * bx + az * bw,
+                     aw * bw - ax * bx - ay * by - az * bz], axis=-1)
+
+
+def angle(a, b) -> np.ndarray:
+    """ Return the rotation angle between unit quaternions, in radians. """
+    dot = np.abs(np.sum(np.asarray(a, dtype=float) * np.asarray(b, dtype=float), axis=-1))
+    return 2 * np.arccos(np.clip(dot, -1.0, 1.0))
+
+
+def slerp(q0, q1, fractions) -> np.ndarray:
+    """
+    Spherical linear interpolation between unit quaternions, along the shortest arc.
+    q0 and q1 broadcast against each other, fractions (0 to 1) are added as
+    a leading axis when q0 and q1 are single quaternions or matched otherwise.
+    """
+    q0 = normalize(q0)
+    q1 = normalize(q1)
+    fractions = np.asarray(fractions, dtype=float)
+    if q0.ndim == 1 and q1.ndim == 1:
+        fractions = fractions[..., None]
+    else:
+        fractions = fractions.reshape(fractions.shape + (1,))
+    dot = np.sum(q0 * q1, axis=-1, keepdims=True)
+    # q and -q are the same rotation, take the shortest way
+    q1 = np.where(dot < 0, -q1, q1)
+    dot = np.abs(dot)
+    theta = np.arccos(np.clip(dot, -1.0, 1.0))
+    sin_theta = np.sin(theta)
+    small = sin_theta < _SLERP_THRESHOLD
+    safe = np.where(small, 1.0, sin_theta)
+    w0 = np.where(small, 1 - fractions, np.sin((1 - fractions) * theta) / safe)
+    w1 = np.where(small, fractions, np.sin(fractions * theta) / safe)
+    return normalize(w0 * q0 + w1 * q1)
+
+
+def matrix_from_quaternion(q) -> np.ndarray:
+    """ Return rotation matrices, shape (..., 3, 3), of unit quaternions. """
+    x, y, z, w = np.moveaxis(normalize(q), -1, 0)
+    return np.stack([
+        np.stack([1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)], axis=-1),
+        np.stack([2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)], axis=-1),
+        np.stack([2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)], axis=-1)],
+        axis=-2)
+
+
+def quaternion_from_matrix(m) -> np.ndarray:
+    """ Return unit quaternions, with w >= 0, of rotation matrices of shape (..., 3, 3). """
+    m = np.asarray(m, dtype=float)
+    m00, m11, m22 = m[..., 0, 0], m[..., 1, 1], m[..., 2, 2]
+    # four candidate solutions, each one stable when its component is the largest
+    candidates = np.stack([
+        np.stack([1 + m00 - m11 - m22, m[..., 0, 1] + m[..., 1, 0],
+                  m[..., 0, 2] + m[..., 2, 0], m[..., 2, 1] - m[..., 1, 2]], axis=-1),
+        np.stack([m[..., 0, 1] + m[..., 1, 0], 1 - m00 + m11 - m22,
+                  m[..., 1, 2] + m[..., 2, 1], m[..., 0, 2] - m[..., 2, 0]], axis=-1),
+        np.stack([m[..., 0, 2] + m[..., 2, 0], m[..., 1, 2] + m[..., 2, 1],
+                  1 - m00 - m11 + m22, m[..., 1, 0] - m[..., 0, 1]], axis=-1),
+        np.stack([m[..., 2, 1] - m[..., 1, 2], m[..., 0, 2] - m[..., 2, 0],
+                  m[..., 1, 0] - m[..., 0, 1], 1 + m00 + m11 + m22], axis=-1)], axis=-2)
+    traces = np.stack([m00 - m11 - m22, m11 - m00 - m22, m22 - m00 - m11, m00 + m11 + m22],
+                      axis=-1)
+    best = np.argmax(traces, axis=-1)
+    q = np.take_along_axis(candidates, best[..., None, None], axis=-2)[..., 0, :]
+    q = normalize(q)
+    return np.where(q[..., 3:] < 0, -q, q)
+
+
+def quaternion_from_euler(roll, pitch, yaw) -> np.ndarray:
+    """ Return unit quaternions of roll, pitch, yaw angles (rotations about fixed x, y, z). """
+    hr, hp, hy = (np.asarray(a, dtype=float) / 2 for a in (roll, pitch, yaw))
+    cr, sr = np.cos(hr), np.sin(hr)
+    cp, sp = np.cos(hp), np.sin(hp)
+    cy, sy = np.cos(hy), np.sin(hy)
+    return np.stack([sr * cp * cy - cr * sp * sy,
+                     cr * sp * cy + sr * cp * sy,
+                     cr * cp * sy - sr * sp * cy,
+                     cr * cp * cy + sr * sp * sy], axis=-1)
+
+
+def euler_from_quaternion(q) -> np.ndarray:
+    """ Return roll, pitch, yaw angles, shape (..., 3), of unit quaternions. """
+    x, y, z, w = np.moveaxis(normalize(q), -1, 0)
+    roll = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+    yaw = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return np.stack([roll, pitch, yaw], axis=-1)
+
+
+def interpolate(start: Pose, end: Pose, fractions) -> CartesianPath:
+    """ Interpolate linearly the translation and with slerp the rotation between two poses. """
+    t0, r0 = to_arrays(start)
+    t1, r1 = to_arrays(end)
+    fractions = np.asarray(fractions, dtype=float)
+    return CartesianPath(translations=t0 + fractions[:, None] * (t1 - t0),
+                         rotations=slerp(r0, r1, fractions))
+
+
+def line(start: Pose,
+         end: Pose,
+         step: float = None,
+         angle_step: float = None,
+         count: int = None) -> CartesianPath:
+    """
+    Dense straight line from start to end, the start pose excluded.
+
+    Args:
+        start: first pose, where the robot is expected to be.
+        end: last pose, always included.
+        step: largest translation between two poses, in the unit of the poses (mm).
+        angle_step: largest rotation between two poses, in radians.
+        count: number of poses, instead of step and angle_step.
+    """
+    if count is None:
+        if step is None and angle_step is None:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'One of step, angle_step or count is needed.')
+        t0, r0 = to_arrays(start)
+        t1, r1 = to_arrays(end)
+        count = 1
+        if step:
+            count = max(count, int(np.ceil(np.linalg.norm(t1 - t0) / step)))
+        if angle_step:
+            count = max(count, int(np.ceil(angle(normalize(r0), normalize(r1)) / angle_step)))
+    fractions = np.arange(1, count + 1) / count
+    return interpolate(start, end, fractions)
+
+
+def polyline(poses: tp.Sequence[Pose],
+             step: float = None,
+             angle_step: float = None) -> CartesianPath:
+    """ Dense path through consecutive poses, the first one excluded. """
+    segments = [line(a, b, step=step, angle_step=angle_step)
+                for a, b in zip(poses[:-1], poses[1:])]
+    if not segments:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'At least two poses are needed.')
+    return CartesianPath(translations=np.concatenate([s.translations for s in segments]),
+                         rotations=np.concatenate([s.rotations for s in segments]))
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+"""
+    Programs: motion sequences recorded once and replayed many times.
+
+    The moves, stream IO and speed changes of a program are serialized once to
+    frames, complete stream item messages with only their tag left open. Replaying
+    the program only writes the tag given by the stream in every frame, and speed
+    changes are applied by the stream when the item after them starts. Compiled
+    programs are cached on disk, keyed by the hash of their content, so a program
+    recorded again by the next run of a script is not serialized again.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube.program import Program
+
+      rotation = {'x': 0.866, 'y': 0.0, 'z': 0.5, 'w': 0.0}
+      program = Program() \\
+          .move_line({'x': 400, 'y': -50, 'z': 650}, rotation) \\
+          .set_speed(2) \\
+          .move_line({'x': 400, 'y': 50, 'z': 650}, rotation)
+
+      robot.run_program(program, repeat=100)
+"""
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import typing as tp
+
+from . import command_receiver, commands, errors, templates, trajectories, types
+
+# bump when the frames of the same program change, invalidates the disk cache
+FORMAT_VERSION = 1
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'awtube', 'programs')
+
+FRAME = 'frame'
+SPEED = 'speed'
+
+
+def _xyz(value: tp.Dict[str, float]) -> tp.List[float]:
+    return [float(value['x']), float(value['y']), float(value['z'])]
+
+
+def _xyzw(value: tp.Dict[str, float]) -> tp.List[float]:
+    return [float(value['x']), float(value['y']), float(value['z']), float(value['w'])]
+
+
+class FrameCommand(commands.Command):
+    """ Stream item of a compiled program, only its tag is written when sent. """
+    __slots__ = ('_frame', '_receiver', 'tag', 'move_params', 'sent')
+
+    def __init__(self, receiver: command_receiver.CommandReceiver, frame: str):
+        self._frame = frame
+        self._receiver = receiver
+        self.tag = 0
+        # part of the frame, kept for the stream controller
+        self.move_params = None
+        self.sent = False
+
+    def execute(self):
+        self._receiver.put(self._frame % (self.tag,))
+
+
+class CompiledProgram:
+    """ Frames of a program and its speed changes, in order. """
+    __slots__ = ('key', 'steps')
+
+    def __init__(self, key: str, steps: tp.List[tp.Tuple[str, tp.Any]]):
+        """
+        Args:
+            key: content hash of the program.
+            steps: (FRAME, message with %s in place of the tag) or (SPEED, feed rate).
+        """
+        self.key = key
+        self.steps = steps
+
+    def __len__(self) -> int:
+        return len(self.steps)
+
+    def commands(self,
+                 receiver: command_receiver.CommandReceiver,
+                 repeat: int = 1) -> tp.List[commands.Command]:
+        """ Return the commands of `repeat` runs, streamed in one go. """
+        cmds = []
+        for _ in range(repeat):
+            for kind, value in self.steps:
+                if kind == FRAME:
+                    cmds.append(FrameCommand(receiver, value))
+                else:
+                    cmds.append(commands.StreamFeedRateCommand(receiver, value))
+        return cmds
+
+    def save(self, path: str):
+        """ Write the program, through a temporary file so readers never see half of it. """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': FORMAT_VERSION, 'key': self.key, 'steps': self.steps}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> CompiledProgram | None:
+        """ Read a program saved by :meth:`save`, None if missing or of another format version. """
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != FORMAT_VERSION:
+            return None
+        return cls(data['key'], [tuple(step) for step in data['steps']])
+
+
+class Program:
+    """
+    Recorder of moves, stream IO and speed changes, compiled once and replayed
+    with :meth:`~awtube.async_robot.AsyncRobot.run_program_async`. Moves recorded
+    without move parameters use the ones of the program, the default move
+    parameters of the robot are not applied since frames are serialized once.
+    """
+
+    def __init__(self, kc: int = 0, move_params: types.MoveParametersConfig = None):
+        """
+        Args:
+            kc: kinematics configuration index of the moves.
+            move_params: move parameters of the moves recorded without their own, GBC defaults if None.
+        """
+        self._kc = kc
+        self._move_params = move_params
+        self._steps: tp.List[tp.Tuple[str, dict]] = []
+        self._compiled: CompiledProgram = None
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def _record(self, name: str, **args) -> Program:
+        self._steps.append((name, args))
+        self._compiled = None
+        return self
+
+    def _params(self, move_params: types.MoveParametersConfig | None) -> dict:
+        params = move_params if move_params is not None else self._move_params
+        return params.to_dict() if params is not None else {}
+
+    def move_line(self,
+                  translation: tp.Dict[str, float],
+                  rotation: tp.Dict[str, float],
+                  move_params: types.MoveParametersConfig = None) -> Program:
+        """ Record a moveLine, translation x, y, z in mm and rotation quaternion x, y, z, w. """
+        return self._record('move_line', translation=_xyz(translation), rotation=_xyzw(rotation),
+                            move_params=self._params(move_params))
+
+    def move_to_position(self,
+                         translation: tp.Dict[str, float],
+                         rotation: tp.Dict[str, float],
+                         position_reference: types.PositionReference = types.PositionReference.ABSOLUTE,
+                         move_params: types.MoveParametersConfig = None) -> Program:
+        """ Record a moveToPosition. """
+        return self._record('move_to_position', translation=_xyz(translation), rotation=_xyzw(rotation),
+                            position_reference=int(position_reference),
+                            move_params=self._params(move_params))
+
+    def move_joints(self, joints: tp.List[float], move_params: types.MoveParametersConfig = None) -> Program:
+        """ Record a moveJoints, joint positions in radians. """
+        return self._record('move_joints', joints=[float(j) for j in joints],
+                            move_params=self._params(move_params))
+
+    def move_joints_interpolated(self,
+                                 points,
+                                 duration: float = 0.1,
+                                 move_params: types.MoveParametersConfig = None) -> Program:
+        """ Record a trajectory, a list of JointStates or a :class:`~awtube.trajectories.Trajectory`,
+            the durations of a Trajectory replacing `duration` as in move_joints_interpolated_async. """
+        if isinstance(points, trajectories.Trajectory):
+            positions, velocities = points.positions.tolist(), points.velocities.tolist()
+            if points.durations is not None:
+                return self._record('move_joints_interpolated', positions=positions, velocities=velocities,
+                                    durations=points.durations.tolist(), move_params=self._params(move_params))
+        else:
+            positions = [[float(q) for q in pt.positions] for pt in points]
+            velocities = [[float(v) for v in pt.velocities] for pt in points]
+        return self._record('move_joints_interpolated', positions=positions, velocities=velocities,
+                            duration=float(duration), move_params=self._params(move_params))
+
+    def move_arc(self,
+                 translation: tp.Dict[str, float],
+                 rotation: tp.Dict[str, float],
+                 centre: tp.Dict[str, float],
+                 direction: types.ArcDirection = types.ArcDirection.CCW,
+                 plane: tp.Dict[str, float] = None,
+                 move_params: types.MoveParametersConfig = None) -> Program:
+        """ Record a moveArc, see :meth:`~awtube.async_robot.AsyncRobot.move_arc_async`. """
+        return self._record('move_arc', translation=_xyz(translation), rotation=_xyzw(rotation),
+                            centre=_xyz(centre), direction=int(direction),
+                            plane=None if plane is None else _xyzw(plane),
+                            move_params=self._params(move_params))
+
+    def stream_dout(self, position: int, value: bool) -> Program:
+        """ Record a digital out set in order with the moves. """
+        return self._record('set_dout', position=int(position), value=bool(value))
+
+    def stream_aout(self, position: int, value: float) -> Program:
+        """ Record an analog out set in order with the moves. """
+        return self._record('set_aout', position=int(position), value=float(value))
+
+    def stream_iout(self, position: int, value: int) -> Program:
+        """ Record an integer out set in order with the moves. """
+        return self._record('set_iout', position=int(position), value=int(value))
+
+    def dwell(self, ms: int) -> Program:
+        """ Record a wait of `ms` milliseconds in the stream. """
+        return self._record('dwell', ms=int(ms))
+
+    def set_speed(self, value: float) -> Program:
+        """ Record a feed rate change, applied when the next item recorded starts executing. """
+        if value < 0:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'Feed rate should not be negative.')
+        return self._record('set_speed', value=float(value))
+
+    @property
+    def key(self) -> str:
+        """ Hash of the content of the program, the name of its compiled file in the cache. """
+        content = templates.dumps([FORMAT_VERSION, self._kc, self._steps])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def compile(self, cache_dir: str | None = DEFAULT_CACHE_DIR) -> CompiledProgram:
+        """ Serialize the program to frames, or load them from `cache_dir`, None for no disk cache. """
+        if self._compiled is not None:
+            return self._compiled
+        key = self.key
+        path = None if cache_dir is None else os.path.join(cache_dir, f'{key}.json')
+        compiled = None if path is None else CompiledProgram.load(path)
+        if compiled is None or compiled.key != key:
+            compiled = CompiledProgram(key, [step for name, args in self._steps
+                                             for step in self._compile_step(name, args)])
+            if path is not None:
+                compiled.save(path)
+        self._compiled = compiled
+        return compiled
+
+    def _compile_step(self, name: str, args: dict) -> tp.Iterator[tp.Tuple[str, tp.Any]]:
+        kc = self._kc
+        if name == 'set_speed':
+            yield SPEED, args['value']
+            return
+        if name == 'move_line':
+            template = templates.move_line(kc=kc)
+            values = [args['move_params'], *args['translation'], *args['rotation']]
+        elif name == 'move_to_position':
+            template = templates.move_to_position(0, kc, types.PositionReference(args['position_reference']))
+            values = [args['move_params'], *args['translation'], *args['rotation']]
+        elif name == 'move_joints':
+            template = templates.move_joints(kc=kc)
+            values = [args['move_params'], args['joints']]
+        elif name == 'move_joints_interpolated':
+            template = templates.move_joints_interpolated(kc=kc)
+            durations = args.get('durations') or [args['duration']] * len(args['positions'])
+            for p, v, duration in zip(args['positions'], args['velocities'], durations):
+                yield FRAME, template.partial(args['move_params'], duration, p, v).format
+            return
+        elif name == 'move_arc':
+            plane = args['plane']
+            template = templates.move_arc(kc=kc, plane=plane is not None)
+            values = [args['move_params'], args['direction'],
+                      *args['translation'], *args['rotation'], *args['centre'], *(plane or [])]
+        elif name == 'set_dout':
+            template = templates.set_dout()
+            values = [args['position'], args['value']]
+        elif name == 'set_aout':
+            template = templates.set_aout()
+            values = [args['position'], args['value']]
+        elif name == 'set_iout':
+            template = templates.set_iout()
+            values = [args['position'], args['value']]
+        elif name == 'dwell':
+            template = templates.dwell()
+            values = [args['ms']]
+        else:
+            raise errors.AWTubeErrorException(errors.AwtubeError.BAD_ARGUMENT, f'Unknown program step {name}.')
+        yield FRAME, template.partial(*values).format
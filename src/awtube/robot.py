@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
 """ 
-    Robot offers all possible ways to interact with the machine.
+    Robot offers all possible ways to interact with the machine, from sync code.
+    It runs :class:`~awtube.async_robot.AsyncRobot` in the threadloop, a daemon thread,
+    and blocks on each call unless asked not to.
     
     Example:
 
@@ -33,6 +35,17 @@
       
       # send a move_joints command
       robot.move_joints([0,0,0,0,0,0])
+
+      # queue moves without waiting, the stream is kept full while this side goes on
+      for t, r in path.items():
+          robot.move_line(t, r, wait=False)
+      robot.wait_all()
+
+      # blend the following moves of the stream with each other
+      from awtube.types import MoveParametersConfig, BlendType
+      robot.set_default_move_params(
+                MoveParametersConfig(blend_type=BlendType.OVERLAPPED,
+                                     blend_tolerance=1.0))
       
       # set digital out
       robot.set_dout(0,1)
@@ -49,14 +62,21 @@
 """
 
 from __future__ import annotations
+import asyncio
+import contextlib
 import logging
+import threading
 import typing as tp
+import weakref
 
-from . import command_receiver, controllers, observers, threadloop, errors, commands, types, cia402
+from . import controllers, threadloop, types, handles, program
+from .async_robot import AsyncRobot
 
 
-class Robot:
+class Robot(AsyncRobot):
     """Robot class used to interact with the robot arm."""
+    # robots not killed yet, sharing the threadloop
+    _alive: tp.ClassVar[weakref.WeakSet] = weakref.WeakSet()
 
     def __init__(self,
                  robot_ip: str = "0.0.0.0",
@@ -65,45 +85,109 @@ class Robot:
                  name: str = "AWTube",
                  log_level: int | str = logging.INFO,
                  logger: logging.Logger | None = None):
-
-        self._log_level = log_level
-        self._logger = logging.getLogger(
-            self.__class__.__name__) if logger is None else logger
-        # self._logger.setLevel(self._log_level)
+        super().__init__(robot_ip=robot_ip,
+                         port=port,
+                         config_path=config_path,
+                         name=name,
+                         log_level=log_level,
+                         logger=logger)
         self.tloop = threadloop.threadloop
-        self.tloop.start()
-        self.killed: bool = False
-        self._name = name
-        self._robot_ip = robot_ip
-        self._port = port
-        self.receiver = command_receiver.WebsocketThread(
-            f"ws://{self._robot_ip}:{self._port}/ws")
-        self.stream_observer = observers.StreamObserver()
-        self.telemetry_observer = observers.TelemetryObserver()
-        self.status_observer = observers.StatusObserver()
-        self.stream_controller = controllers.StreamController(
-            self.stream_observer)
-        self.machine_controller = controllers.MachineController(
-            self.status_observer)
-        self.receiver.attach_observer(self.telemetry_observer)
-        self.receiver.attach_observer(self.stream_observer)
-        self.receiver.attach_observer(self.status_observer)
+        if not self.tloop.is_alive():
+            self.tloop.start()
+        self.receiver.on_exception = self.tloop.register_exception
+        self.machine_controller.on_exception = self.tloop.register_exception
+        self.watchdog.on_exception = self.tloop.register_exception
+        self.tloop.add_reconnect_handler(self._reconnect)
+        Robot._alive.add(self)
+        # handles of the commands given without waiting, see wait_all()
+        self._handles: tp.List[handles.CommandHandle] = []
+        # batch recording the calls of each thread, see batch()
+        self._local = threading.local()
+
+    def _spawn(self, coro) -> tp.Any:
+        """ Run coro in the background, in the threadloop. """
+        try:
+            if asyncio.get_running_loop() is self.tloop.loop:
+                # kept with the tasks of the robot, cancelled on close
+                return super()._spawn(coro)
+        except RuntimeError:
+            pass
+        return self.tloop.post(coro)
+
+    def _reconnect(self):
+        """ Listen again once the connection is lost, for the exceptions with policy RECONNECT. """
+        if self.killed or (self._listen_task is not None and not self._listen_task.done()):
+            return
+        self._logger.info('Reconnecting to %s.', self.receiver.url)
+        self._listen_task = self._spawn(self.receiver.listen())
 
     def kill(self):
         """ Stop communication with robot. """
         # Cancel tasks and stop loop from sync, threadsafe
         self._logger.debug('Killing robot.')
         self.disable()
-        self.killed = True
-        self.disable()
-        if threadloop.threadloop.loop.is_running():
+        self.tloop.post_wait(self.close())
+        Robot._alive.discard(self)
+        self.tloop.remove_reconnect_handler(self._reconnect)
+        # the threadloop is shared, it is stopped with the last robot
+        if not Robot._alive and threadloop.threadloop.loop.is_running():
             self.tloop.stop()
 
     def start(self):
         """ Start communication with robot. """
-        self.tloop.post(self.receiver.listen())
-        self.tloop.post(self.stream_controller.start())
-        self.tloop.post(self.machine_controller.start())
+        self.tloop.post_wait(super().start())
+
+    def _post(self,
+              coro,
+              wait: bool,
+              controller: controllers.Controller = None,
+              timeout: float = 120) -> handles.CommandHandle | None:
+        """ Run coro in the threadloop, block until it returns if wait
+            otherwise return a handle on it right away. In a batch coro is recorded. """
+        batch: handles.Batch = getattr(self._local, 'batch', None)
+        if batch is not None:
+            handle = batch.add(coro, controller)
+            self._handles.append(handle)
+            return handle
+        if wait:
+            self.tloop.post_wait(coro, timeout=timeout)
+            return None
+        handle = handles.CommandHandle(self.tloop.post(coro))
+        self._handles = [h for h in self._handles if not h.done()]
+        self._handles.append(handle)
+        return handle
+
+    @contextlib.contextmanager
+    def batch(self) -> tp.Iterator[handles.Batch]:
+        """ Record the calls made in the block and submit them on exit in one hop.
+
+        Calls return a handle right away instead of blocking, whatever their wait
+        argument. Their order is kept, also between the stream and machine controllers:
+        a call on one starts once the calls on the other before it are done.
+        The calls are dropped if the block raises. Batches opened in a batch join it.
+        """
+        current = getattr(self._local, 'batch', None)
+        if current is not None:
+            yield current
+            return
+        batch = handles.Batch(self.tloop)
+        self._local.batch = batch
+        try:
+            yield batch
+        except BaseException:
+            batch.discard()
+            raise
+        else:
+            batch.submit()
+        finally:
+            self._local.batch = None
+
+    def wait_all(self, timeout: float = None) -> bool:
+        """ Block until every command given with wait=False is done or timeout,
+            return True if all are done. """
+        done = handles.wait_all(self._handles, timeout=timeout)
+        self._handles = [h for h in self._handles if not h.done()]
+        return done
 
     # def reset(self):
     #     """ Enable connection with GBC, commanding to go to OPERATION_ENABLED state. """
@@ -125,174 +209,182 @@ class Robot:
     #     return await switch_on_disabled
 
     def enable(self):
-        """Sync wrapper for :func:`~awtube.robot.Robot.enable_async`"""
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.enable_async`"""
         self.tloop.post_wait(self.enable_async(), timeout=15)
         self._logger.debug('Robot is enabled!')
 
-    async def enable_async(self):
-        """ Enable machine by setting it's state to OPERATION_ENABLED coroutine. """
-        self.machine_controller.schedule_first(
-            commands.HeartbeatCommad(self.receiver, frequency=2))
-        operational = self.machine_controller.schedule_last(
-            commands.MachineStateCommad(self.receiver,
-                                        desired_state=cia402.CIA402MachineState.OPERATION_ENABLED))
-        return await operational
-
     def disable(self):
-        """Sync wrapper for :func:`~awtube.robot.Robot.disable_async`"""
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.disable_async`"""
         self.tloop.post_wait(self.disable_async())
         self._logger.debug('Robot is disabled!')
 
-    async def disable_async(self):
-        """ Disable robot. """
-        disabled = self.machine_controller.schedule_last(
-            commands.MachineStateCommad(self.receiver,
-                                        desired_state=cia402.CIA402MachineState.SWITCH_ON_DISABLED))
-        return await disabled
-
-    def set_dout(self, position: int, value: int, override: bool = True):
-        """Sync wrapper for :func:`~awtube.robot.Robot.set_dout_async`"""
-        self.tloop.post_wait(self.set_dout_async(
+    def set_dout(self, position: int, value: int, override: bool = True,
+                 wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.set_dout_async`"""
+        handle = self._post(self.set_dout_async(
             position=position,
             value=value,
-            override=override))
+            override=override), wait, self.machine_controller)
         self._logger.debug(
             'Set dout value:%s with override:%s.', value, override)
-
-    async def set_dout_async(self, position: int, value: int, override: bool):
-        """ Send set digital out command. """
-        task = self.machine_controller.schedule_last(
-            commands.DoutCommad(self.receiver,
-                                position=position,
-                                value=value,
-                                override=override))
-        return await task
-
-    def send_serial(self, position: int, hex_string: int):
-        """Sync wrapper for :func:`~awtube.robot.Robot.send_serial_async`"""
-        self.tloop.post_wait(self.send_serial_async(
+        return handle
+
+    def stream_dout(self, position: int, value: bool,
+                    wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.stream_dout_async`"""
+        handle = self._post(self.stream_dout_async(position, value),
+                            wait, self.stream_controller)
+        self._logger.debug('Streamed dout %s value:%s.', position, value)
+        return handle
+
+    def stream_aout(self, position: int, value: float,
+                    wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.stream_aout_async`"""
+        handle = self._post(self.stream_aout_async(position, value),
+                            wait, self.stream_controller)
+        self._logger.debug('Streamed aout %s value:%s.', position, value)
+        return handle
+
+    def stream_iout(self, position: int, value: int,
+                    wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.stream_iout_async`"""
+        handle = self._post(self.stream_iout_async(position, value),
+                            wait, self.stream_controller)
+        self._logger.debug('Streamed iout %s value:%s.', position, value)
+        return handle
+
+    def dwell(self, ms: int, wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.dwell_async`"""
+        return self._post(self.dwell_async(ms), wait, self.stream_controller)
+
+    def send_serial(self, position: int, hex_string: int,
+                    wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.send_serial_async`"""
+        return self._post(self.send_serial_async(
             position,
-            hex_string))
-
-    async def send_serial_async(self, position: int, hex_string: int):
-        """ Send serial command. """
-        task = self.machine_controller.schedule_last(
-            commands.SerialCommad(self.receiver,
-                                  data=hex_string))
-        return await task
+            hex_string), wait, self.machine_controller)
 
-    def set_machine_target(self, target: types.MachineTarget):
-        self.tloop.post_wait(self.set_machine_target_async(target=target))
+    def set_machine_target(self, target: types.MachineTarget,
+                           wait: bool = True) -> handles.CommandHandle | None:
+        handle = self._post(self.set_machine_target_async(target=target),
+                            wait, self.machine_controller)
         self._logger.debug(
             'Set machine target:%s.', target)
+        return handle
 
-    async def set_machine_target_async(self, target: types.MachineTarget):
-        return await self.machine_controller.schedule_last(
-            commands.MachineTargetCommad(self.receiver, target=target))
-
-    def set_speed(self, value: float):
+    def set_speed(self, value: float, wait: bool = True) -> handles.CommandHandle | None:
         """ Set speed (0.0-2.0). """
-        self.tloop.post_wait(self.set_speed_async(value))
+        handle = self._post(self.set_speed_async(value), wait, self.machine_controller)
         self._logger.debug('Velocity is set to %.2f.', value)
+        return handle
 
-    async def set_speed_async(self, value: float):
-        task = self.machine_controller.schedule_last(
-            commands.KinematicsConfigurationCommad(
-                self.receiver, target_feed_rate=value)
-        )
-        return await task
+    def stream_speed(self, value: float, at_tag: int = None,
+                     wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.stream_speed_async`"""
+        return self._post(self.stream_speed_async(value, at_tag=at_tag),
+                          wait, self.stream_controller)
 
-    def set_safe_limits(self, value: bool = True):
+    def set_safe_limits(self, value: bool = True,
+                        wait: bool = True) -> handles.CommandHandle | None:
         """ Disable internal safe limits of motion controller. """
-        self.tloop.post_wait(self.set_safe_limits_async(value))
+        handle = self._post(self.set_safe_limits_async(value), wait, self.machine_controller)
         self._logger.debug('Safe limits is set to %s.', value)
+        return handle
 
-    async def set_safe_limits_async(self, value: bool):
-        task = self.machine_controller.schedule_first(
-            commands.KinematicsConfigurationCommad(
-                self.receiver, safe_limits=value)
-        )
-        return await task
-
-    def __cmd(self, command: types.StreamCommandType):
-        cmd = commands.StreamCommand(self.receiver,
-                                     command=command)
-        self.stream_controller.schedule_first(cmd)
-
-    def stop_stream(self):
-        """ Stop stream. Sets velocity to zero, to restart increase velocity and call run() """
-        self.__cmd(types.StreamCommandType.STOP)
-
-    def pause_stream(self):
-        """ Pause stream. Sets velocity to zero, to restart increase velocity and call run() """
-        self.__cmd(types.StreamCommandType.PAUSE)
-
-    def run_stream(self):
-        """ Run stream. Used after stopping or pausing."""
-        self.__cmd(types.StreamCommandType.RUN)
-
-    def move_joints_interpolated(self, points):
+    def move_joints_interpolated(self,
+                                 points,
+                                 duration: float = 0.1,
+                                 move_params: types.MoveParametersConfig = None,
+                                 wait: bool = True) -> handles.CommandHandle | None:
         """ Send a trajectory. """
-        self.tloop.post_wait(self.move_joints_interpolated_async(points))
-
-    async def move_joints_interpolated_async(self, points):
-        """ Send a moveLine command to be executed by the controller. """
-        cmds = [commands.MoveJointsInterpolatedCommand(
-                receiver=self.receiver,
-                joint_positions=pt.positions,
-                joint_velocities=pt.velocities) for pt in points]
-        return await self.stream_controller.schedule_last(cmds)
+        return self._post(self.move_joints_interpolated_async(points,
+                                                              duration=duration,
+                                                              move_params=move_params),
+                          wait, self.stream_controller)
 
     def move_line(self,
                   translation: tp.Dict[str, float],
-                  rotation: tp.Dict[str, float]):
-        """Sync wrapper for :func:`~awtube.robot.Robot.move_line_async`"""
-
-        self.tloop.post_wait(self.move_line_async(translation,
-                                                  rotation))
-
-    async def move_line_async(self,
-                              translation: tp.Dict[str, float],
-                              rotation: tp.Dict[str, float]):
-        """ Send a moveLine command.
-            translation dict with keys {'x', 'y', 'z'}
-            rotation dict with keys {'x', 'y', 'z', 'w'}
-        """
-        cmd = commands.MoveLineCommand(
-            self.receiver, translation, rotation)
-        task = self.stream_controller.schedule_last(cmd)
-        return await task
+                  rotation: tp.Dict[str, float],
+                  move_params: types.MoveParametersConfig = None,
+                  wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.move_line_async`"""
 
-    def move_joints(self, joints: list):
-        """Sync wrapper for :func:`~awtube.robot.Robot.move_joints_async`"""
+        return self._post(self.move_line_async(translation,
+                                               rotation,
+                                               move_params=move_params),
+                          wait, self.stream_controller)
 
-        self.tloop.post_wait(self.move_joints_async(joints))
+    def move_joints(self, joints: list, move_params: types.MoveParametersConfig = None,
+                    wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.move_joints_async`"""
 
-    async def move_joints_async(self, joints: list):
-        """ Send a moveJoints command. Joint position values are in radians."""
-        cmd = commands.MoveJointsCommand(
-            self.receiver, joint_positions=joints)
-        task = self.stream_controller.schedule_last(cmd)
-        return await task
+        return self._post(self.move_joints_async(joints, move_params=move_params),
+                          wait, self.stream_controller)
 
     def move_to_position(self,
                          translation: tp.Dict[str, float],
                          rotation: tp.Dict[str, float],
-                         tag: int = 0):
+                         tag: int = 0,
+                         move_params: types.MoveParametersConfig = None,
+                         wait: bool = True) -> handles.CommandHandle | None:
         """ Send a moveToPosition command.
 
         Args:
             translation (tp.Dict[str, float]): dict of translation x, y, z
             rotation (tp.Dict[str, float]): Dict of rotation, a quaternion: x, y, z, w
             tag (int, optional): tag(id) with which to send the command to the robot. Defaults to 0.
+            move_params (types.MoveParametersConfig, optional): overrides the default
+                move parameters of the stream. Defaults to None.
+            wait (bool, optional): block until done, otherwise return a handle. Defaults to True.
         """
-        self.tloop.post_wait(self.move_to_position_async(translation,
-                                                         rotation))
+        handle = self._post(self.move_to_position_async(translation,
+                                                        rotation,
+                                                        move_params=move_params),
+                            wait, self.stream_controller)
         self._logger.debug('moveLine done')
-
-    async def move_to_position_async(self,
-                                     translation: tp.Dict[str, float],
-                                     rotation: tp.Dict[str, float]):
-        cmd = commands.MoveToPositionCommand(self.receiver, translation,rotation)
-        task = self.stream_controller.schedule_last(cmd)
-        return await task
+        return handle
+
+    def move_arc(self,
+                 translation: tp.Dict[str, float],
+                 rotation: tp.Dict[str, float],
+                 centre: tp.Dict[str, float],
+                 direction: types.ArcDirection = types.ArcDirection.CCW,
+                 plane: tp.Dict[str, float] = None,
+                 move_params: types.MoveParametersConfig = None,
+                 wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.move_arc_async`"""
+        return self._post(self.move_arc_async(translation,
+                                              rotation,
+                                              centre,
+                                              direction=direction,
+                                              plane=plane,
+                                              move_params=move_params),
+                          wait, self.stream_controller)
+
+    def move_path(self,
+                  translations,
+                  rotations,
+                  activity: types.ActivityType = types.ActivityType.MOVELINE,
+                  tolerance: float = None,
+                  angle_tolerance: float = None,
+                  fit_arcs: bool = False,
+                  move_params: types.MoveParametersConfig = None,
+                  wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.move_path_async`"""
+        return self._post(self.move_path_async(translations,
+                                               rotations,
+                                               activity=activity,
+                                               tolerance=tolerance,
+                                               angle_tolerance=angle_tolerance,
+                                               fit_arcs=fit_arcs,
+                                               move_params=move_params),
+                          wait, self.stream_controller)
+
+    def run_program(self,
+                    prog: program.Program | program.CompiledProgram,
+                    repeat: int = 1,
+                    cache_dir: str | None = program.DEFAULT_CACHE_DIR,
+                    wait: bool = True) -> handles.CommandHandle | None:
+        """Sync wrapper for :func:`~awtube.async_robot.AsyncRobot.run_program_async`"""
+        return self._post(self.run_program_async(prog, repeat=repeat, cache_dir=cache_dir),
+                          wait, self.stream_controller)
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+
+"""
+    Simplification of dense Cartesian paths.
+
+    Nearly collinear points are removed with Ramer-Douglas-Peucker, every range is
+    checked at once with NumPy. A point is kept if dropping it would move the path
+    by more than the position tolerance, or turn the interpolated rotation by
+    more than the orientation tolerance. Runs of the remaining lines lying on a
+    circle can then be replaced by arcs, see :func:`fit_arcs`.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube import simplification
+
+      result = simplification.simplify(path.translations, path.rotations,
+                                       tolerance=0.05, angle_tolerance=0.001)
+      print(result.reduction_ratio, result.max_deviation)
+      robot.move_path(result.path.translations, result.path.rotations)
+"""
+
+from __future__ import annotations
+import typing as tp
+import numpy as np
+
+from awtube import poses
+from awtube.types import ActivityType, ArcDirection
+import awtube.errors as errors
+
+_Z = np.array([0.0, 0.0, 1.0])
+
+
+class SimplifiedPath(tp.NamedTuple):
+    """ Result of the simplification of a path. """
+    # indices of the points kept in the original path
+    indices: np.ndarray = None
+    path: poses.CartesianPath = None
+    # points given over points kept, 10.0 means ten times less stream items
+    reduction_ratio: float = 1.0
+    # largest distance of a dropped point from the simplified path
+    max_deviation: float = 0.0
+    # largest angle, in radians, between a dropped rotation and the interpolated one
+    max_angle_deviation: float = 0.0
+
+
+def _deviations(translations: np.ndarray,
+                rotations: np.ndarray | None,
+                start: int,
+                end: int,
+                indices: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray]:
+    """
+    Distance and rotation error of points from the segments they are replaced by,
+    `start` and `end` are arrays with the segment ends of each point.
+    """
+    a = translations[start]
+    ab = translations[end] - a
+    ap = translations[indices] - a
+    length2 = np.sum(ab * ab, axis=-1)
+    fraction = np.clip(np.sum(ap * ab, axis=-1) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+    distance = np.linalg.norm(ap - fraction[:, None] * ab, axis=-1)
+    if rotations is None:
+        return distance, np.zeros_like(distance)
+    expected = poses.slerp(rotations[start], rotations[end], fraction)
+    return distance, poses.angle(rotations[indices], expected)
+
+
+def simplify(translations,
+             rotations=None,
+             tolerance: float = 0.1,
+             angle_tolerance: float = None) -> SimplifiedPath:
+    """
+    Drop the points of a path that can be interpolated within tolerance.
+
+    Args:
+        translations: array of shape (N, 3), points of the path.
+        rotations: array of shape (N, 4), quaternion x, y, z, w of each point, optional.
+        tolerance: largest distance of the path from a dropped point.
+        angle_tolerance: largest rotation error of a dropped point, in radians,
+            rotations are ignored if None.
+    """
+    translations = np.asarray(translations, dtype=float)
+    if translations.ndim != 2 or len(translations) < 2:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'Path should have shape (points, 3) with at least two points.')
+    if tolerance <= 0:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'Tolerance should be positive.')
+    if rotations is not None:
+        rotations = poses.normalize(rotations)
+    check_rotations = rotations is not None and angle_tolerance is not None
+
+    n = len(translations)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    ranges = [(0, n - 1)]
+    while ranges:
+        start, end = ranges.pop()
+        if end - start < 2:
+            continue
+        inner = np.arange(start + 1, end)
+        distance, rotation_error = _deviations(
+            translations, rotations if check_rotations else None,
+            np.full(len(inner), start), np.full(len(inner), end), inner)
+        # errors relative to their tolerance, the worst point is split on
+        error = distance / tolerance
+        if check_rotations:
+            error = np.maximum(error, rotation_error / angle_tolerance)
+        worst = int(np.argmax(error))
+        if error[worst] > 1:
+            split = start + 1 + worst
+            keep[split] = True
+            ranges.append((start, split))
+            ranges.append((split, end))
+
+    indices = np.flatnonzero(keep)
+    # deviations of every dropped point from its final segment, in one pass
+    dropped = np.flatnonzero(~keep)
+    max_deviation = max_angle_deviation = 0.0
+    if len(dropped):
+        segment = np.searchsorted(indices, dropped) - 1
+        distance, rotation_error = _deviations(
+            translations, rotations, indices[segment], indices[segment + 1], dropped)
+        max_deviation = float(distance.max())
+        max_angle_deviation = float(rotation_error.max())
+
+    return SimplifiedPath(
+        indices=indices,
+        path=poses.CartesianPath(translations=translations[indices],
+                                 rotations=None if rotations is None else rotations[indices]),
+        reduction_ratio=n / len(indices),
+        max_deviation=max_deviation,
+        max_angle_deviation=max_angle_deviation)
+
+
+class PathSegment(tp.NamedTuple):
+    """ Line or arc of a fitted path, ending on the point `index` of the original path. """
+    activity: ActivityType = ActivityType.MOVELINE
+    index: int = 0
+    # arc only, centre x, y, z
+    centre: np.ndarray = None
+    direction: ArcDirection = None
+    # arc only, quaternion rotating the XY plane on the arc plane, None for arcs in XY
+    plane: np.ndarray = None
+
+
+class FittedPath(tp.NamedTuple):
+    """ Result of the fitting of arcs on a path. """
+    segments: tp.List[PathSegment] = None
+    # points given over segments, 10.0 means ten times less stream items
+    reduction_ratio: float = 1.0
+    # largest distance of a point of the original path from the segments
+    max_deviation: float = 0.0
+
+
+def _circle(p0: np.ndarray, p1: np.ndarray, p2: np.ndarray) -> tp.Tuple[np.ndarray, np.ndarray] | None:
+    """ Centre and unit normal of the circle through three points, None if collinear. """
+    a = p1 - p0
+    b = p2 - p0
+    axb = np.cross(a, b)
+    norm2 = axb @ axb
+    if norm2 < 1e-12 * (a @ a) * (b @ b):
+        return None
+    centre = p0 + (np.cross(axb, a) * (b @ b) + np.cross(b, axb) * (a @ a)) / (2 * norm2)
+    # turning from p0 to p1 is counterclockwise around the normal
+    return centre, axb / np.sqrt(norm2)
+
+
+def _arc_error(points: np.ndarray,
+               centre: np.ndarray,
+               normal: np.ndarray,
+               tolerance: float) -> tp.Tuple[float, np.ndarray] | None:
+    """
+    Largest distance of points from the arc through them, and the angle swept
+    at every point, None if the points do not go around the centre in one direction.
+    """
+    r = points - centre
+    radius = np.linalg.norm(r[0])
+    height = r @ normal
+    in_plane = r - height[:, None] * normal
+    distance = np.hypot(np.linalg.norm(in_plane, axis=1) - radius, height)
+    # angle of every point from the first one, counterclockwise around the normal
+    u = in_plane[0] / np.linalg.norm(in_plane[0])
+    v = np.cross(normal, u)
+    theta = np.unwrap(np.arctan2(in_plane @ v, in_plane @ u))
+    if np.any(np.diff(theta) < -tolerance / radius) or theta[-1] >= 2 * np.pi:
+        return None
+    return float(distance.max()), theta
+
+
+def fit_arcs(translations,
+             rotations=None,
+             tolerance: float = 0.1,
+             angle_tolerance: float = None) -> FittedPath:
+    """
+    Replace runs of a path lying on a circle by arcs, and the rest by lines.
+
+    The path is simplified first, see :func:`simplify`, then consecutive lines are
+    merged in an arc while every original point between them stays within
+    tolerance of the arc. Rotations are expected to be interpolated along the arc
+    with slerp, and checked against angle_tolerance if given.
+
+    Args:
+        translations: array of shape (N, 3), points of the path.
+        rotations: array of shape (N, 4), quaternion x, y, z, w of each point, optional.
+        tolerance: largest distance of the path from an original point.
+        angle_tolerance: largest rotation error of an original point, in radians.
+    """
+    simplified = simplify(translations, rotations,
+                          tolerance=tolerance, angle_tolerance=angle_tolerance)
+    translations = np.asarray(translations, dtype=float)
+    if rotations is not None:
+        rotations = poses.normalize(rotations)
+    vertices = simplified.indices
+    max_deviation = 0.0
+
+    def arc(i: int, j: int):
+        """ Arc through vertices i to j, with its error, None if out of tolerance. """
+        start, end = vertices[i], vertices[j]
+        circle = _circle(translations[start],
+                         translations[vertices[(i + j) // 2]],
+                         translations[end])
+        if circle is None:
+            return None
+        centre, normal = circle
+        fit = _arc_error(translations[start:end + 1], centre, normal, tolerance)
+        if fit is None or fit[0] > tolerance:
+            return None
+        if rotations is not None and angle_tolerance is not None:
+            theta = fit[1]
+            expected = poses.slerp(rotations[start], rotations[end], theta / theta[-1])
+            if np.max(poses.angle(rotations[start:end + 1], expected)) > angle_tolerance:
+                return None
+        return centre, normal, fit[0]
+
+    segments = []
+    i = 0
+    while i < len(vertices) - 1:
+        best = None
+        j = i + 2
+        while j < len(vertices):
+            candidate = arc(i, j)
+            if candidate is None:
+                break
+            best = (j, candidate)
+            j += 1
+        if best is None:
+            segments.append(PathSegment(activity=ActivityType.MOVELINE, index=int(vertices[i + 1])))
+            i += 1
+            continue
+        j, (centre, normal, error) = best
+        max_deviation = max(max_deviation, error)
+        if abs(normal @ _Z) > 1 - 1e-9:
+            direction = ArcDirection.CCW if normal[2] > 0 else ArcDirection.CW
+            plane = None
+        else:
+            # rotation of the z axis on the normal, the arc is counterclockwise in that plane
+            axis = np.cross(_Z, normal)
+            half = np.arccos(np.clip(normal @ _Z, -1.0, 1.0)) / 2
+            plane = np.append(axis / np.linalg.norm(axis) * np.sin(half), np.cos(half))
+            direction = ArcDirection.CCW
+        segments.append(PathSegment(activity=ActivityType.MOVEARC,
+                                    index=int(vertices[j]),
+                                    centre=centre,
+                                    direction=direction,
+                                    plane=plane))
+        i = j
+
+    # deviations of the points replaced by lines, in one pass
+    ends = np.array([s.index for s in segments])
+    starts = np.concatenate(([vertices[0]], ends[:-1]))
+    lines = np.array([s.activity == ActivityType.MOVELINE for s in segments])
+    inner = [np.arange(a + 1, b) for a, b in zip(starts[lines], ends[lines])]
+    if inner and sum(len(x) for x in inner):
+        counts = [len(x) for x in inner]
+        distance, _ = _deviations(translations, None,
+                                  np.repeat(starts[lines], counts),
+                                  np.repeat(ends[lines], counts),
+                                  np.concatenate(inner))
+        max_deviation = max(max_deviation, float(distance.max()))
+
+    # the first point is streamed as a line, then every segment
+    return FittedPath(segments=segments,
+                      reduction_ratio=len(translations) / (len(segments) + 1),
+                      max_deviation=max_deviation)
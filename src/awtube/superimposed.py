@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""
+    Real time Cartesian corrections superimposed on the running motion.
+
+    Offsets are sent as moveToPosition items with the MOVESUPERIMPOSED position
+    reference on their own stream, so the moves of the main stream keep running
+    while they are corrected, for seam tracking or force control. Corrections are
+    written on the socket as soon as they arrive, without waiting for completion,
+    and the latency from :meth:`OffsetStream.correct` to the socket is measured.
+
+    Example:
+
+    .. code-block:: python
+
+      offsets = robot.superimpose(rate=100)
+      robot.move_path(path.translations, path.rotations)
+
+      def on_seam(error_y: float):  # called by the sensor driver
+          offsets.correct({'x': 0, 'y': error_y, 'z': 0})
+
+      ...
+      offsets.close()
+      print(offsets.latency())
+"""
+
+from __future__ import annotations
+import asyncio
+import collections
+import logging
+import math
+import time
+import typing as tp
+
+from . import command_receiver, errors, templates, types
+
+_IDENTITY = {'x': 0.0, 'y': 0.0, 'z': 0.0, 'w': 1.0}
+
+
+class OffsetStream:
+    """
+    Stream of Cartesian offsets superimposed on the motion, corrections can be
+    given from any thread. The latest correction wins: the ones given faster
+    than the rate are merged, so the latency stays bounded by one period plus
+    the time to write on the socket.
+    """
+
+    def __init__(self,
+                 receiver: command_receiver.CommandReceiver,
+                 rate: float = 250,
+                 stream_index: int = 1,
+                 max_offset: float = None,
+                 kc: int = 0,
+                 move_params: types.MoveParametersConfig = None,
+                 samples: int = 10000):
+        """
+        Args:
+            receiver: where the offsets are sent.
+            rate: most offsets sent per second.
+            stream_index: stream the offsets are sent on, not the stream of the main motion.
+            max_offset: largest norm of a translation offset in mm, unbounded if None.
+            kc: kinematics configuration index.
+            move_params: move parameters of the offsets.
+            samples: number of latest latencies kept.
+        """
+        if rate <= 0:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'Rate should be positive.')
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._receiver = receiver
+        self._period = 1 / rate
+        self._max_offset = max_offset
+        self._move_params = None if move_params is None else move_params.to_dict()
+        self._template = templates.move_to_position(stream_index, kc, types.PositionReference.MOVESUPERIMPOSED)
+        # (translation, rotation, perf_counter time of the correction), replaced as a whole
+        self._correction: tp.Tuple[dict, dict, float] | None = None
+        self._sent = None
+        self._tag = 0
+        self._closed = False
+        self._loop: asyncio.AbstractEventLoop = None
+        self._wakeup: asyncio.Event = None
+        self._latencies = collections.deque(maxlen=samples)
+        # corrections replaced by a newer one before being sent
+        self.merged = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def correct(self,
+                translation: tp.Dict[str, float],
+                rotation: tp.Dict[str, float] = None):
+        """ Set the offset superimposed on the motion, thread safe.
+
+        Args:
+            translation: offset x, y, z in mm.
+            rotation: rotation offset as a quaternion x, y, z, w, no rotation if None.
+        """
+        if self._closed:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT, 'Offset stream is closed.')
+        if self._max_offset is not None and \
+                math.hypot(translation['x'], translation['y'], translation['z']) > self._max_offset:
+            raise errors.AWTubeErrorException(
+                errors.AwtubeError.BAD_ARGUMENT,
+                f'Offset larger than {self._max_offset} mm: {translation}.')
+        if self._correction is not None and self._correction is not self._sent:
+            self.merged += 1
+        self._correction = (translation, rotation or _IDENTITY, time.perf_counter())
+        self._wake()
+
+    def close(self):
+        """ Stop sending offsets, the last one sent stays applied. """
+        self._closed = True
+        self._wake()
+
+    def latency(self) -> types.LatencyStats:
+        """ Latency from the corrections to the socket, of the latest corrections sent. """
+        return types.LatencyStats.from_samples(self._latencies)
+
+    def _wake(self):
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _message(self, translation: dict, rotation: dict) -> str:
+        self._tag += 1
+        return self._template.render(self._tag, self._move_params,
+                                     translation['x'], translation['y'], translation['z'],
+                                     rotation['x'], rotation['y'], rotation['z'], rotation['w'])
+
+    async def run(self):
+        """ Send every new correction as soon as it is given, at most once per period. """
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        last = -math.inf
+        try:
+            while not self._closed:
+                if self._correction is self._sent:
+                    await self._wakeup.wait()
+                    self._wakeup.clear()
+                    continue
+                wait = last + self._period - self._loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                correction = self._correction
+                self._sent = correction
+                await self._receiver.send(self._message(correction[0], correction[1]))
+                self._latencies.append(time.perf_counter() - correction[2])
+                last = self._loop.time()
+        finally:
+            self._closed = True
+            self._loop = None
@@ -6,13 +6,12 @@ using TWrapperResult, also they chain these running tasks with futures which can
 be used to await, check running or cancel these tasks.
 """
 
+from __future__ import annotations
 from abc import ABC, abstractmethod
 import asyncio
 from enum import IntEnum
 from contextlib import suppress
 
-from awtube.threadloop import threadloop
-
 
 # TODO: test if the stoping functionality for these tasks is working as expected
 
@@ -35,7 +34,14 @@ class TWrapper(ABC):
     args = None
     is_started = False
     _task = None
-    _future = asyncio.Future(loop=threadloop.loop)
+    _result_future = None
+
+    @property
+    def _future(self) -> asyncio.Future:
+        """ Future of the result, created on the running loop the first time it is needed. """
+        if self._result_future is None:
+            self._result_future = asyncio.get_running_loop().create_future()
+        return self._result_future
 
     def is_running(self):
         return not self._future.done()
@@ -43,11 +49,39 @@ class TWrapper(ABC):
     def __await__(self):
         return self._future.__await__()
 
+    def done(self) -> bool:
+        return self._future.done()
+
+    def complete(self, result=None):
+        """ Set the result without running the task, e.g. when it would have no effect. """
+        if not self._future.done():
+            self._future.set_result(result)
+
+    def follow(self, other: TWrapper):
+        """ Complete with the outcome of `other`, the task replacing this one. """
+        other._future.add_done_callback(self._settle)
+
+    def _settle(self, future: asyncio.Future):
+        if self._future.done():
+            return
+        if future.cancelled():
+            self._future.cancel()
+        elif future.exception() is not None:
+            self._future.set_exception(future.exception())
+        else:
+            self._future.set_result(future.result())
+
     async def start(self):
         """ Start task to call coro """
         if not self.is_started:
             self.is_started = True
             self._task = asyncio.create_task(self._main())
+            # cancelling the future, also by cancelling who awaits it, stops the task
+            self._future.add_done_callback(self._on_future_done)
+
+    def _on_future_done(self, future: asyncio.Future):
+        if future.cancelled() and self._task is not None:
+            self._task.cancel()
 
     async def stop(self):
         """ Stop task and await it stopped """
@@ -62,9 +96,11 @@ class TWrapper(ABC):
     async def _main(self):
         try:
             result = await self._run()
-            self._future.set_result(result)
+            if not self._future.done():
+                self._future.set_result(result)
         except asyncio.CancelledError:
-            await self.stop()
+            self.is_started = False
+            self._future.cancel()
             raise
 
     @abstractmethod
@@ -79,7 +115,6 @@ class OneTimeTask(TWrapper):
         self.coro_callback = coro_callback
         self.args = args
         self.is_started = False
-        self._future = asyncio.Future(loop=threadloop.loop)
 
     async def _run(self):
         res = await self.coro_callback(self.args)
@@ -93,7 +128,6 @@ class PeriodicTask(TWrapper):
         self.coro_callback = coro_callback
         self.args = args
         self.sleep_time = sleep_time
-        self._future = asyncio.Future(loop=threadloop.loop)
 
     async def _run(self):
         res = TWrapperResult.RUNNING
@@ -107,7 +141,6 @@ class PeriodicUntilDoneTask(PeriodicTask):
     """ Runs until result is success or failure"""
 
     def __init__(self, coro_callback, args, sleep_time):
-        self._future = asyncio.Future(loop=threadloop.loop)
         super().__init__(coro_callback, args, sleep_time)
 
     async def _run(self):
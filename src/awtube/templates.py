@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+
+"""
+    Precompiled message templates.
+
+    The shape of a message, its keys and its constant values such as the machine,
+    kinematics configuration or stream index, is rendered to JSON once and cached.
+    Sending a message then only renders its variable slots, the output is byte
+    identical to the one of the builders.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube import templates
+
+      msg = templates.heartbeat(machine=0).render(1234)
+      # '{"command":{"machine":{"0":{"command":{"heartbeat":1234}}}}}'
+
+      item = templates.move_joints_interpolated(stream_index=0, kc=0)
+      msg = item.render(tag, {}, 0.1, positions, velocities)
+"""
+
+from __future__ import annotations
+import functools
+import typing as tp
+from pydantic_core import to_json
+
+from .types import ActivityType, ArcType, PositionReference
+
+try:
+    # GBC has no inf and nan, rendered null as in the models
+    _to_json = functools.partial(to_json, inf_nan_mode='null')
+    _to_json(0.0)
+except TypeError:
+    # older pydantic_core, inf and nan are always rendered null
+    _to_json = to_json
+
+
+def is_stream_item(message: str) -> bool:
+    """ True if message is a stream item, as rendered by the templates or the builders. """
+    return message.startswith('{"stream":')
+
+
+def dumps(value: tp.Any) -> str:
+    """ Render a value to compact JSON, with the serializer of pydantic so byte identical to the builders. """
+    return _to_json(value).decode()
+
+
+def real(value: float) -> str:
+    """ Render a float. """
+    return _to_json(float(value)).decode()
+
+
+def integer(value: int) -> str:
+    """ Render an int. """
+    return int.__repr__(int(value))
+
+
+def flag(value: bool) -> str:
+    """ Render a bool. """
+    return 'true' if value else 'false'
+
+
+def array(values: tp.Iterable) -> str:
+    """ Render a list of numbers, joint arrays given as numpy arrays or generators included. """
+    if hasattr(values, 'tolist'):
+        values = values.tolist()
+    elif not isinstance(values, (list, tuple)):
+        values = list(values)
+    return _to_json(values).decode()
+
+
+class Slot:
+    """ Variable part of a template, rendered with `render` on every call. """
+    __slots__ = ('render',)
+
+    def __init__(self, render: tp.Callable[[tp.Any], str] = dumps):
+        self.render = render
+
+
+class Template:
+    """ Message rendered once with its slots left open, filled in order by :meth:`render`. """
+    __slots__ = ('_format', '_renders')
+
+    def __init__(self, message: dict):
+        parts = []
+        renders = []
+        self._compile(message, parts, renders)
+        self._format = ''.join(parts)
+        self._renders = tuple(renders)
+
+    def _compile(self, value: tp.Any, parts: list, renders: list):
+        if isinstance(value, Slot):
+            parts.append('%s')
+            renders.append(value.render)
+        elif isinstance(value, dict):
+            parts.append('{')
+            for i, (key, item) in enumerate(value.items()):
+                if i:
+                    parts.append(',')
+                parts.append(dumps(str(key)).replace('%', '%%') + ':')
+                self._compile(item, parts, renders)
+            parts.append('}')
+        elif isinstance(value, (list, tuple)):
+            parts.append('[')
+            for i, item in enumerate(value):
+                if i:
+                    parts.append(',')
+                self._compile(item, parts, renders)
+            parts.append(']')
+        else:
+            parts.append(dumps(value).replace('%', '%%'))
+
+    @property
+    def slots(self) -> int:
+        """ Number of values expected by :meth:`render`. """
+        return len(self._renders)
+
+    def render(self, *values) -> str:
+        """ Return the message with the slots filled with `values`, in order. """
+        return self._format % tuple([render(value) for render, value in zip(self._renders, values)])
+
+    def partial(self, *values) -> Template:
+        """ Return the template with its last slots filled with `values`, the leading
+            slots not given stay open, e.g. the tag of a stream item. """
+        opened = len(self._renders) - len(values)
+        if opened < 0:
+            raise ValueError(f'Template has {len(self._renders)} slots, {len(values)} values given.')
+        filled = [render(value).replace('%', '%%')
+                  for render, value in zip(self._renders[opened:], values)]
+        return Template.from_format(self._format % (('%s',) * opened + tuple(filled)),
+                                    self._renders[:opened])
+
+    @property
+    def format(self) -> str:
+        """ The rendered message, with %s in place of the slots. """
+        return self._format
+
+    @classmethod
+    def from_format(cls, format: str, renders: tp.Sequence[tp.Callable[[tp.Any], str]]) -> Template:
+        """ Return the template of a message already rendered with %s in place of the slots. """
+        template = cls.__new__(cls)
+        template._format = format
+        template._renders = tuple(renders)
+        return template
+
+
+def _command(command: dict) -> Template:
+    return Template({"command": command})
+
+
+def _stream(stream_index: int, item: dict) -> Template:
+    return Template({"stream": {
+        "streamIndex": stream_index,
+        "items": [item],
+        "name": "default",
+        "enableEndProgram": False}})
+
+
+def _translation() -> dict:
+    return {"x": Slot(real), "y": Slot(real), "z": Slot(real)}
+
+
+def _rotation() -> dict:
+    return {"x": Slot(real), "y": Slot(real), "z": Slot(real), "w": Slot(real)}
+
+
+# stream commands
+
+@functools.lru_cache(maxsize=None)
+def heartbeat(machine: int = 0) -> Template:
+    """ Slots: heartbeat. """
+    return _command({"machine": {f"{machine}": {"command": {"heartbeat": Slot()}}}})
+
+
+@functools.lru_cache(maxsize=None)
+def control_word(machine: int = 0) -> Template:
+    """ Slots: control word. """
+    return _command({"machine": {f"{machine}": {"command": {"controlWord": Slot(integer)}}}})
+
+
+@functools.lru_cache(maxsize=None)
+def machine_target(machine: int = 0) -> Template:
+    """ Slots: target. """
+    return _command({"machine": {f"{machine}": {"command": {"target": Slot(integer)}}}})
+
+
+@functools.lru_cache(maxsize=None)
+def desired_feedrate(kc: int = 0) -> Template:
+    """ Slots: feed rate override. """
+    return _command({"kinematicsConfiguration": {f"{kc}": {"command": {"fro": Slot()}}}})
+
+
+@functools.lru_cache(maxsize=None)
+def disable_limits(kc: int = 0) -> Template:
+    """ Slots: limits disabled flag. """
+    return _command({"kinematicsConfiguration": {f"{kc}": {"command": {"disableLimits": Slot(flag)}}}})
+
+
+@functools.lru_cache(maxsize=None)
+def stream_command() -> Template:
+    """ Slots: stream command type. """
+    return _command({"stream": {"0": {"command": {"streamCommand": Slot(integer)}}}})
+
+
+@functools.lru_cache(maxsize=None)
+def output(kind: str, position: int) -> Template:
+    """ Set value of an output, `kind` being dout, aout or iout. Slots: value, override. """
+    return _command({kind: {f"{position}": {"command": {"setValue": Slot(), "override": Slot()}}}})
+
+
+@functools.lru_cache(maxsize=None)
+def serial(position: int = 0) -> Template:
+    """ Slots: control word, length, data. """
+    return _command({"serial": {f"{position}": {"command": {
+        "controlWord": Slot(), "length": Slot(integer), "data": Slot(array)}}}})
+
+
+# stream items
+
+@functools.lru_cache(maxsize=None)
+def move_joints(stream_index: int = 0, kc: int = 0) -> Template:
+    """ Slots: tag, move params, positions. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.MOVEJOINTS),
+        "tag": Slot(),
+        "moveJoints": {
+            "moveParams": Slot(),
+            "kinematicsConfigurationIndex": kc,
+            "jointPositionArray": Slot(array)}})
+
+
+@functools.lru_cache(maxsize=None)
+def move_joints_interpolated(stream_index: int = 0, kc: int = 0) -> Template:
+    """ Slots: tag, move params, duration, positions, velocities. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.MOVEJOINTSINTERPOLATED),
+        "tag": Slot(),
+        "moveJointsInterpolated": {
+            "moveParams": Slot(),
+            "kinematicsConfigurationIndex": kc,
+            "duration": Slot(),
+            "jointPositionArray": Slot(array),
+            "jointVelocityArray": Slot(array)}})
+
+
+@functools.lru_cache(maxsize=None)
+def move_line(stream_index: int = 0, kc: int = 0) -> Template:
+    """ Slots: tag, move params, translation x, y, z, rotation x, y, z, w. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.MOVELINE),
+        "tag": Slot(),
+        "moveLine": {
+            "moveParams": Slot(),
+            "kinematicsConfigurationIndex": kc,
+            "line": {
+                "translation": _translation(),
+                "rotation": _rotation()}}})
+
+
+@functools.lru_cache(maxsize=None)
+def move_to_position(stream_index: int = 0,
+                     kc: int = 0,
+                     position_reference: PositionReference = PositionReference.ABSOLUTE) -> Template:
+    """ Slots: tag, move params, translation x, y, z, rotation x, y, z, w. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.MOVETOPOSITION),
+        "tag": Slot(),
+        "moveToPosition": {
+            "moveParams": Slot(),
+            "kinematicsConfigurationIndex": kc,
+            "cartesianPosition": {
+                "position": {
+                    "translation": _translation(),
+                    "rotation": _rotation(),
+                    "positionReference": int(position_reference)},
+                "configuration": 0}}})
+
+
+@functools.lru_cache(maxsize=None)
+def move_arc(stream_index: int = 0, kc: int = 0, plane: bool = False) -> Template:
+    """ Slots: tag, move params, direction, translation x, y, z, rotation x, y, z, w,
+        centre x, y, z, then plane x, y, z, w if `plane`. """
+    move = {
+        "moveParams": Slot(),
+        "kinematicsConfigurationIndex": kc,
+        "arcType": int(ArcType.CENTRE),
+        "arcDirection": Slot(integer),
+        "destination": {
+            "position": {
+                "translation": _translation(),
+                "rotation": _rotation(),
+                "positionReference": int(PositionReference.ABSOLUTE)},
+            "configuration": 0},
+        "centre": {
+            "translation": _translation(),
+            "positionReference": int(PositionReference.ABSOLUTE)}}
+    if plane:
+        move["plane"] = _rotation()
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.MOVEARC),
+        "tag": Slot(),
+        "moveArc": move})
+
+
+@functools.lru_cache(maxsize=None)
+def set_dout(stream_index: int = 0) -> Template:
+    """ Slots: tag, position, value. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.SETDOUT),
+        "tag": Slot(),
+        "setDout": {"doutToSet": Slot(), "valueToSet": Slot(flag)}})
+
+
+@functools.lru_cache(maxsize=None)
+def set_aout(stream_index: int = 0) -> Template:
+    """ Slots: tag, position, value. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.SETAOUT),
+        "tag": Slot(),
+        "setAout": {"aoutToSet": Slot(), "valueToSet": Slot(real)}})
+
+
+@functools.lru_cache(maxsize=None)
+def set_iout(stream_index: int = 0) -> Template:
+    """ Slots: tag, position, value. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.SETIOUT),
+        "tag": Slot(),
+        "setIout": {"ioutToSet": Slot(), "valueToSet": Slot(integer)}})
+
+
+@functools.lru_cache(maxsize=None)
+def dwell(stream_index: int = 0) -> Template:
+    """ Slots: tag, milliseconds. """
+    return _stream(stream_index, {
+        "activityType": int(ActivityType.DWELL),
+        "tag": Slot(),
+        "dwell": {"msToDwell": Slot(integer)}})
+
+
+# solo activities
+
+@functools.lru_cache(maxsize=None)
+def solo_move_joints_at_velocity(index: int = 0, kc: int = 0) -> Template:
+    """ Slots: tag, move params, velocities. """
+    return _command({"soloActivity": {f"{index}": {"command": {
+        "activityType": int(ActivityType.MOVEJOINTSATVELOCITY),
+        "tag": Slot(),
+        "moveJointsAtVelocity": {
+            "moveParams": Slot(),
+            "kinematicsConfigurationIndex": kc,
+            "jointVelocityArray": Slot(array)}}}}})
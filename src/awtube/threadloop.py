@@ -6,25 +6,43 @@ It also handles exceptions raised all over the system.
 """
 
 from concurrent.futures import CancelledError
+from enum import Enum
 import logging
 import asyncio
 import queue
-import time
 import typing
-import websockets
-from threading import Thread, Condition
+import websockets.exceptions
+from threading import Thread, Condition, get_ident
 
 from . import errors
 
 
+class ExceptionPolicy(Enum):
+    """ What the threadloop does with an exception registered. """
+    LOG = 0
+    STOP = 1
+    RECONNECT = 2
+
+
 class ThreadLoop(Thread):
     def __init__(self):
         Thread.__init__(self)
         self._logger = logging.getLogger(self.__class__.__name__)
         self.daemon = True
         self.loop = None
+        # exceptions registered before the loop runs, handled once it does
         self._exception_queue = queue.Queue()
         self._cond = Condition()
+        # policy of each exception type, looked up along the mro, LOG if none
+        self.policies: typing.Dict[type, ExceptionPolicy] = {
+            ConnectionRefusedError: ExceptionPolicy.STOP,
+            KeyboardInterrupt: ExceptionPolicy.STOP,
+            websockets.exceptions.WebSocketException: ExceptionPolicy.STOP,
+        }
+        # called on the loop after reconnect_delay for the exceptions with policy RECONNECT
+        self._reconnect_handlers: typing.List[typing.Callable[[], None]] = []
+        self.reconnect_delay: float = 1.0
+        self._stopping = None
 
     def start(self):
         with self._cond:
@@ -34,36 +52,62 @@ class ThreadLoop(Thread):
     def run(self):
         self.loop = asyncio.new_event_loop()
         self._logger.debug("Created %s", self.loop)
-        self.loop.call_soon_threadsafe(self._notify_start)
-        asyncio.run_coroutine_threadsafe(
-            self._handle_exceptions(), loop=self.loop)
-        self.loop.run_forever()
-
-    async def _handle_exceptions(self):
-        def log_err(e): return self._logger.error('%s: %s', type(e), e)
-        while True:
-            if not self._exception_queue.empty():
-                exc = self._exception_queue.get(block=False)
-                if isinstance(exc, ConnectionRefusedError):
-                    log_err(exc)
-                    self.stop()
-                elif isinstance(exc, KeyboardInterrupt):
-                    log_err(exc)
-                    self.stop()
-                elif isinstance(exc, websockets.exceptions.WebSocketException):
-                    log_err(exc)
-                    self.stop()
-                else:
-                    log_err(exc)
-
-            await asyncio.sleep(2)
+        self.loop.call_soon(self._notify_start)
+        self.loop.call_soon(self._handle_queued_exceptions)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+            self._logger.debug("Stopped.")
+
+    def set_policy(self, exc_type: type, policy: ExceptionPolicy):
+        """ Set what to do with the exceptions of type exc_type and its subclasses. """
+        self.policies[exc_type] = policy
+
+    def policy(self, exc: BaseException) -> ExceptionPolicy:
+        for cls in type(exc).__mro__:
+            if cls in self.policies:
+                return self.policies[cls]
+        return ExceptionPolicy.LOG
+
+    def add_reconnect_handler(self, handler: typing.Callable[[], None]):
+        """ Call handler on the loop when an exception with policy RECONNECT is registered. """
+        if handler not in self._reconnect_handlers:
+            self._reconnect_handlers.append(handler)
+
+    def remove_reconnect_handler(self, handler: typing.Callable[[], None]):
+        if handler in self._reconnect_handlers:
+            self._reconnect_handlers.remove(handler)
+
+    def _handle_queued_exceptions(self):
+        while not self._exception_queue.empty():
+            self._handle_exception(self._exception_queue.get(block=False))
+
+    def _handle_exception(self, exc: BaseException):
+        """ Apply the policy of exc, on the loop. """
+        self._logger.error('%s: %s', type(exc), exc)
+        policy = self.policy(exc)
+        if policy is ExceptionPolicy.STOP:
+            self.stop()
+        elif policy is ExceptionPolicy.RECONNECT:
+            for handler in list(self._reconnect_handlers):
+                self.loop.call_later(self.reconnect_delay, handler)
 
     def register_exception(self, exc):
-        """ Register exceptions which the threadloop needs to handle """
-        self._exception_queue.put(exc)
+        """ Register exceptions which the threadloop needs to handle, from any thread.
+            They are handled on the next iteration of the loop, or once it runs. """
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            self._exception_queue.put(exc)
+            return
+        try:
+            loop.call_soon_threadsafe(self._handle_exception, exc)
+        except RuntimeError:
+            # closed meanwhile
+            self._exception_queue.put(exc)
 
     async def cancel_tasks(self):
-        """ Cancel tasks and stop loop, must be called threadsafe """
+        """ Cancel tasks and wait for them to finish, must be called threadsafe """
         tasks = [
             task
             for task in asyncio.all_tasks()
@@ -71,20 +115,28 @@ class ThreadLoop(Thread):
         ]
         for task in tasks:
             task.cancel()
-        await asyncio.gather(*tasks, return_exceptions=False)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _shutdown(self):
+        try:
+            await self.cancel_tasks()
+        finally:
+            self.loop.stop()
 
     def _notify_start(self):
         with self._cond:
             self._cond.notify_all()
 
     def stop(self):
-        " Stop event loop and join thread. "
-        asyncio.run_coroutine_threadsafe(self.cancel_tasks(), loop=self.loop)
-        time.sleep(0.5)
-        self.loop.call_soon_threadsafe(self.loop.stop)
+        " Cancel the tasks, once they are done stop event loop and join thread. "
+        if self.loop is None or self.loop.is_closed():
+            return
+        if self._stopping is None:
+            self._stopping = asyncio.run_coroutine_threadsafe(self._shutdown(), loop=self.loop)
+        if get_ident() == self.ident:
+            # from the loop, it stops once the tasks are cancelled
+            return
         self.join()
-        self.loop.close()
-        self._logger.debug("Stopped.")
 
     def post(self, coro):
         """ Post asyncio coroutine into the threadloop. """
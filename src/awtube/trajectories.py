@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+
+"""
+    Spline fitting and resampling of joint trajectories.
+
+    Sparse, timestamped waypoints are fitted with a piecewise cubic or quintic
+    polynomial and sampled at a fixed period, which is the duration sent with
+    every moveJointsInterpolated item.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube import trajectories
+
+      traj = trajectories.resample(waypoints, timestamps, period=0.02, order=5)
+      robot.move_joints_interpolated(traj, duration=traj.period)
+"""
+
+from __future__ import annotations
+import typing as tp
+import numpy as np
+
+from awtube.types import JointStates
+import awtube.errors as errors
+
+
+class Trajectory(tp.NamedTuple):
+    """ Joint positions and velocities sampled every `period` seconds, the last
+        sample possibly sooner, see `durations`. """
+    positions: np.ndarray = None
+    velocities: np.ndarray = None
+    period: float = 0.1
+    # time to reach each sample from the previous one, `period` for all if None
+    durations: np.ndarray = None
+
+    def joint_states(self) -> tp.List[JointStates]:
+        """ Return the samples as JointStates, as expected by move_joints_interpolated. """
+        return [JointStates(positions=p, velocities=v)
+                for p, v in zip(self.positions.tolist(), self.velocities.tolist())]
+
+
+class Spline:
+    """
+    Piecewise polynomial through timestamped waypoints.
+    Segment i spans [timestamps[i], timestamps[i+1]] and holds, for every joint,
+    the coefficients of a polynomial in local time, in ascending powers.
+    """
+
+    def __init__(self, timestamps: np.ndarray, coefficients: np.ndarray):
+        self.timestamps = timestamps
+        # shape (segments, order + 1, joints)
+        self.coefficients = coefficients
+
+    @property
+    def order(self) -> int:
+        return self.coefficients.shape[1] - 1
+
+    @property
+    def start(self) -> float:
+        return float(self.timestamps[0])
+
+    @property
+    def end(self) -> float:
+        return float(self.timestamps[-1])
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+    def segment_index(self, times: np.ndarray) -> np.ndarray:
+        """ Return the index of the segment each time falls in. """
+        idx = np.searchsorted(self.timestamps, times, side='right') - 1
+        return np.clip(idx, 0, len(self.timestamps) - 2)
+
+    def derivative_coefficients(self, derivative: int = 0) -> np.ndarray:
+        """ Return the coefficients of the given derivative of every segment. """
+        coef = self.coefficients
+        for _ in range(derivative):
+            if coef.shape[1] == 1:
+                return np.zeros_like(coef)
+            coef = coef[:, 1:, :] * \
+                np.arange(1, coef.shape[1], dtype=float)[None, :, None]
+        return coef
+
+    def evaluate_segments(self, fractions, derivative: int = 0) -> np.ndarray:
+        """
+        Evaluate every segment at the same fractions (0 to 1) of its duration,
+        returns an array of shape (segments, fractions, joints).
+        """
+        tau = np.diff(self.timestamps)[:, None] * \
+            np.asarray(fractions, dtype=float)[None, :]
+        coef = self.derivative_coefficients(derivative)
+        result = np.broadcast_to(coef[:, -1, None, :],
+                                 tau.shape + coef.shape[2:])
+        for k in range(coef.shape[1] - 2, -1, -1):
+            result = result * tau[:, :, None] + coef[:, k, None, :]
+        return result
+
+    def evaluate(self, times, derivative: int = 0) -> np.ndarray:
+        """
+        Evaluate the spline, or one of its derivatives, at the given times.
+        Times outside of the spline are clamped to its ends.
+        """
+        times = np.clip(np.asarray(times, dtype=float), self.start, self.end)
+        idx = self.segment_index(times)
+        tau = (times - self.timestamps[idx])[:, None]
+        coef = self.derivative_coefficients(derivative)
+        # Horner, gathering one coefficient column at a time to keep memory linear
+        result = coef[idx, -1, :]
+        for k in range(coef.shape[1] - 2, -1, -1):
+            result = result * tau + coef[idx, k, :]
+        return result
+
+
+def _check_waypoints(positions, timestamps) -> tp.Tuple[np.ndarray, np.ndarray]:
+    positions = np.asarray(positions, dtype=float)
+    timestamps = np.asarray(timestamps, dtype=float)
+    if positions.ndim == 1:
+        positions = positions[:, None]
+    if positions.ndim != 2 or len(positions) != len(timestamps):
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT,
+            'Positions should have shape (waypoints, joints) matching timestamps.')
+    if len(timestamps) < 2:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'At least two waypoints are needed.')
+    if np.any(np.diff(timestamps) <= 0):
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'Timestamps should be strictly increasing.')
+    return positions, timestamps
+
+
+def _knot_velocities(positions: np.ndarray, h: np.ndarray) -> np.ndarray:
+    """
+    Solve the tridiagonal system giving a C2 cubic spline,
+    clamped with zero velocity at both ends (Thomas algorithm, vectorized over joints).
+    """
+    n = len(positions)
+    v = np.zeros_like(positions)
+    if n < 3:
+        return v
+    d = np.diff(positions, axis=0) / h[:, None]
+    # unknowns are the interior velocities v[1:-1]
+    lower = h[2:]
+    diag = 2 * (h[:-1] + h[1:])
+    upper = h[:-2]
+    rhs = 3 * (h[1:, None] * d[:-1] + h[:-1, None] * d[1:])
+    m = n - 2
+    c = np.empty(m)
+    r = np.empty((m, positions.shape[1]))
+    c[0] = upper[0] / diag[0] if m > 1 else 0.0
+    r[0] = rhs[0] / diag[0]
+    for i in range(1, m):
+        denom = diag[i] - lower[i - 1] * c[i - 1]
+        c[i] = upper[i] / denom if i < m - 1 else 0.0
+        r[i] = (rhs[i] - lower[i - 1] * r[i - 1]) / denom
+    for i in range(m - 2, -1, -1):
+        r[i] -= c[i] * r[i + 1]
+    v[1:-1] = r
+    return v
+
+
+def _cubic_coefficients(positions, velocities, h) -> np.ndarray:
+    hh = h[:, None]
+    d = np.diff(positions, axis=0) / hh
+    v0, v1 = velocities[:-1], velocities[1:]
+    return np.stack([positions[:-1],
+                     v0,
+                     (3 * d - 2 * v0 - v1) / hh,
+                     (v0 + v1 - 2 * d) / hh**2], axis=1)
+
+
+def _quintic_coefficients(positions, velocities, accelerations, h) -> np.ndarray:
+    hh = h[:, None]
+    delta = np.diff(positions, axis=0)
+    v0, v1 = velocities[:-1], velocities[1:]
+    a0, a1 = accelerations[:-1], accelerations[1:]
+    return np.stack([positions[:-1],
+                     v0,
+                     a0 / 2,
+                     (20 * delta - (8 * v1 + 12 * v0) * hh -
+                      (3 * a0 - a1) * hh**2) / (2 * hh**3),
+                     (-30 * delta + (14 * v1 + 16 * v0) * hh +
+                      (3 * a0 - 2 * a1) * hh**2) / (2 * hh**4),
+                     (12 * delta - 6 * (v1 + v0) * hh +
+                      (a1 - a0) * hh**2) / (2 * hh**5)], axis=1)
+
+
+def fit_cubic(positions, timestamps) -> Spline:
+    """ Fit a C2 cubic spline through the waypoints, starting and ending at rest. """
+    positions, timestamps = _check_waypoints(positions, timestamps)
+    h = np.diff(timestamps)
+    velocities = _knot_velocities(positions, h)
+    return Spline(timestamps, _cubic_coefficients(positions, velocities, h))
+
+
+def fit_quintic(positions, timestamps) -> Spline:
+    """
+    Fit a quintic spline through the waypoints. Knot velocities and accelerations
+    are taken from the cubic spline, except at the ends where both are zero,
+    so the motion also starts and ends without an acceleration step.
+    """
+    positions, timestamps = _check_waypoints(positions, timestamps)
+    h = np.diff(timestamps)
+    velocities = _knot_velocities(positions, h)
+    cubic = _cubic_coefficients(positions, velocities, h)
+    accelerations = np.zeros_like(positions)
+    accelerations[1:-1] = 2 * cubic[1:, 2]
+    return Spline(timestamps,
+                  _quintic_coefficients(positions, velocities, accelerations, h))
+
+
+def fit(positions, timestamps, order: int = 3) -> Spline:
+    """ Fit a cubic (order=3) or quintic (order=5) spline through the waypoints. """
+    if order == 3:
+        return fit_cubic(positions, timestamps)
+    if order == 5:
+        return fit_quintic(positions, timestamps)
+    raise errors.AWTubeErrorException(
+        errors.AwtubeError.BAD_ARGUMENT, 'Spline order should be 3 or 5.')
+
+
+def sample(spline: Spline, period: float = 0.1) -> Trajectory:
+    """
+    Sample a spline every `period` seconds, starting one period after its start.
+    The last sample is the final waypoint, reached in what is left of the spline
+    duration when it is not a multiple of `period`, as given by `durations`.
+    """
+    if period <= 0:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'Period should be positive.')
+    count = max(int(np.ceil(spline.duration / period - 1e-9)), 1)
+    times = spline.start + period * np.arange(1, count + 1)
+    times[-1] = spline.end
+    # exactly `period` but for the last, as sent in the items
+    durations = np.full(count, float(period))
+    last = spline.end - (spline.start + period * (count - 1))
+    if not np.isclose(last, period, rtol=0, atol=1e-9):
+        durations[-1] = last
+    return Trajectory(positions=spline.evaluate(times),
+                      velocities=spline.evaluate(times, derivative=1),
+                      period=period,
+                      durations=durations)
+
+
+def resample(positions, timestamps, period: float = 0.1, order: int = 3) -> Trajectory:
+    """
+    Fit a spline through timestamped waypoints and sample it at a fixed period.
+
+    Args:
+        positions: waypoints, shape (waypoints, joints), in radians.
+        timestamps: time of each waypoint in seconds, strictly increasing.
+        period: time between two samples, sent as the duration of each item.
+        order: 3 for cubic or 5 for quintic splines.
+    """
+    return sample(fit(positions, timestamps, order=order), period=period)
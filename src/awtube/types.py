@@ -5,7 +5,7 @@
 from awtube.errors import OperationError
 from enum import IntEnum
 import typing as tp
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 """ Here are utility types used in the context of the robot, their
     scope is to aid working with the class awtube.
@@ -37,6 +37,37 @@ class Pose(tp.NamedTuple):
     orientation: Quaternion = None
 
 
+class JointLimits(tp.NamedTuple):
+    """ Per joint limits, in rad, rad/s, rad/s^2 and rad/s^3. """
+    positions_min: tp.List[float] = None
+    positions_max: tp.List[float] = None
+    velocities: tp.List[float] = None
+    accelerations: tp.List[float] = None
+    jerks: tp.List[float] = None
+    # largest position change between two consecutive points of a trajectory
+    steps: tp.List[float] = None
+
+
+class LatencyStats(tp.NamedTuple):
+    """ Summary of latency samples, in seconds. """
+    count: int = 0
+    mean: float = 0.0
+    p50: float = 0.0
+    p99: float = 0.0
+    max: float = 0.0
+
+    @classmethod
+    def from_samples(cls, samples: tp.Iterable[float]) -> 'LatencyStats':
+        ordered = sorted(samples)
+        if not ordered:
+            return cls()
+        return cls(count=len(ordered),
+                   mean=sum(ordered) / len(ordered),
+                   p50=ordered[(len(ordered) - 1) // 2],
+                   p99=ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))],
+                   max=ordered[-1])
+
+
 """ Contains result types for functions. """
 
 
@@ -81,6 +112,49 @@ class SyncType(IntEnum):
     AT_TICK = 2
 
 
+class ArcType(IntEnum):
+    # Arc defined by its centre
+    CENTRE = 0
+    # Arc defined by its radius
+    RADIUS = 1
+
+
+class ArcDirection(IntEnum):
+    # Clockwise
+    CW = 0
+    # Counterclockwise
+    CCW = 1
+
+
+class MoveParametersConfig(BaseModel):
+    """ Move parameters sent with every move, fields left to None are not sent. """
+    model_config = ConfigDict(populate_by_name=True)
+
+    # Percentage of the maximum acceleration
+    amax_percentage: float = Field(None, alias='amaxPercentage')
+    # Percentage of the move duration used to blend with the next one
+    blend_time_percentage: float = Field(None, alias='blendTimePercentage')
+    # Largest deviation from the programmed corner while blending
+    blend_tolerance: float = Field(None, alias='blendTolerance')
+    blend_type: BlendType = Field(None, alias='blendType')
+    # Percentage of the maximum jerk
+    jmax_percentage: float = Field(None, alias='jmaxPercentage')
+    # Linear and angular limit profile to use for move
+    limit_configuration_index: int = Field(
+        None, alias='limitConfigurationIndex')
+    name: str = Field(None)
+    sync_type: SyncType = Field(None, alias='syncType')
+    sync_value: float = Field(None, alias='syncValue')
+    tool_index: int = Field(None, alias='toolIndex')
+    vmax: float = Field(None)
+    # Percentage of the maximum velocity
+    vmax_percentage: float = Field(None, alias='vmaxPercentage')
+
+    def to_dict(self) -> dict:
+        """ Return the moveParams dict sent to GBC. """
+        return self.model_dump(by_alias=True, exclude_none=True, mode='json')
+
+
 class ActivityType(IntEnum):
     NONE = 0
     PAUSEPROGRAM = 1
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+    Offline validation of joint trajectories against the joint limits.
+
+    The checks mirror the operation errors GBC raises while moving
+    (JOINT_LIMIT_EXCEEDED, JOINT_OVER_SPEED, JOINT_DISCONTINUITY), so a trajectory
+    can be rejected with the offending points before anything is sent.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube import validation
+
+      result = validation.validate(traj.positions, robot.joint_limits,
+                                   period=traj.period, velocities=traj.velocities)
+      if not result.ok:
+          print(result.operation_errors())
+"""
+
+from __future__ import annotations
+import typing as tp
+import numpy as np
+
+from awtube.types import JointLimits
+from awtube.errors import OperationError
+import awtube.errors as errors
+
+
+class ValidationResult(tp.NamedTuple):
+    """ Indices of the points of a trajectory exceeding each kind of limit. """
+    position: np.ndarray = None
+    velocity: np.ndarray = None
+    acceleration: np.ndarray = None
+    discontinuity: np.ndarray = None
+
+    @property
+    def ok(self) -> bool:
+        """ True if no limit is exceeded. """
+        return not any(len(indices) for indices in self)
+
+    def operation_errors(self) -> tp.Dict[OperationError, np.ndarray]:
+        """ Return the offending indices keyed by the operation error GBC would raise. """
+        result = {OperationError.JOINT_LIMIT_EXCEEDED: self.position,
+                  OperationError.JOINT_OVER_SPEED: self.velocity,
+                  OperationError.JOINT_DISCONTINUITY: self.discontinuity}
+        return {k: v for k, v in result.items() if len(v)}
+
+
+_NONE = np.empty(0, dtype=np.intp)
+
+
+def _rows(mask: np.ndarray, offset: int = 0) -> np.ndarray:
+    """ Indices of the rows of mask with any joint set. """
+    return np.flatnonzero(mask.any(axis=1)) + offset
+
+
+def _exceeding(values: np.ndarray, limit, offset: int = 0) -> np.ndarray:
+    """ Indices of the rows of values where any joint is above limit in absolute value. """
+    if limit is None:
+        return _NONE
+    return _rows(np.abs(values) > np.asarray(limit, dtype=float), offset=offset)
+
+
+def validate(positions,
+             limits: JointLimits,
+             period: float = 0.1,
+             velocities=None,
+             timestamps=None) -> ValidationResult:
+    """
+    Check a whole trajectory against the joint limits in one pass.
+
+    Args:
+        positions: trajectory, shape (points, joints), in radians.
+        limits: limits checked, the ones left as None are skipped.
+        period: time between two points, ignored if timestamps are given.
+        velocities: velocities sent with the points, estimated from positions if None.
+        timestamps: time of each point in seconds, for non uniform trajectories.
+
+    Returns:
+        ValidationResult: for every kind of limit, the indices of the offending points.
+        Limits computed between two points are reported on the second one.
+    """
+    positions = np.asarray(positions, dtype=float)
+    if positions.ndim != 2:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'Positions should have shape (points, joints).')
+    if limits is None:
+        raise errors.AWTubeErrorException(
+            errors.AwtubeError.BAD_ARGUMENT, 'No joint limits configured.')
+
+    if timestamps is not None:
+        dt = np.diff(np.asarray(timestamps, dtype=float))[:, None]
+    else:
+        dt = float(period)
+
+    # position limits
+    position = _NONE
+    if limits.positions_min is not None or limits.positions_max is not None:
+        low = -np.inf if limits.positions_min is None else np.asarray(
+            limits.positions_min, dtype=float)
+        high = np.inf if limits.positions_max is None else np.asarray(
+            limits.positions_max, dtype=float)
+        position = _rows((positions < low) | (positions > high))
+
+    steps = np.diff(positions, axis=0)
+    discontinuity = _exceeding(steps, limits.steps, offset=1)
+
+    # velocities sent are checked as they are, otherwise they are estimated
+    if velocities is not None:
+        velocities = np.asarray(velocities, dtype=float)
+        velocity = _exceeding(velocities, limits.velocities)
+        acceleration = _exceeding(np.diff(velocities, axis=0) / dt,
+                                  limits.accelerations, offset=1) \
+            if limits.accelerations is not None else _NONE
+    else:
+        estimated = steps / dt
+        velocity = _exceeding(estimated, limits.velocities, offset=1)
+        acceleration = _exceeding(np.diff(estimated, axis=0) / (dt[1:] if np.ndim(dt) else dt),
+                                  limits.accelerations, offset=2) \
+            if limits.accelerations is not None else _NONE
+
+    return ValidationResult(position=position,
+                            velocity=velocity,
+                            acceleration=acceleration,
+                            discontinuity=discontinuity)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+    Watchdog of the observers, reports telemetry and status stalls.
+
+    Observers only store the monotonic time of their last update. The watchdog
+    keeps one deadline per watched observer, the time it stalls if not updated
+    again, in a heap served by a single task. When the earliest deadline comes the
+    observer is checked, and either armed again after its last update or reported
+    stalled, a few milliseconds after the stall at most.
+
+    Example:
+
+    .. code-block:: python
+
+      from awtube import errors
+      from awtube.watchdog import Watchdog
+
+      dog = Watchdog(on_exception=print)
+      dog.watch(robot.telemetry_observer, timeout=0.5)
+      dog.watch(robot.status_observer, timeout=1, exception=errors.HeartbeatFailure)
+      asyncio.create_task(dog.run())
+"""
+
+from __future__ import annotations
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import typing as tp
+
+from . import errors, observers
+
+
+class Watch:
+    """ Observer watched, with the exception reported when it stalls. """
+    __slots__ = ('observer', 'timeout', 'exception', 'on_stall', 'stalls', '_since', '_reported', '_active')
+
+    def __init__(self,
+                 observer: observers.Observer,
+                 timeout: float,
+                 exception: tp.Type[Exception],
+                 on_stall: tp.Callable[[Exception], None] | None):
+        self.observer = observer
+        self.timeout = timeout
+        self.exception = exception
+        self.on_stall = on_stall
+        self.stalls = 0
+        # counted from when watching started if the observer was never updated
+        self._since = time.monotonic()
+        # when the last stall was reported
+        self._reported: float = None
+        self._active = True
+
+    @property
+    def last_update(self) -> float:
+        """ Monotonic time of the last update of the observer, or of the start of the watch. """
+        timestamp = self.observer.timestamp
+        return self._since if timestamp is None or timestamp < self._since else timestamp
+
+    @property
+    def stalled(self) -> bool:
+        """ Stall reported and the observer not updated since. """
+        return self._reported is not None and self.last_update <= self._reported
+
+
+class Watchdog:
+    """ Reports the observers not updated within their timeout, with one timer for all of them. """
+
+    def __init__(self, on_exception: tp.Callable[[Exception], None] = None):
+        """
+        Args:
+            on_exception: called with the exception of a stall when its watch has no `on_stall`.
+        """
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self.on_exception = on_exception
+        # (deadline, order, watch), deadlines of removed watches are dropped when they come
+        self._deadlines: tp.List[tp.Tuple[float, int, Watch]] = []
+        self._order = itertools.count()
+        self._changed = asyncio.Event()
+
+    def _arm(self, watch: Watch, deadline: float):
+        heapq.heappush(self._deadlines, (deadline, next(self._order), watch))
+        if self._deadlines[0][2] is watch:
+            self._changed.set()
+
+    def watch(self,
+              observer: observers.Observer,
+              timeout: float,
+              exception: tp.Type[Exception] = errors.TelemetryLoss,
+              on_stall: tp.Callable[[Exception], None] = None) -> Watch:
+        """ Report `exception` when `observer` is not updated for `timeout` seconds, to
+            `on_stall` or else to the `on_exception` of the watchdog. Must be called on the loop. """
+        watch = Watch(observer, timeout, exception, on_stall)
+        self._arm(watch, watch.last_update + timeout)
+        return watch
+
+    def unwatch(self, watch: Watch):
+        """ Stop watching, its deadline is dropped when it comes. """
+        watch._active = False
+
+    def _check(self, watch: Watch, now: float):
+        last = watch.last_update
+        if now < last + watch.timeout:
+            if watch._reported is not None:
+                watch._reported = None
+                self._logger.info('%s updated again.', type(watch.observer).__name__)
+            self._arm(watch, last + watch.timeout)
+            return
+        if not watch.stalled:
+            watch._reported = now
+            watch.stalls += 1
+            self._report(watch, watch.exception(
+                f'{type(watch.observer).__name__} not updated for {now - last:.3f} s.'))
+        # polled while stalled, an update followed by a new stall is then reported a tenth of timeout late at most
+        self._arm(watch, now + watch.timeout / 10)
+
+    def _report(self, watch: Watch, exc: Exception):
+        handler = watch.on_stall if watch.on_stall is not None else self.on_exception
+        if handler is None:
+            self._logger.error('%s: %s', type(exc).__name__, exc)
+            return
+        try:
+            handler(exc)
+        except Exception as e:
+            self._logger.error('Stall handler failed: %s', e)
+
+    async def run(self):
+        """ Serve the deadlines until cancelled. """
+        while True:
+            self._changed.clear()
+            if not self._deadlines:
+                await self._changed.wait()
+                continue
+            deadline, _, watch = self._deadlines[0]
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._changed.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._deadlines)
+            if watch._active:
+                self._check(watch, time.monotonic())
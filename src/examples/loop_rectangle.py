@@ -17,8 +17,9 @@ try:
             {"x": 0.8660254037844387,
             "y": 3.0616169978683824e-17,
             "z": 0.49999999999999994,
-            "w": 5.3028761936245346e-17})
-        r.set_speed(2)
+            "w": 5.3028761936245346e-17},
+            wait=False)
+        r.stream_speed(2, wait=False)
         r.move_line(
             {"x": 400,
             "y": 50,
@@ -26,8 +27,9 @@ try:
             {"x": 0.8660254037844387,
             "y": 3.0616169978683824e-17,
             "z": 0.49999999999999994,
-            "w": 5.3028761936245346e-17})
-        r.set_speed(0.5)
+            "w": 5.3028761936245346e-17},
+            wait=False)
+        r.stream_speed(0.5, wait=False)
         r.move_line(
             {"x": 550,
             "y": 50,
@@ -35,8 +37,9 @@ try:
             {"x": 0.8660254037844387,
             "y": 3.0616169978683824e-17,
             "z": 0.49999999999999994,
-            "w": 5.3028761936245346e-17})
-        r.set_speed(1)
+            "w": 5.3028761936245346e-17},
+            wait=False)
+        r.stream_speed(1, wait=False)
         r.move_line(
             {"x": 550,
             "y": -50,
@@ -44,8 +47,9 @@ try:
             {"x": 0.8660254037844387,
             "y": 3.0616169978683824e-17,
             "z": 0.49999999999999994,
-            "w": 5.3028761936245346e-17})
-        r.set_speed(2)
+            "w": 5.3028761936245346e-17},
+            wait=False)
+        r.stream_speed(2, wait=False)
         r.move_line(
             {"x": 400,
             "y": -50,
@@ -53,7 +57,10 @@ try:
             {"x": 0.8660254037844387,
             "y": 3.0616169978683824e-17,
             "z": 0.49999999999999994,
-            "w": 5.3028761936245346e-17})
+            "w": 5.3028761936245346e-17},
+            wait=False)
+        # speed changes are applied by the stream between the moves, nothing drains until here
+        r.wait_all()
 finally:
     r.kill()
     print('Finished')
\ No newline at end of file
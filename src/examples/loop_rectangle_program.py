@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+from awtube.robot import Robot
+from awtube.program import Program
+from awtube.types import MachineTarget
+
+rotation = {"x": 0.8660254037844387,
+            "y": 3.0616169978683824e-17,
+            "z": 0.49999999999999994,
+            "w": 5.3028761936245346e-17}
+
+# recorded and serialized once, replayed with only the tags rewritten
+rectangle = Program() \
+    .move_line({"x": 400, "y": -50, "z": 650}, rotation) \
+    .set_speed(2) \
+    .move_line({"x": 400, "y": 50, "z": 650}, rotation) \
+    .set_speed(0.5) \
+    .move_line({"x": 550, "y": 50, "z": 650}, rotation) \
+    .set_speed(1) \
+    .move_line({"x": 550, "y": -50, "z": 650}, rotation) \
+    .set_speed(2) \
+    .move_line({"x": 400, "y": -50, "z": 650}, rotation)
+
+r = Robot('192.168.3.191')
+r.start()
+r.set_machine_target(MachineTarget.SIMULATION)
+r.enable()
+try:
+    r.run_program(rectangle, repeat=100)
+finally:
+    r.kill()
+    print('Finished')
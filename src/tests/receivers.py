@@ -0,0 +1,83 @@
+import asyncio
+import collections
+import json
+import queue
+from awtube.types import Status, StreamStatus, StreamState
+
+"""
+  Fake receivers shared by the tests, standing for the websocket and GBC. """
+
+
+class ListReceiver:
+    """ Records the messages sent, whatever the lane. """
+
+    def __init__(self):
+        self.messages = []
+
+    def put(self, message: str):
+        self.messages.append(message)
+
+    async def send(self, message: str):
+        self.put(message)
+
+    def send_urgent(self, message: str, since: float = None):
+        self.put(message)
+
+    def items(self):
+        """ The stream messages sent. """
+        messages = [json.loads(m) for m in self.messages]
+        return [m["stream"] for m in messages if "stream" in m]
+
+    def tags(self):
+        """ Tags of the stream items sent. """
+        return [stream["items"][0]["tag"] for stream in self.items()]
+
+
+class QueuedReceiver(ListReceiver):
+    """ Records the messages put in an outgoing queue, written by :meth:`flush`,
+        and the urgent ones as written right away. """
+
+    def __init__(self):
+        super().__init__()
+        self.outgoing = []
+
+    def put(self, message: str):
+        self.outgoing.append(message)
+
+    def send_urgent(self, message: str, since: float = None):
+        self.messages.append(message)
+
+    def flush(self):
+        self.messages.extend(self.outgoing)
+        self.outgoing.clear()
+
+
+class InstantReceiver(ListReceiver):
+    """ Receiver of a robot completing every stream item as soon as it is sent,
+        the status of the machine is set once and never updated. """
+
+    def __init__(self, robot):
+        super().__init__()
+        self.robot = robot
+        self.outgoing = queue.Queue()
+        self._urgent = collections.deque()
+        self.on_exception = None
+        self.connected = False
+        self.sent_count = 0
+        robot.stream_observer._payload = StreamStatus(capacity=100, tag=0, state=int(StreamState.IDLE))
+        robot.status_observer._payload = Status.model_construct(kc=[], din=[], dout=[], iout=[])
+
+    async def listen(self):
+        self.connected = True
+        try:
+            await asyncio.Event().wait()
+        finally:
+            self.connected = False
+
+    def put(self, message: str):
+        super().put(message)
+        self.sent_count += 1
+        stream = json.loads(message).get("stream")
+        if stream is not None and "items" in stream:
+            self.robot.stream_observer._payload = StreamStatus(capacity=100, tag=stream["items"][0]["tag"],
+                                                               state=int(StreamState.IDLE))
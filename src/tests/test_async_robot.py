@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from awtube.async_robot import AsyncRobot
+from tests.receivers import InstantReceiver
+
+"""
+  Tests for AsyncRobot on the loop of the caller, GBC is replaced by a receiver
+  completing every stream item as soon as it is sent. """
+
+
+def robot() -> AsyncRobot:
+    r = AsyncRobot()
+    r.receiver = InstantReceiver(r)
+    return r
+
+
+def test_two_robots_in_one_loop():
+    async def main():
+        first, second = robot(), robot()
+        await first.start()
+        await second.start()
+        results = await asyncio.wait_for(
+            asyncio.gather(first.move_joints_async([0.0, 0.1]),
+                           second.move_joints_async([1.0, 1.1]),
+                           first.dwell_async(10)), 5)
+        await first.close()
+        await second.close()
+        return first, second, results
+    first, second, results = asyncio.run(main())
+    assert len(first.receiver.messages) == 2
+    assert len(second.receiver.messages) == 1
+    assert first.machine_controller._command_queue is not second.machine_controller._command_queue
+    assert first.killed and not first._tasks
+
+
+def test_close_cancels_tasks():
+    async def main():
+        r = robot()
+        await r.start()
+        tasks = list(r._tasks)
+        await r.close()
+        return tasks
+    tasks = asyncio.run(main())
+    assert tasks and all(t.done() for t in tasks)
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import pytest
+from awtube.cia402 import CIA402MachineState
+from awtube.controllers import MachineController, StreamController
+from awtube.commands import MoveJointsCommand, DwellCommand, DoutCommad, KinematicsConfigurationCommad, \
+    MachineStateCommad, MachineTargetCommad, StreamFeedRateCommand
+from awtube.observers import StatusObserver, StreamObserver
+from awtube.types import BooleanOutputElement, MachineStatus, MachineTarget, Status, StreamStatus, StreamState
+from awtube.task_wrappers import TWrapperResult
+from tests.receivers import ListReceiver, QueuedReceiver
+
+"""
+  Tests for the stream controller pipelining and the machine queue optimization, GBC is
+  replaced by a fake receiver and statuses set by hand. """
+
+
+def status(observer: StreamObserver, capacity: int, tag: int = 0, state: StreamState = StreamState.ACTIVE):
+    observer._payload = StreamStatus(capacity=capacity, tag=tag, state=int(state))
+
+
+async def run_controller(controller: StreamController):
+    main = asyncio.create_task(controller._run())
+    await asyncio.sleep(0)
+    return main
+
+
+def test_pipelined_in_order():
+    async def main():
+        receiver = ListReceiver()
+        observer = StreamObserver()
+        status(observer, capacity=100)
+        controller = StreamController(observer)
+        tasks = [controller.schedule_last(MoveJointsCommand(receiver, joint_positions=[0.1 * i]))
+                 for i in range(3)]
+        tasks.append(controller.schedule_last([DwellCommand(receiver, ms=10),
+                                               MoveJointsCommand(receiver, joint_positions=[1.0])]))
+        main = await run_controller(controller)
+        await asyncio.sleep(0.3)
+        # everything is in flight at once
+        sent = receiver.tags()
+        assert not any(t.done() for t in tasks)
+        status(observer, capacity=100, tag=2)
+        await asyncio.sleep(0.3)
+        first_done = [t.done() for t in tasks]
+        status(observer, capacity=100, tag=5, state=StreamState.IDLE)
+        results = await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        main.cancel()
+        return sent, first_done, results
+    sent, first_done, results = asyncio.run(main())
+    assert sent == [1, 2, 3, 4, 5]
+    assert first_done == [True, False, False, False]
+    assert results == [TWrapperResult.SUCCESS] * 4
+
+
+def test_capacity_cushion():
+    async def main():
+        receiver = ListReceiver()
+        observer = StreamObserver()
+        status(observer, capacity=37)
+        controller = StreamController(observer)
+        for i in range(5):
+            controller.schedule_last(MoveJointsCommand(receiver, joint_positions=[0.1 * i]))
+        main = await run_controller(controller)
+        await asyncio.sleep(0.3)
+        before = receiver.tags()
+        # new status, the buffer has room again
+        status(observer, capacity=38, tag=1)
+        await asyncio.sleep(0.3)
+        main.cancel()
+        return before, receiver.tags()
+    before, after = asyncio.run(main())
+    assert before == [1, 2]
+    assert after == [1, 2, 3, 4, 5]
+
+
+def test_cancelled_items_are_not_sent():
+    async def main():
+        receiver = ListReceiver()
+        observer = StreamObserver()
+        status(observer, capacity=100)
+        controller = StreamController(observer)
+        first = controller.schedule_last(MoveJointsCommand(receiver, joint_positions=[0.0]))
+        second = controller.schedule_last(MoveJointsCommand(receiver, joint_positions=[1.0]))
+        second._future.cancel()
+        main = await run_controller(controller)
+        await asyncio.sleep(0.3)
+        main.cancel()
+        return receiver.tags(), first.done(), second._future.cancelled()
+    tags, first_done, cancelled = asyncio.run(main())
+    assert tags == [1]
+    assert not first_done
+    assert cancelled
+
+
+def machine_status(target: MachineTarget = MachineTarget.NONE, status_word: int = 0, douts=()) -> Status:
+    return Status.model_construct(
+        machine=MachineStatus.model_construct(target=target, status_word=status_word),
+        kc=[], din=[], iout=[],
+        dout=[BooleanOutputElement(effectiveValue=bool(v), setValue=v, override=True) for v in douts])
+
+
+def test_machine_queue_merged():
+    async def main():
+        receiver = ListReceiver()
+        observer = StatusObserver()
+        observer._payload = machine_status(douts=[0, 0])
+        controller = MachineController(observer)
+        tasks = [controller.schedule_last(KinematicsConfigurationCommad(receiver, target_feed_rate=v))
+                 for v in (2, 1, 0.5)]
+        tasks += [controller.schedule_last(DoutCommad(receiver, position=1, value=1)) for _ in range(2)]
+        tasks.append(controller.schedule_last(DoutCommad(receiver, position=0, value=1)))
+        tasks.append(controller.schedule_last(KinematicsConfigurationCommad(receiver, target_feed_rate=1.5)))
+        main = await run_controller(controller)
+        results = await asyncio.wait_for(asyncio.gather(*tasks), 1)
+        main.cancel()
+        return receiver.messages, controller, results
+    messages, controller, results = asyncio.run(main())
+    commands = [json.loads(m)["command"] for m in messages]
+    assert commands == [{"kinematicsConfiguration": {"0": {"command": {"fro": 0.5}}}},
+                        {"dout": {"1": {"command": {"setValue": 1, "override": True}}}},
+                        {"dout": {"0": {"command": {"setValue": 1, "override": True}}}},
+                        {"kinematicsConfiguration": {"0": {"command": {"fro": 1.5}}}}]
+    assert controller.merged == 3
+    assert len(results) == 7
+
+
+def test_repeat_after_other_commands_kept():
+    async def main():
+        receiver = ListReceiver()
+        observer = StatusObserver()
+        observer._payload = machine_status(status_word=0b00100111, douts=[0])
+        controller = MachineController(observer)
+        tasks = [controller.schedule_last(DoutCommad(receiver, position=0, value=1)),
+                 controller.schedule_last(MachineStateCommad(receiver, CIA402MachineState.OPERATION_ENABLED)),
+                 controller.schedule_last(DoutCommad(receiver, position=0, value=1))]
+        main = await run_controller(controller)
+        results = await asyncio.wait_for(asyncio.gather(*tasks), 0.2)
+        main.cancel()
+        return receiver.messages, controller, results
+    messages, controller, results = asyncio.run(main())
+    # the output may have changed while the state was changing, the status still has 0
+    assert [json.loads(m)["command"] for m in messages] == \
+        [{"dout": {"0": {"command": {"setValue": 1, "override": True}}}}] * 2
+    assert controller.merged == 0
+    assert len(results) == 3
+
+
+def test_machine_commands_elided():
+    async def main():
+        receiver = ListReceiver()
+        observer = StatusObserver()
+        observer._payload = machine_status(MachineTarget.SIMULATION, status_word=0b00100111, douts=[0, 1])
+        controller = MachineController(observer)
+        tasks = [controller.schedule_last(MachineTargetCommad(receiver, MachineTarget.SIMULATION)),
+                 controller.schedule_last(MachineStateCommad(receiver, CIA402MachineState.OPERATION_ENABLED)),
+                 controller.schedule_last(DoutCommad(receiver, position=1, value=1)),
+                 controller.schedule_last(DoutCommad(receiver, position=0, value=0)),
+                 controller.schedule_last(DoutCommad(receiver, position=0, value=1))]
+        main = await run_controller(controller)
+        # without waiting for the periodic checks of the target and state
+        results = await asyncio.wait_for(asyncio.gather(*tasks), 0.2)
+        main.cancel()
+        return receiver.messages, controller, results
+    messages, controller, results = asyncio.run(main())
+    assert [json.loads(m)["command"] for m in messages] == \
+        [{"dout": {"0": {"command": {"setValue": 1, "override": True}}}}]
+    assert controller.elided == 4
+    assert results[:3] == [TWrapperResult.SUCCESS] * 3
+
+
+def test_feed_rate_at_tag():
+    async def main():
+        receiver = ListReceiver()
+        observer = StreamObserver()
+        status(observer, capacity=100)
+        controller = StreamController(observer)
+        moves = controller.schedule_last([MoveJointsCommand(receiver, joint_positions=[0.1 * i]) for i in range(2)])
+        speed = controller.schedule_last(StreamFeedRateCommand(receiver, 0.5))
+        after = controller.schedule_last([MoveJointsCommand(receiver, joint_positions=[1.0 + i]) for i in range(2)])
+        early = controller.schedule_last(StreamFeedRateCommand(receiver, 1.5, at_tag=2))
+        main = await run_controller(controller)
+        await asyncio.sleep(0.3)
+        # the moves after the feed rate change are sent without waiting for it
+        sent = list(receiver.messages)
+        observer.update(json.dumps({"stream": [{"capacity": 100, "tag": 2, "state": int(StreamState.ACTIVE)}]}))
+        at_2 = list(receiver.messages[len(sent):])
+        observer.update(json.dumps({"stream": [{"capacity": 100, "tag": 3, "state": int(StreamState.ACTIVE)}]}))
+        at_3 = list(receiver.messages[len(sent) + len(at_2):])
+        status(observer, capacity=100, tag=4, state=StreamState.IDLE)
+        results = await asyncio.wait_for(asyncio.gather(moves, speed, after, early), 1)
+        main.cancel()
+        return sent, at_2, at_3, results
+    sent, at_2, at_3, results = asyncio.run(main())
+    assert [json.loads(m)["stream"]["items"][0]["tag"] for m in sent] == [1, 2, 3, 4]
+    assert [json.loads(m)["command"] for m in at_2] == [{"kinematicsConfiguration": {"0": {"command": {"fro": 1.5}}}}]
+    assert [json.loads(m)["command"] for m in at_3] == [{"kinematicsConfiguration": {"0": {"command": {"fro": 0.5}}}}]
+    assert all(r == TWrapperResult.SUCCESS for r in results)
+
+
+def test_feed_rate_ahead_of_queued_items():
+    async def main():
+        receiver = QueuedReceiver()
+        observer = StreamObserver()
+        status(observer, capacity=100)
+        controller = StreamController(observer)
+        controller.schedule_last(StreamFeedRateCommand(receiver, 0.5, at_tag=1))
+        controller.schedule_last([MoveJointsCommand(receiver, joint_positions=[0.1 * i]) for i in range(3)])
+        main = await run_controller(controller)
+        await asyncio.sleep(0.3)
+        # items still waiting in the outgoing queue when the first one starts
+        queued = len(receiver.outgoing)
+        observer.update(json.dumps({"stream": [{"capacity": 100, "tag": 1, "state": int(StreamState.ACTIVE)}]}))
+        receiver.flush()
+        main.cancel()
+        return queued, receiver
+    queued, receiver = asyncio.run(main())
+    assert queued == 3
+    assert json.loads(receiver.messages[0])["command"] == {"kinematicsConfiguration": {"0": {"command": {"fro": 0.5}}}}
+    assert receiver.tags() == [1, 2, 3]
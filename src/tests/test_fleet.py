@@ -0,0 +1,128 @@
+import json
+import pytest
+from awtube.fleet import Fleet
+from awtube.commands import MoveJointsCommand
+from awtube.task_wrappers import TWrapperResult
+from awtube.types import StreamCommandType, StreamState
+from tests.receivers import InstantReceiver
+
+"""
+  Tests for the fleet of robots, GBC is replaced by receivers completing
+  every stream item as soon as it is sent. """
+
+
+@pytest.fixture
+def fleet():
+    with Fleet(loops=2) as fleet:
+        for name in ('left', 'right', 'third'):
+            robot = fleet.add(name, '127.0.0.1')
+            robot.receiver = InstantReceiver(robot)
+        yield fleet
+
+
+def tags(robot):
+    return [json.loads(m)["stream"]["items"][0]["tag"] for m in robot.receiver.messages]
+
+
+def test_robots_are_isolated(fleet):
+    fleet.start()
+    assert len({id(fleet._loop_of[n]) for n in fleet.names}) == 2
+    fleet.run('left', fleet['left'].move_joints_async([0.0])).result(5)
+    fleet.run('left', fleet['left'].move_joints_async([0.1])).result(5)
+    fleet.run('right', fleet['right'].move_joints_async([1.0])).result(5)
+    assert tags(fleet['left']) == [1, 2]
+    assert tags(fleet['right']) == [1]
+    assert tags(fleet['third']) == []
+
+
+def test_stop_start_and_metrics(fleet):
+    fleet.start()
+    fleet.run('right', fleet['right'].move_joints_async([1.0])).result(5)
+    fleet['right'].stream_observer.update(
+        json.dumps({"stream": [{"capacity": 100, "tag": 1, "state": int(StreamState.IDLE)}]}))
+    fleet.stop('left')
+    metrics = fleet.metrics()
+    assert not metrics.robots['left'].connected
+    assert metrics.robots['right'].connected
+    assert metrics.connected == 2
+    assert metrics.sent == 1
+    assert metrics.robots['right'].sent_tag == metrics.robots['right'].stream_tag == 1
+    # status just received
+    assert 0 <= metrics.robots['right'].status_age < 1
+    assert metrics.robots['left'].status_age is None
+    fleet.reconnect('left')
+    assert fleet.metrics('left').robots['left'].connected
+
+
+def test_unknown_and_duplicate_names(fleet):
+    with pytest.raises(Exception):
+        fleet['nobody']
+    with pytest.raises(Exception):
+        fleet.add('left', '127.0.0.1')
+
+
+class SimulatedStream(InstantReceiver):
+    """ Queues stream items while paused and runs them all on RUN, notifying statuses like GBC. """
+
+    def __init__(self, robot, clock: int):
+        super().__init__(robot)
+        self.observers = [robot.stream_observer]
+        self.state = StreamState.IDLE
+        self.queued = []
+        self.clock = clock
+        self.tag = 0
+
+    def attach_observer(self, observer):
+        self.observers.append(observer)
+
+    def detach_observer(self, observer):
+        self.observers.remove(observer)
+
+    def status(self):
+        message = json.dumps({"stream": [{"capacity": 100 - len(self.queued), "queued": len(self.queued),
+                                          "state": int(self.state), "tag": self.tag, "time": self.clock}]})
+        for observer in list(self.observers):
+            observer.update(message)
+
+    def put(self, message: str):
+        self.messages.append(message)
+        js = json.loads(message)
+        if "command" in js:
+            command = js["command"]["stream"]["0"]["command"]["streamCommand"]
+            if command == int(StreamCommandType.PAUSE):
+                self.state = StreamState.PAUSED
+            elif command == int(StreamCommandType.RUN):
+                self.state = StreamState.ACTIVE
+                self.status()
+                self.tag = self.queued[-1]
+                self.queued = []
+                self.state = StreamState.IDLE
+        else:
+            self.queued.append(js["stream"]["items"][0]["tag"])
+        self.status()
+
+    async def send(self, message: str):
+        self.put(message)
+
+
+def test_coordinated_start(fleet):
+    for clock, name in enumerate(fleet.names):
+        robot = fleet[name]
+        robot.receiver = SimulatedStream(robot, clock=1000 + clock)
+    fleet.start()
+    plans = {name: [MoveJointsCommand(fleet[name].receiver, joint_positions=[0.1 * i]) for i in range(3)]
+             for name in ('left', 'right', 'third')}
+    report = fleet.coordinated_start(plans, timeout=5)
+    assert [r.result(5) for r in report.done.values()] == [TWrapperResult.SUCCESS] * 3
+    for name in plans:
+        messages = [json.loads(m) for m in fleet[name].receiver.messages]
+        # paused, preloaded, then run
+        assert messages[0]["command"]["stream"]["0"]["command"]["streamCommand"] == \
+            int(StreamCommandType.PAUSE)
+        assert [m["stream"]["items"][0]["tag"] for m in messages[1:4]] == [1, 2, 3]
+        assert messages[4]["command"]["stream"]["0"]["command"]["streamCommand"] == \
+            int(StreamCommandType.RUN)
+    assert set(report.dispatch) == set(plans)
+    assert 0 <= report.dispatch_skew < 0.1
+    assert 0 <= report.start_skew < 0.1
+    assert report.gbc_skew == 2
@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import pytest
+from awtube.handles import Batch, CommandHandle, wait_all
+
+"""
+  Tests for the handles on commands given without waiting, the commands run on a loop in another thread. """
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+
+    async def finish():
+        # the tasks left, e.g. cancelled from another thread, run to their end before the loop stops
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    asyncio.run_coroutine_threadsafe(finish(), loop).result(1)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def test_wait_and_result(loop):
+    handle = CommandHandle(asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05, 'done'), loop))
+    assert not handle.done()
+    assert not handle.wait(timeout=0.001)
+    assert handle.wait(timeout=1)
+    assert handle.result() == 'done'
+
+
+def test_cancel(loop):
+    started = threading.Event()
+
+    async def command():
+        started.set()
+        await asyncio.sleep(10)
+
+    handle = CommandHandle(asyncio.run_coroutine_threadsafe(command(), loop))
+    started.wait(1)
+    assert handle.cancel()
+    assert handle.done() and handle.cancelled()
+
+
+def test_wait_all(loop):
+    handles = [CommandHandle(asyncio.run_coroutine_threadsafe(asyncio.sleep(0.01 * i), loop))
+               for i in range(5)]
+    assert wait_all(handles, timeout=1)
+    assert all(h.done() for h in handles)
+
+
+class LoopPoster:
+    """ Stands for the threadloop. """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.posts = 0
+
+    def post(self, coro):
+        self.posts += 1
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+def test_batch_one_hop_in_order(loop):
+    poster = LoopPoster(loop)
+    events = []
+
+    async def call(name, seconds):
+        events.append(('start', name))
+        await asyncio.sleep(seconds)
+        events.append(('end', name))
+        return name
+
+    batch = Batch(poster)
+    batch.add(call('move1', 0.05), 'stream')
+    batch.add(call('move2', 0.01), 'stream')
+    batch.add(call('speed', 0), 'machine')
+    batch.add(call('move3', 0), 'stream')
+    assert not events
+    batch.submit()
+    assert batch.results(timeout=1) == ['move1', 'move2', 'speed', 'move3']
+    assert poster.posts == 1
+    # calls on the same controller overlap, the machine call waits for the moves before it
+    assert events[:2] == [('start', 'move1'), ('start', 'move2')]
+    assert events.index(('start', 'speed')) > events.index(('end', 'move1'))
+    assert events.index(('start', 'move3')) > events.index(('end', 'speed'))
+
+
+def test_batch_results_and_discard(loop):
+    async def fail():
+        raise ValueError('bad')
+
+    batch = Batch(LoopPoster(loop))
+    batch.add(asyncio.sleep(0, 1))
+    batch.add(fail())
+    batch.submit()
+    results = batch.results(timeout=1)
+    assert results[0] == 1
+    assert isinstance(results[1], ValueError)
+
+    dropped = Batch(LoopPoster(loop))
+    handle = dropped.add(asyncio.sleep(0))
+    dropped.discard()
+    assert handle.cancelled()
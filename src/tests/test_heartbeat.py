@@ -0,0 +1,115 @@
+import asyncio
+import json
+import time
+import pytest
+from awtube import commands, heartbeat
+from awtube.errors import HeartbeatFailure
+from awtube.heartbeat import HeartbeatTask, JitterHistogram
+from awtube.observers import StatusObserver
+
+"""
+  Tests for the heartbeat echoed on every status and sent at absolute deadlines,
+  with a receiver recording the heartbeats. """
+
+
+class HeartbeatReceiver:
+    def __init__(self):
+        self.beats = []
+
+    def send_urgent(self, message: str, since: float = None):
+        beat = json.loads(message)["command"]["machine"]["0"]["command"]["heartbeat"]
+        self.beats.append((beat, time.monotonic()))
+
+
+def status(heartbeat: int) -> str:
+    return json.dumps({'status': {'machine': {'heartbeat': heartbeat}, 'kc': [], 'din': [], 'dout': [], 'iout': []}})
+
+
+def test_echo_on_status():
+    async def main():
+        receiver, observer = HeartbeatReceiver(), StatusObserver()
+        task = HeartbeatTask(commands.HeartbeatCommad(receiver, frequency=2), observer)
+        await task.start()
+        await asyncio.sleep(0.01)
+        for beat in (1, 1, 2):
+            observer.update(status(beat))
+        await task.stop()
+        return task, receiver.beats
+    task, beats = asyncio.run(main())
+    # nothing to send at the first deadline, then each new value echoed once
+    assert [beat for beat, _ in beats] == [1, 2]
+    assert task.echoed == 2
+    assert not task._observer._listeners
+
+
+class Clock:
+    """ Clock of the loop for the heartbeat deadlines, each one woken up `lag(deadline)` late.
+        Stops waking up after `deadlines` of them, until the task is stopped. """
+
+    def __init__(self, deadlines: int, lag=lambda deadline: 0.0):
+        self.now = 0.0
+        self.deadlines = []
+        self._count = deadlines
+        self._lag = lag
+        self.done = asyncio.Event()
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep_until(self, deadline: float):
+        if len(self.deadlines) == self._count:
+            self.done.set()
+            await asyncio.Event().wait()
+        self.deadlines.append(deadline)
+        self.now = max(self.now, deadline) + self._lag(deadline)
+        await asyncio.sleep(0)
+
+
+def run_on_clock(monkeypatch, clock: Clock, **kwargs) -> HeartbeatTask:
+    """ Run a heartbeat task at 50 Hz on the deadlines of clock. """
+    async def main():
+        monkeypatch.setattr(asyncio.get_running_loop(), 'time', clock.time)
+        observer = StatusObserver()
+        observer.update(status(7))
+        task = HeartbeatTask(commands.HeartbeatCommad(HeartbeatReceiver(), frequency=50), observer, **kwargs)
+        await task.start()
+        await clock.done.wait()
+        await task.stop()
+        return task
+    monkeypatch.setattr(heartbeat, 'sleep_until', clock.sleep_until)
+    return asyncio.run(main())
+
+
+def test_deadlines_do_not_drift(monkeypatch):
+    # every deadline woken up late, within the tolerance
+    clock = Clock(25, lambda deadline: 0.003)
+    task = run_on_clock(monkeypatch, clock)
+    # late wake-ups do not push the next deadlines, they stay on the 20 ms grid
+    assert clock.deadlines == pytest.approx([0.02 * i for i in range(25)])
+    assert task.sent == 25
+    assert task.jitter.count == 25
+    assert task.jitter.max == pytest.approx(0.003)
+    assert task.missed == 0
+
+
+def test_missed_deadline_reported(monkeypatch):
+    failures = []
+    # loop blocked for 100 ms at the fourth deadline
+    clock = Clock(10, lambda deadline: 0.1 if deadline == pytest.approx(0.06) else 0.0)
+    task = run_on_clock(monkeypatch, clock, on_failure=failures.append)
+    assert task.missed == 1
+    assert len(failures) == 1 and isinstance(failures[0], HeartbeatFailure)
+    assert task.jitter.max == pytest.approx(0.1)
+    # the deadlines missed meanwhile are skipped, the next ones back on the grid
+    assert clock.deadlines[:5] == pytest.approx([0.0, 0.02, 0.04, 0.06, 0.18])
+    assert all(round(d / 0.02) * 0.02 == pytest.approx(d) for d in clock.deadlines)
+
+
+def test_jitter_histogram():
+    histogram = JitterHistogram(width=0.001, bins=4)
+    for delay in (0.0002, 0.0004, 0.0015, 0.0025, 0.5, -0.001):
+        histogram.add(delay)
+    assert histogram.counts == [3, 1, 1, 1]
+    assert histogram.percentile(50) == 0.001
+    assert histogram.percentile(100) == 0.5
+    assert histogram.bins() == [(0.001, 3), (0.002, 1), (0.003, 1), (0.5, 1)]
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import queue
+import time
+import pytest
+from awtube.jogging import JogHandle
+from awtube.types import ActivityType
+from tests.receivers import QueuedReceiver
+
+"""
+  Tests for the joint velocity jogging handle, messages are read from a fake receiver. """
+
+
+class QueueReceiver:
+    def __init__(self):
+        self.outgoing = queue.Queue()
+
+    def put(self, message: str):
+        self.outgoing.put(message)
+
+    def send_urgent(self, message: str, since: float = None):
+        self.put(message)
+
+    def velocities(self):
+        result = []
+        while not self.outgoing.empty():
+            activity = json.loads(self.outgoing.get())["command"]["soloActivity"]["0"]["command"]
+            assert activity["activityType"] == int(ActivityType.MOVEJOINTSATVELOCITY)
+            result.append(activity["moveJointsAtVelocity"]["jointVelocityArray"])
+        return result
+
+
+async def run_for(handle: JogHandle, seconds: float):
+    task = asyncio.create_task(handle.run())
+    await asyncio.sleep(seconds)
+    return task
+
+
+def test_latest_wins():
+    async def main():
+        receiver = QueueReceiver()
+        handle = JogHandle(receiver, rate=50, timeout=1)
+        handle.push([0.1, 0.0])
+        handle.push([0.2, 0.0])
+        handle.push([0.3, 0.0])
+        task = await run_for(handle, 0.05)
+        handle.close()
+        await task
+        return receiver.velocities(), handle
+    sent, handle = asyncio.run(main())
+    assert sent == [[0.3, 0.0], [0.0, 0.0]]
+    assert handle.dropped == 2
+
+
+def test_stops_on_timeout():
+    async def main():
+        receiver = QueueReceiver()
+        handle = JogHandle(receiver, rate=250, timeout=0.02)
+        handle.push([0.5, 0.5])
+        task = await run_for(handle, 0.1)
+        assert not handle.moving
+        handle.close()
+        await task
+        return receiver.velocities(), handle
+    sent, handle = asyncio.run(main())
+    assert sent == [[0.5, 0.5], [0.0, 0.0]]
+    assert handle.timeouts == 1
+
+
+def test_stop_ahead_of_queued_items():
+    async def main():
+        receiver = QueuedReceiver()
+        handle = JogHandle(receiver, rate=250, timeout=0.02)
+        handle.push([0.5, 0.5])
+        task = await run_for(handle, 0.01)
+        # a batch of stream items waiting for the outgoing queue to be polled
+        receiver.outgoing.extend(json.dumps({"stream": {"items": [{"tag": tag}]}}) for tag in range(50))
+        await asyncio.sleep(0.05)
+        handle.close()
+        await task
+        return receiver, handle
+    receiver, handle = asyncio.run(main())
+    written = [json.loads(m)["command"]["soloActivity"]["0"]["command"]["moveJointsAtVelocity"]["jointVelocityArray"]
+               for m in receiver.messages]
+    assert written == [[0.5, 0.5], [0.0, 0.0]]
+    assert handle.timeouts == 1
+    assert len(receiver.outgoing) == 50
+
+
+def test_closed_handle():
+    handle = JogHandle(QueueReceiver())
+    handle.close()
+    with pytest.raises(Exception):
+        handle.push([0.0])
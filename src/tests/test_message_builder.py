@@ -1,12 +1,13 @@
 import pytest
 import json
+import concurrent.futures
 from awtube.types import *
 from awtube.types import *
 from awtube.commands import *
 # from awtube.msg_builders import stream_move_joints_cmd, \
 #     stream_move_joints_interpolated_cmd, \
 #     stream_move_line_cmd
-from awtube.builders import StreamActivityBuilder
+from awtube.builders import StreamActivityBuilder, ActivityBuilder
 
 """
   Tests for the module commands, testing the validity of the json commands generated.
@@ -110,3 +111,84 @@ class TestCommands:
                                         move_params={}
                                         ).build()
         assert json.loads(result) == correct
+
+    def test_stream_move_arc_cmd(self):
+        translation = {"x": 1.0, "y": 2.0, "z": 3.0}
+        rotation = {"x": 0.0, "y": 0.0, "z": 0.0, "w": 1.0}
+        centre = {"x": 0.0, "y": 2.0, "z": 3.0}
+        self.builder.reset()
+        result = self.builder.move_arc(translation=translation,
+                                       rotation=rotation,
+                                       centre=centre,
+                                       direction=ArcDirection.CW,
+                                       tag=self.t,
+                                       kc=self.kc,
+                                       move_params={}
+                                       ).build()
+        item = json.loads(result)["stream"]["items"][0]
+        assert item["activityType"] == int(ActivityType.MOVEARC)
+        assert item["tag"] == self.t
+        move_arc = item["moveArc"]
+        assert move_arc["arcType"] == int(ArcType.CENTRE)
+        assert move_arc["arcDirection"] == int(ArcDirection.CW)
+        assert move_arc["destination"]["position"]["translation"] == translation
+        assert move_arc["destination"]["position"]["rotation"] == rotation
+        assert move_arc["centre"]["translation"] == centre
+        assert "plane" not in move_arc
+
+    def test_move_params(self):
+        params = MoveParametersConfig(blend_type=BlendType.OVERLAPPED,
+                                      blend_tolerance=0.5,
+                                      vmax_percentage=80)
+        self.builder.reset()
+        result = self.builder.move_joints(joint_position_array=self.j.positions,
+                                          tag=self.t,
+                                          kc=self.kc,
+                                          move_params=params.to_dict()
+                                          ).build()
+        item = json.loads(result)["stream"]["items"][0]
+        assert item["moveJoints"]["moveParams"] == {"blendType": 1,
+                                                    "blendTolerance": 0.5,
+                                                    "vmaxPercentage": 80}
+
+    def test_stream_io_and_dwell(self):
+        self.builder.reset()
+        result = self.builder.set_dout(3, True, tag=1) \
+            .set_aout(1, 2.5, tag=2) \
+            .set_iout(2, 7, tag=3) \
+            .dwell(250, tag=4).build()
+        items = json.loads(result)["stream"]["items"]
+        assert [i["activityType"] for i in items] == [int(ActivityType.SETDOUT),
+                                                      int(ActivityType.SETAOUT),
+                                                      int(ActivityType.SETIOUT),
+                                                      int(ActivityType.DWELL)]
+        assert items[0]["setDout"] == {"doutToSet": 3, "valueToSet": True}
+        assert items[1]["setAout"] == {"aoutToSet": 1, "valueToSet": 2.5}
+        assert items[2]["setIout"] == {"ioutToSet": 2, "valueToSet": 7}
+        assert items[3]["dwell"] == {"msToDwell": 250}
+        assert [i["tag"] for i in items] == [1, 2, 3, 4]
+
+    def test_solo_move_joints_at_velocity(self):
+        builder = ActivityBuilder()
+        result = builder.move_joints_at_velocity([0.1, -0.2, 0.0], tag=5, kc=0, move_params={}).build()
+        activity = json.loads(result)["command"]["soloActivity"]["0"]["command"]
+        assert activity["activityType"] == int(ActivityType.MOVEJOINTSATVELOCITY)
+        assert activity["tag"] == 5
+        assert activity["moveJointsAtVelocity"]["jointVelocityArray"] == [0.1, -0.2, 0.0]
+
+    def test_builders_do_not_share_items(self):
+        first, second = StreamActivityBuilder(), StreamActivityBuilder()
+        first.dwell(100, tag=1)
+        assert second.items == []
+        assert len(json.loads(first.build())["stream"]["items"]) == 1
+
+    def test_concurrent_builders(self):
+        """ Builders of several threads build their own messages. """
+        def build(tag: int) -> int:
+            for _ in range(200):
+                items = json.loads(StreamActivityBuilder().dwell(tag, tag=tag).build())["stream"]["items"]
+                assert items == [{"activityType": int(ActivityType.DWELL), "tag": tag, "dwell": {"msToDwell": tag}}]
+            return tag
+
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            assert list(pool.map(build, range(32))) == list(range(32))
@@ -0,0 +1,50 @@
+import json
+import numpy as np
+import pytest
+from awtube.parameterization import *
+from awtube.config import load_joint_limits
+from awtube.types import JointLimits
+from awtube.errors import AWTubeErrorException
+
+"""
+  Tests for the time parameterization of joint paths under limits. """
+
+
+class TestParameterization:
+    path = np.cumsum(np.random.default_rng(0).normal(0, 0.1, (100, 6)), axis=0)
+    limits = JointLimits(velocities=[1.5] * 6,
+                         accelerations=[5.0] * 6,
+                         jerks=[50.0] * 6)
+
+    @pytest.mark.parametrize('order', [3, 5])
+    def test_respects_limits(self, order):
+        timing = retime(self.path, self.limits, order=order)
+        fractions = np.linspace(0, 1, 50)
+        for derivative, limit in ((1, 1.5), (2, 5.0), (3, 50.0)):
+            peak = np.abs(timing.spline.evaluate_segments(
+                fractions, derivative=derivative)).max()
+            assert peak <= limit * 1.01
+
+    def test_cycle_time(self):
+        timing = retime(self.path, self.limits)
+        assert timing.cycle_time == pytest.approx(timing.timestamps[-1])
+        # never faster than every joint at full speed
+        lower = np.abs(np.diff(self.path, axis=0) / 1.5).max(axis=1).sum()
+        assert timing.cycle_time >= lower
+
+    def test_trajectory(self):
+        timing = retime(self.path, self.limits)
+        traj = timing.trajectory(period=0.02)
+        assert np.allclose(traj.positions[-1], self.path[-1])
+        assert np.abs(traj.velocities).max() <= 1.5 * 1.01
+
+    def test_velocity_limits_required(self):
+        with pytest.raises(AWTubeErrorException):
+            retime(self.path, JointLimits(accelerations=[5.0] * 6))
+
+    def test_load_joint_limits(self, tmp_path):
+        path = tmp_path / 'robot.json'
+        path.write_text(json.dumps({'joint_limits': {'velocities': [1.0] * 6}}))
+        limits = load_joint_limits(str(path))
+        assert limits.velocities == [1.0] * 6
+        assert limits.jerks is None
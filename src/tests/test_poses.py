@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from awtube.poses import *
+from awtube.types import Pose, Position, Quaternion
+
+"""
+  Tests for the pose math and the Cartesian path generation. """
+
+
+class TestPoses:
+    quats = normalize(np.random.default_rng(0).normal(size=(100, 4)))
+    start = Pose(position=Position(400, -50, 650),
+                 orientation=Quaternion(0.8660254037844387, 0, 0.5, 0))
+    end = Pose(position=Position(550, 50, 650),
+               orientation=Quaternion(1, 0, 0, 0))
+
+    def same_rotation(self, a, b):
+        return np.allclose(np.abs(np.sum(a * b, axis=-1)), 1)
+
+    def test_matrix_round_trip(self):
+        result = quaternion_from_matrix(matrix_from_quaternion(self.quats))
+        assert self.same_rotation(result, self.quats)
+
+    def test_euler_round_trip(self):
+        result = quaternion_from_euler(*euler_from_quaternion(self.quats).T)
+        assert self.same_rotation(result, self.quats)
+
+    def test_euler_convention(self):
+        # rotation about z of 90 degrees maps x on y
+        m = matrix_from_quaternion(quaternion_from_euler(0, 0, np.pi / 2))
+        assert np.allclose(m @ [1, 0, 0], [0, 1, 0])
+
+    def test_multiply_matches_matrices(self):
+        a, b = self.quats[:50], self.quats[50:]
+        assert np.allclose(matrix_from_quaternion(multiply(a, b)),
+                           matrix_from_quaternion(a) @ matrix_from_quaternion(b))
+
+    def test_slerp_constant_speed(self):
+        q = slerp(self.quats[0], self.quats[1], np.linspace(0, 1, 21))
+        assert self.same_rotation(q[0], self.quats[0])
+        assert self.same_rotation(q[-1], self.quats[1])
+        steps = angle(q[:-1], q[1:])
+        assert np.allclose(steps, steps[0])
+
+    def test_slerp_batched(self):
+        q = slerp(self.quats[:10], self.quats[10:20], np.full(10, 0.5))
+        assert q.shape == (10, 4)
+        assert np.allclose(angle(q, self.quats[:10]), angle(q, self.quats[10:20]))
+
+    def test_line(self):
+        path = line(self.start, self.end, step=1.0)
+        assert len(path) == int(np.ceil(np.hypot(150, 100)))
+        assert np.allclose(path.translations[-1], self.end.position)
+        assert np.max(np.linalg.norm(np.diff(path.translations, axis=0), axis=1)) <= 1.0
+        translation, rotation = next(path.items())
+        assert set(translation) == {'x', 'y', 'z'}
+        assert set(rotation) == {'x', 'y', 'z', 'w'}
+
+    def test_polyline(self):
+        path = polyline([self.start, self.end, self.start], step=10.0)
+        assert np.allclose(path.translations[-1], self.start.position)
+        assert path.rotations.shape == (len(path), 4)
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import pytest
+from awtube import commands
+from awtube.async_robot import AsyncRobot
+from awtube.program import Program, CompiledProgram, FrameCommand
+from awtube.types import JointStates, MoveParametersConfig
+from tests.receivers import InstantReceiver, ListReceiver
+
+"""
+  Tests for the programs compiled to frames, replayed frames must be the messages of the
+  commands they replace, with the tags of the stream. """
+
+ROTATION = {'x': 0.8660254037844387, 'y': 3.0616169978683824e-17, 'z': 0.49999999999999994, 'w': 5.3e-17}
+
+
+def rectangle() -> Program:
+    return Program(move_params=MoveParametersConfig(vmax_percentage=50)) \
+        .move_line({'x': 400, 'y': -50, 'z': 650}, ROTATION) \
+        .set_speed(2) \
+        .move_line({'x': 400, 'y': 50, 'z': 650}, ROTATION) \
+        .stream_dout(1, True) \
+        .dwell(100) \
+        .set_speed(0.5) \
+        .move_joints([0.0, 0.1, 0.2, 0.3, 0.4, 0.5])
+
+
+def test_frames_match_commands():
+    receiver, expected = ListReceiver(), ListReceiver()
+    params = MoveParametersConfig(blend_tolerance=0.5)
+    points = [JointStates(positions=[0.1 * i] * 6, velocities=[0.01 * i] * 6) for i in range(3)]
+    compiled = Program() \
+        .move_line({'x': 1, 'y': 2, 'z': 3}, ROTATION, move_params=params) \
+        .move_to_position({'x': 1, 'y': 2, 'z': 3}, ROTATION) \
+        .move_arc({'x': 1, 'y': 2, 'z': 3}, ROTATION, {'x': 0, 'y': 0, 'z': 3}, plane=ROTATION) \
+        .move_joints_interpolated(points, duration=0.02) \
+        .stream_aout(2, 0.5) \
+        .compile(cache_dir=None)
+    cmds = [commands.MoveLineCommand(expected, {'x': 1, 'y': 2, 'z': 3}, ROTATION, move_params=params),
+            commands.MoveToPositionCommand(expected, {'x': 1, 'y': 2, 'z': 3}, ROTATION),
+            commands.MoveArcCommand(expected, {'x': 1, 'y': 2, 'z': 3}, ROTATION, {'x': 0, 'y': 0, 'z': 3},
+                                    plane=ROTATION)] + \
+        [commands.MoveJointsInterpolatedCommand(expected, pt.positions, pt.velocities, duration=0.02)
+         for pt in points] + \
+        [commands.AoutActivityCommand(expected, 2, 0.5)]
+    frames = compiled.commands(receiver)
+    assert all(isinstance(frame, FrameCommand) for frame in frames)
+    for tag, (frame, cmd) in enumerate(zip(frames, cmds), start=7):
+        frame.tag = cmd.tag = tag
+        frame.execute()
+        cmd.execute()
+    assert receiver.messages == expected.messages
+
+
+def test_commands_of_runs():
+    compiled = Program().dwell(1).set_speed(2).dwell(2).compile(cache_dir=None)
+    cmds = compiled.commands(ListReceiver(), repeat=2)
+    assert [type(cmd) for cmd in cmds] == [FrameCommand, commands.StreamFeedRateCommand, FrameCommand] * 2
+    assert cmds[1].value == 2
+
+
+def test_disk_cache(tmp_path, monkeypatch):
+    compiled = rectangle().compile(cache_dir=str(tmp_path))
+    assert (tmp_path / f'{compiled.key}.json').exists()
+    assert rectangle().key == compiled.key
+    assert rectangle().dwell(5).key != compiled.key
+
+    def fail(*args):
+        raise AssertionError('compiled again')
+    monkeypatch.setattr(Program, '_compile_step', fail)
+    loaded = rectangle().compile(cache_dir=str(tmp_path))
+    assert loaded.steps == compiled.steps
+    assert CompiledProgram.load(str(tmp_path / 'missing.json')) is None
+
+
+def test_replay():
+    async def main():
+        robot = AsyncRobot()
+        robot.receiver = InstantReceiver(robot)
+        await robot.start()
+        await asyncio.wait_for(robot.run_program_async(rectangle(), repeat=3, cache_dir=None), 10)
+        await robot.close()
+        return robot.receiver.messages
+    messages = [json.loads(m) for m in asyncio.run(main())]
+    items = [m["stream"]["items"][0] for m in messages if "stream" in m]
+    speeds = [m["command"]["kinematicsConfiguration"]["0"]["command"]["fro"]
+              for m in messages if "command" in m and "kinematicsConfiguration" in m["command"]]
+    assert [item["tag"] for item in items] == list(range(1, 16))
+    assert speeds == [2, 0.5] * 3
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from awtube.simplification import *
+from awtube import poses
+from awtube.errors import AWTubeErrorException
+
+"""
+  Tests for the simplification of dense Cartesian paths. """
+
+
+class TestSimplification:
+    t = np.linspace(0, 1, 1001)
+    # two straight lines meeting at a corner, with a little noise
+    translations = np.where(t[:, None] < 0.5,
+                            np.stack([t, 0 * t, 0 * t], axis=1),
+                            np.stack([0.5 + 0 * t, t - 0.5, 0 * t], axis=1)) * 100 \
+        + np.random.default_rng(0).normal(0, 0.001, (1001, 3))
+    rotations = poses.quaternion_from_euler(0 * t, 0 * t, 2 * t**2)
+
+    def test_collinear_points_dropped(self):
+        result = simplify(self.translations, tolerance=0.01)
+        assert len(result.indices) == 3
+        assert result.indices[0] == 0 and result.indices[-1] == 1000
+        assert result.reduction_ratio == pytest.approx(1001 / 3)
+
+    def test_within_tolerance(self):
+        result = simplify(self.translations, tolerance=0.01)
+        assert result.max_deviation <= 0.01
+
+    def test_angle_tolerance(self):
+        loose = simplify(self.translations, self.rotations, tolerance=0.01)
+        tight = simplify(self.translations, self.rotations,
+                         tolerance=0.01, angle_tolerance=1e-4)
+        assert tight.max_angle_deviation <= 1e-4
+        assert len(tight.indices) > len(loose.indices)
+        assert tight.path.rotations.shape == (len(tight.indices), 4)
+
+    def test_bad_tolerance(self):
+        with pytest.raises(AWTubeErrorException):
+            simplify(self.translations, tolerance=0)
+
+
+class TestFitArcs:
+    theta = np.linspace(0, np.pi, 1001)
+    # line, then a half circle of radius 50 in a tilted plane, then a line
+    tilt = poses.matrix_from_quaternion(poses.quaternion_from_euler(0.4, 0.2, 0))
+    circle = np.stack([50 * np.sin(theta), 50 - 50 * np.cos(theta), 0 * theta], axis=1)
+    translations = np.concatenate([
+        np.stack([np.linspace(-100, 0, 200, endpoint=False), 0 * np.arange(200), 0 * np.arange(200)], axis=1),
+        circle,
+        np.stack([np.linspace(0, -100, 200)[1:], 100 + 0 * np.arange(199), 0 * np.arange(199)], axis=1)]) @ tilt.T
+
+    def test_arc_found(self):
+        result = fit_arcs(self.translations, tolerance=0.01)
+        kinds = [s.activity for s in result.segments]
+        assert kinds == [ActivityType.MOVELINE, ActivityType.MOVEARC, ActivityType.MOVELINE]
+        arc = result.segments[1]
+        assert np.allclose(arc.centre, np.array([0, 50, 0]) @ self.tilt.T, atol=0.01)
+        assert arc.plane is not None
+        assert result.max_deviation <= 0.01
+
+    def test_fewer_items_than_lines(self):
+        lines = simplify(self.translations, tolerance=0.01)
+        arcs = fit_arcs(self.translations, tolerance=0.01)
+        assert len(arcs.segments) + 1 < len(lines.indices)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+import pytest
+import websockets
+from awtube.async_robot import AsyncRobot
+from awtube.types import StreamCommandType, StreamStatus, StreamState
+
+"""
+  Tests for the stream commands sent ahead of the queues, against a local websocket
+  server standing for GBC. """
+
+
+async def serve(test):
+    received = asyncio.Queue()
+
+    async def handler(socket):
+        async for message in socket:
+            received.put_nowait(json.loads(message))
+
+    async with websockets.serve(handler, '127.0.0.1', 0) as server:
+        robot = AsyncRobot('127.0.0.1', str(server.sockets[0].getsockname()[1]))
+        # GBC buffer full, stream items stay pending
+        robot.stream_observer._payload = StreamStatus(capacity=0, tag=0, state=int(StreamState.IDLE))
+        await robot.start()
+        while not robot.receiver.connected:
+            await asyncio.sleep(0.01)
+        try:
+            return await asyncio.wait_for(test(robot, received), 5)
+        finally:
+            await robot.close()
+
+
+def stream_command(message: dict) -> int:
+    return message["command"]["stream"]["0"]["command"]["streamCommand"]
+
+
+def test_stop_drops_pending_items():
+    async def test(robot: AsyncRobot, received: asyncio.Queue):
+        move = asyncio.ensure_future(robot.move_joints_async([0.0] * 6))
+        # taken from the queue by the controller
+        await asyncio.sleep(0.7)
+        assert robot.stream_controller._pending
+        robot.stop_stream()
+        assert not robot.stream_controller._pending
+        with pytest.raises(asyncio.CancelledError):
+            await move
+        return await received.get(), received.empty(), robot.stream_command_latency()
+    message, alone, latency = asyncio.run(serve(test))
+    assert stream_command(message) == StreamCommandType.STOP
+    assert alone
+    assert latency.count == 1
+
+
+def test_stop_drops_items_waiting_to_be_written():
+    async def test(robot: AsyncRobot, received: asyncio.Queue):
+        move = asyncio.ensure_future(robot.move_joints_async([0.0] * 6))
+        await asyncio.sleep(0.7)
+        # room in GBC, the item goes to the outgoing queue polled by the receiver
+        robot.stream_observer._payload = StreamStatus(capacity=100, tag=0, state=int(StreamState.IDLE))
+        robot.stream_controller._flush()
+        queued = robot.receiver.outgoing.qsize()
+        robot.stop_stream()
+        with pytest.raises(asyncio.CancelledError):
+            await move
+        message = await received.get()
+        await asyncio.sleep(0.05)
+        return queued, message, received.empty()
+    queued, message, alone = asyncio.run(serve(test))
+    assert queued == 1
+    assert stream_command(message) == StreamCommandType.STOP
+    assert alone
+
+
+def test_not_replayed_on_reconnection():
+    async def test(robot: AsyncRobot, received: asyncio.Queue):
+        await robot.close()
+        # dropped while disconnected, a late PAUSE or RUN would be stale
+        robot.pause_stream()
+        dropped = len(robot.receiver._urgent)
+        await robot.start()
+        while not robot.receiver.connected:
+            await asyncio.sleep(0.01)
+        robot.stop_stream()
+        message = await received.get()
+        await asyncio.sleep(0.05)
+        return dropped, message, received.empty()
+    dropped, message, alone = asyncio.run(serve(test))
+    assert dropped == 0
+    assert stream_command(message) == StreamCommandType.STOP
+    assert alone
+
+
+def test_pause_from_another_thread():
+    async def test(robot: AsyncRobot, received: asyncio.Queue):
+        await asyncio.to_thread(robot.pause_stream)
+        message = await received.get()
+        robot.run_stream()
+        return message, await received.get(), robot.stream_command_latency()
+    paused, run, latency = asyncio.run(serve(test))
+    assert stream_command(paused) == StreamCommandType.PAUSE
+    assert stream_command(run) == StreamCommandType.RUN
+    assert latency.count == 2
+    # well under a millisecond on an idle loop, loose for loaded machines
+    assert latency.max < 0.05
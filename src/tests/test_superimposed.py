@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+from awtube.superimposed import OffsetStream
+from awtube.types import ActivityType, PositionReference
+from tests.receivers import ListReceiver
+
+"""
+  Tests for the superimposed offset stream, messages are read from a fake receiver. """
+
+
+def test_offsets_are_superimposed():
+    async def main():
+        receiver = ListReceiver()
+        offsets = OffsetStream(receiver, rate=100, stream_index=1)
+        task = asyncio.create_task(offsets.run())
+        offsets.correct({'x': 0.0, 'y': 0.5, 'z': 0.0})
+        await asyncio.sleep(0.02)
+        offsets.close()
+        await task
+        return receiver.items(), offsets
+    streams, offsets = asyncio.run(main())
+    assert len(streams) == 1
+    assert streams[0]["streamIndex"] == 1
+    item = streams[0]["items"][0]
+    assert item["activityType"] == int(ActivityType.MOVETOPOSITION)
+    position = item["moveToPosition"]["cartesianPosition"]["position"]
+    assert position["positionReference"] == int(PositionReference.MOVESUPERIMPOSED)
+    assert position["translation"] == {'x': 0.0, 'y': 0.5, 'z': 0.0}
+    assert position["rotation"] == {'x': 0.0, 'y': 0.0, 'z': 0.0, 'w': 1.0}
+    stats = offsets.latency()
+    assert stats.count == 1
+    assert 0 <= stats.max < 0.02
+
+
+def test_latest_correction_wins():
+    async def main():
+        receiver = ListReceiver()
+        offsets = OffsetStream(receiver, rate=20)
+        task = asyncio.create_task(offsets.run())
+        offsets.correct({'x': 0.0, 'y': 0.0, 'z': 0.1})
+        await asyncio.sleep(0.01)
+        # sent within one period of the first one, merged
+        offsets.correct({'x': 0.0, 'y': 0.0, 'z': 0.2})
+        offsets.correct({'x': 0.0, 'y': 0.0, 'z': 0.3})
+        await asyncio.sleep(0.1)
+        offsets.close()
+        await task
+        return receiver.items(), offsets
+    streams, offsets = asyncio.run(main())
+    zs = [s["items"][0]["moveToPosition"]["cartesianPosition"]["position"]["translation"]["z"]
+          for s in streams]
+    assert zs == [0.1, 0.3]
+    assert offsets.merged == 1
+    assert [s["items"][0]["tag"] for s in streams] == [1, 2]
+
+
+def test_max_offset():
+    offsets = OffsetStream(ListReceiver(), max_offset=1.0)
+    with pytest.raises(Exception):
+        offsets.correct({'x': 1.0, 'y': 1.0, 'z': 0.0})
@@ -0,0 +1,94 @@
+import random
+import pytest
+from pydantic import BaseModel
+from awtube import templates
+from awtube.builders import StreamActivityBuilder, StreamCommandBuilder, ActivityBuilder
+from awtube.types import ArcDirection, PositionReference, StreamCommandType, MoveParametersConfig
+
+"""
+  Tests for the module templates, the messages rendered from the templates must be
+  byte identical to the ones of the builders. """
+
+
+class _Value(BaseModel):
+    value: list = None
+
+
+def _floats(n: int) -> list:
+    return [random.uniform(-10, 10) * 10 ** random.randint(-9, 18) for _ in range(n)]
+
+
+def test_real_matches_pydantic():
+    random.seed(0)
+    values = _floats(20000) + [0.0, -0.0, 1e-5, 2.5e-5, 1e-4, 1e15, 1e16, 1.5e20,
+                               5e-324, float('inf'), float('nan')]
+    assert '[' + ','.join(map(templates.real, values)) + ']' == \
+        _Value(value=values).model_dump_json()[9:-1]
+
+
+def test_dumps_matches_pydantic():
+    values = [1, True, False, None, 'a"b\\é', {'a': [1, 2.5, {}]}, (1, 2)]
+    assert '[' + ','.join(map(templates.dumps, values)) + ']' == \
+        _Value(value=values).model_dump_json()[9:-1]
+
+
+def test_template_slots():
+    template = templates.Template({'a': templates.Slot(), 'b': ['%s', templates.Slot(templates.flag)]})
+    assert template.slots == 2
+    assert template.render(1.5, 0) == '{"a":1.5,"b":["%s",false]}'
+
+
+@pytest.mark.parametrize('machine', [0, 1])
+def test_stream_commands(machine: int):
+    builder = StreamCommandBuilder()
+    assert templates.heartbeat(machine).render(1234) == \
+        builder.reset().machine(machine).heartbeat(1234).build()
+    assert templates.control_word(machine).render(15) == \
+        builder.reset().machine(machine).control_word(15).build()
+    assert templates.machine_target(machine).render(2) == \
+        builder.reset().machine(machine).machine_target(2).build()
+    assert templates.desired_feedrate().render(0.35) == builder.reset().desired_feedrate(0.35).build()
+    assert templates.disable_limits().render(not True) == builder.reset().safe_limits(True).build()
+    assert templates.stream_command().render(StreamCommandType.RUN) == \
+        builder.reset().stream_command(StreamCommandType.RUN).build()
+    assert templates.output('dout', machine).render(1, True) == builder.reset().dout(machine, 1).build()
+    assert templates.output('aout', machine).render(0.5, False) == \
+        builder.reset().aout(machine, 0.5, override=False).build()
+    assert templates.output('iout', machine).render(7, True) == builder.reset().iout(machine, 7).build()
+    assert templates.serial(machine).render(1, 3, [1, 2, 255]) == \
+        builder.reset().serial(machine, [1, 2, 255], control_word=1).build()
+
+
+@pytest.mark.parametrize('move_params', [{}, MoveParametersConfig(vmax=100, blend_tolerance=0.5).to_dict()])
+def test_stream_items(move_params: dict):
+    random.seed(1)
+    builder = StreamActivityBuilder()
+    for _ in range(50):
+        tag = random.randint(0, 10**6)
+        q, dq = _floats(6), _floats(6)
+        t = dict(zip('xyz', _floats(3)))
+        r = dict(zip('xyzw', _floats(4)))
+        c = dict(zip('xyz', _floats(3)))
+        assert templates.move_joints(kc=1).render(tag, move_params, q) == \
+            builder.reset().move_joints(q, tag, 1, move_params).build()
+        assert templates.move_joints_interpolated(kc=1).render(tag, move_params, 0.02, q, dq) == \
+            builder.reset().move_joints_interpolated(q, dq, tag, 1, move_params, duration=0.02).build()
+        assert templates.move_line(kc=1).render(tag, move_params, *t.values(), *r.values()) == \
+            builder.reset().move_line(t, r, tag, 1, move_params).build()
+        assert templates.move_to_position(1, 1, PositionReference.MOVESUPERIMPOSED).render(
+            tag, move_params, *t.values(), *r.values()) == \
+            builder.reset().stream_index(1).move_to_position(
+                t, r, tag, 1, move_params, PositionReference.MOVESUPERIMPOSED).build()
+        assert templates.move_arc(kc=1).render(tag, move_params, ArcDirection.CW,
+                                               *t.values(), *r.values(), *c.values()) == \
+            builder.reset().move_arc(t, r, c, ArcDirection.CW, tag, 1, move_params).build()
+        assert templates.move_arc(kc=1, plane=True).render(tag, move_params, ArcDirection.CCW,
+                                                           *t.values(), *r.values(), *c.values(),
+                                                           *r.values()) == \
+            builder.reset().move_arc(t, r, c, ArcDirection.CCW, tag, 1, move_params, plane=r).build()
+        assert templates.solo_move_joints_at_velocity(kc=1).render(tag, move_params, dq) == \
+            ActivityBuilder().move_joints_at_velocity(dq, tag, 1, move_params).build()
+    assert templates.set_dout().render(3, 2, 1) == builder.reset().set_dout(2, 1, 3).build()
+    assert templates.set_aout().render(3, 2, 1) == builder.reset().set_aout(2, 1, 3).build()
+    assert templates.set_iout().render(3, 2, 1.0) == builder.reset().set_iout(2, 1.0, 3).build()
+    assert templates.dwell().render(3, 500) == builder.reset().dwell(500, 3).build()
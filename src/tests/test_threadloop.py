@@ -0,0 +1,67 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+import pytest
+from awtube.threadloop import ExceptionPolicy, ThreadLoop
+
+"""
+  Tests for the exceptions handled by the threadloop as soon as they are registered,
+  and for its shutdown. """
+
+
+def test_stop_policy_is_immediate():
+    tloop = ThreadLoop()
+    tloop.start()
+    start = time.monotonic()
+    tloop.register_exception(ConnectionRefusedError())
+    tloop.join(2)
+    assert not tloop.is_alive()
+    assert time.monotonic() - start < 0.2
+    assert tloop.loop.is_closed()
+
+
+def test_registered_before_start():
+    tloop = ThreadLoop()
+    tloop.register_exception(KeyboardInterrupt())
+    tloop.start()
+    tloop.join(2)
+    assert not tloop.is_alive()
+
+
+def test_reconnect_and_log_policies():
+    tloop = ThreadLoop()
+    tloop.reconnect_delay = 0
+    tloop.set_policy(OSError, ExceptionPolicy.RECONNECT)
+    reconnected = threading.Event()
+    tloop.add_reconnect_handler(reconnected.set)
+    tloop.start()
+    try:
+        tloop.register_exception(ValueError())
+        # subclass of OSError
+        tloop.register_exception(ConnectionResetError())
+        assert reconnected.wait(1)
+        assert tloop.is_alive()
+        assert tloop.policy(ValueError()) is ExceptionPolicy.LOG
+    finally:
+        tloop.stop()
+
+
+def test_stop_awaits_cancellation():
+    tloop = ThreadLoop()
+    tloop.start()
+    cleaned = []
+
+    async def forever():
+        try:
+            await asyncio.Event().wait()
+        finally:
+            cleaned.append(True)
+    future = tloop.post(forever())
+    time.sleep(0.01)
+    start = time.monotonic()
+    tloop.stop()
+    assert time.monotonic() - start < 0.2
+    assert cleaned == [True]
+    with pytest.raises(concurrent.futures.CancelledError):
+        future.result(0)
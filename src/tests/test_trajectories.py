@@ -0,0 +1,85 @@
+import json
+import numpy as np
+import pytest
+from awtube.trajectories import *
+from awtube.builders import StreamActivityBuilder
+from awtube.commands import TrajectoryBatch
+from awtube.errors import AWTubeErrorException
+from tests.receivers import ListReceiver
+
+"""
+  Tests for the spline resampling of joint trajectories. """
+
+
+class TestTrajectories:
+    timestamps = np.array([0.0, 1.0, 2.5, 3.0, 5.0])
+    positions = np.array([[0.0, 0.0],
+                          [0.5, -0.2],
+                          [1.0, 0.3],
+                          [0.8, 0.1],
+                          [0.0, 0.0]])
+
+    @pytest.mark.parametrize('order', [3, 5])
+    def test_passes_through_waypoints(self, order):
+        spline = fit(self.positions, self.timestamps, order=order)
+        assert np.allclose(spline.evaluate(self.timestamps), self.positions)
+
+    @pytest.mark.parametrize('order', [3, 5])
+    def test_starts_and_ends_at_rest(self, order):
+        spline = fit(self.positions, self.timestamps, order=order)
+        assert np.allclose(spline.evaluate([0.0, 5.0], derivative=1), 0)
+
+    @pytest.mark.parametrize('order', [3, 5])
+    def test_continuous_acceleration(self, order):
+        spline = fit(self.positions, self.timestamps, order=order)
+        knots = self.timestamps[1:-1]
+        left = spline.evaluate(knots - 1e-9, derivative=2)
+        right = spline.evaluate(knots + 1e-9, derivative=2)
+        assert np.allclose(left, right, atol=1e-5)
+
+    def test_quintic_ends_without_acceleration(self):
+        spline = fit(self.positions, self.timestamps, order=5)
+        assert np.allclose(spline.evaluate([0.0, 5.0], derivative=2), 0)
+
+    def test_resample_period(self):
+        traj = resample(self.positions, self.timestamps, period=0.02)
+        assert traj.period == 0.02
+        assert traj.positions.shape == (250, 2)
+        assert np.allclose(traj.positions[-1], self.positions[-1])
+        assert len(traj.joint_states()) == 250
+
+    def test_bad_timestamps(self):
+        with pytest.raises(AWTubeErrorException):
+            resample(self.positions, self.timestamps[::-1])
+
+    def test_duration_in_builder(self):
+        traj = resample(self.positions, self.timestamps, period=0.02)
+        point = traj.joint_states()[0]
+        result = StreamActivityBuilder().reset().move_joints_interpolated(
+            joint_position_array=point.positions,
+            joint_velocity_array=point.velocities,
+            tag=1,
+            kc=0,
+            move_params={},
+            duration=traj.period).build()
+        item = json.loads(result)['stream']['items'][0]
+        assert item['moveJointsInterpolated']['duration'] == 0.02
+
+    def test_last_sample_duration(self):
+        traj = resample([[0.0], [1.0]], [0.0, 1.05], period=0.1)
+        assert len(traj.positions) == 11
+        assert np.allclose(traj.durations[:-1], 0.1)
+        assert np.isclose(traj.durations[-1], 0.05)
+        assert np.isclose(traj.durations.sum(), 1.05)
+        assert np.allclose(traj.positions[-1], 1.0)
+        assert np.allclose(traj.velocities[-1], 0.0)
+
+    def test_durations_streamed(self):
+        receiver = ListReceiver()
+        traj = resample([[0.0], [1.0]], [0.0, 1.05], period=0.1)
+        batch = TrajectoryBatch(receiver, traj.positions, traj.velocities, duration=traj.durations)
+        for row in batch.commands():
+            row.execute()
+        durations = [stream['items'][0]['moveJointsInterpolated']['duration'] for stream in receiver.items()]
+        assert durations[:-1] == [0.1] * 10
+        assert durations[-1] == pytest.approx(0.05)
@@ -0,0 +1,89 @@
+import time
+import numpy as np
+import pytest
+from awtube.validation import *
+from awtube.types import JointLimits
+from awtube.errors import OperationError, AWTubeErrorException
+
+"""
+  Tests for the offline validation of trajectories against joint limits. """
+
+
+class TestValidation:
+    limits = JointLimits(positions_min=[-3.0] * 2,
+                         positions_max=[3.0] * 2,
+                         velocities=[1.5] * 2,
+                         accelerations=[5.0] * 2,
+                         steps=[0.1] * 2)
+    period = 0.01
+
+    def trajectory(self, points=1000):
+        t = np.arange(points) * self.period
+        return np.stack([np.sin(t), 0.5 * np.cos(t)], axis=1)
+
+    def test_valid(self):
+        result = validate(self.trajectory(), self.limits, period=self.period)
+        assert result.ok
+        assert result.operation_errors() == {}
+
+    def test_position_limit(self):
+        positions = self.trajectory()
+        positions[10:12, 1] = 3.5
+        result = validate(positions, self.limits, period=self.period)
+        assert list(result.position) == [10, 11]
+        assert OperationError.JOINT_LIMIT_EXCEEDED in result.operation_errors()
+
+    def test_discontinuity(self):
+        positions = self.trajectory()
+        positions[500:, 0] += 0.2
+        result = validate(positions, self.limits, period=self.period)
+        assert list(result.discontinuity) == [500]
+        assert 500 in result.velocity
+        assert OperationError.JOINT_DISCONTINUITY in result.operation_errors()
+
+    def test_velocities_sent(self):
+        positions = self.trajectory()
+        velocities = np.zeros_like(positions)
+        velocities[7, 0] = 2.0
+        result = validate(positions, self.limits,
+                          period=self.period, velocities=velocities)
+        assert list(result.velocity) == [7]
+        assert list(result.acceleration) == [7, 8]
+
+    def test_timestamps(self):
+        positions = self.trajectory(10)
+        timestamps = np.arange(10) * self.period
+        timestamps[5:] -= 0.009
+        result = validate(positions, self.limits, timestamps=timestamps)
+        assert 5 in result.acceleration
+
+    def test_dense_violations_linear(self):
+        # path sent in degrees, nearly every point is out of the limits
+        t = np.arange(1_000_000) * self.period
+        positions = np.degrees(np.stack([np.sin(t)] * 6, axis=1))
+        limits = JointLimits(positions_min=[-3.0] * 6, positions_max=[3.0] * 6,
+                             velocities=[1.5] * 6, accelerations=[5.0] * 6, steps=[0.1] * 6)
+        start = time.perf_counter()
+        result = validate(positions, limits, period=self.period)
+        elapsed = time.perf_counter() - start
+        expected = np.flatnonzero((np.abs(positions) > 3.0).any(axis=1))
+        assert np.array_equal(result.position, expected)
+        assert len(result.position) > 900_000
+        # a few tens of milliseconds when idle, loose for loaded machines
+        assert elapsed < 1.0
+
+    def test_no_limits(self):
+        with pytest.raises(AWTubeErrorException):
+            validate(self.trajectory(), None)
+
+    def test_robot_numpy_points(self):
+        from awtube.async_robot import AsyncRobot
+        from awtube.types import JointStates
+        robot = AsyncRobot()
+        robot.joint_limits = self.limits
+        positions = self.trajectory(10)
+        velocities = np.zeros_like(positions)
+        velocities[3, 1] = 2.0
+        points = [JointStates(positions=p, velocities=v) for p, v in zip(positions, velocities)]
+        result = robot.validate_trajectory(points, duration=self.period)
+        assert list(result.velocity) == [3]
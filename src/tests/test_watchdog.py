@@ -0,0 +1,61 @@
+import asyncio
+import time
+from awtube.errors import HeartbeatFailure, TelemetryLoss
+from awtube.observers import TelemetryObserver, StatusObserver
+from awtube.watchdog import Watchdog
+
+"""
+  Tests for the watchdog of the observers, updates are simulated by setting the
+  timestamp of the observers. """
+
+
+def touch(observer):
+    observer._timestamp = time.monotonic()
+
+
+def test_stall_reported_on_time():
+    async def main():
+        reported = []
+        dog = Watchdog(on_exception=lambda exc: reported.append((exc, time.monotonic())))
+        telemetry, status = TelemetryObserver(), StatusObserver()
+        watch = dog.watch(telemetry, timeout=0.05)
+        dog.watch(status, timeout=0.2, exception=HeartbeatFailure)
+        task = asyncio.create_task(dog.run())
+        # updated in time
+        for _ in range(5):
+            touch(telemetry)
+            touch(status)
+            await asyncio.sleep(0.02)
+        last = telemetry.timestamp
+        await asyncio.sleep(0.1)
+        stalled = watch.stalled
+        # updated again, then reported once more after the next stall
+        touch(telemetry)
+        await asyncio.sleep(0.03)
+        recovered = not watch.stalled
+        await asyncio.sleep(0.2)
+        task.cancel()
+        return reported, last, stalled, recovered, watch.stalls
+    reported, last, stalled, recovered, stalls = asyncio.run(main())
+    assert stalled and recovered and stalls == 2
+    exc, at = reported[0]
+    assert isinstance(exc, TelemetryLoss)
+    # within a few milliseconds of the stall
+    assert 0.05 <= at - last < 0.065
+    assert any(isinstance(exc, HeartbeatFailure) for exc, _ in reported)
+
+
+def test_never_updated_and_unwatch():
+    async def main():
+        stalls, reported = [], []
+        dog = Watchdog(on_exception=reported.append)
+        dog.watch(TelemetryObserver(), timeout=0.03, on_stall=stalls.append)
+        removed = dog.watch(StatusObserver(), timeout=0.03)
+        dog.unwatch(removed)
+        task = asyncio.create_task(dog.run())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return stalls, reported
+    stalls, reported = asyncio.run(main())
+    assert len(stalls) == 1 and isinstance(stalls[0], TelemetryLoss)
+    assert reported == []